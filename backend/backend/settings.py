@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -76,10 +79,75 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
+# DJANGO_DB_PROFILE selects the database: "sqlite" (default) or "postgresql"
+DB_PROFILE = os.environ.get("DJANGO_DB_PROFILE", "sqlite")
+
+if DB_PROFILE == "postgresql":
+    # needs psycopg 3 with its pool: the "postgres" extra of pyproject.toml
+    # (pip install -e ".[postgres]"). Django can't combine a pool with
+    # persistent connections, so CONN_MAX_AGE only applies without
+    POSTGRES_POOL = os.environ.get("POSTGRES_POOL", "true").lower() == "true"
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "maskgen"),
+            "USER": os.environ.get("POSTGRES_USER", "maskgen"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": (
+                0 if POSTGRES_POOL else int(os.environ.get("DB_CONN_MAX_AGE", 60))
+            ),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": (
+                {
+                    "pool": {
+                        "min_size": int(os.environ.get("POSTGRES_POOL_MIN", 2)),
+                        "max_size": int(os.environ.get("POSTGRES_POOL_MAX", 20)),
+                    }
+                }
+                if POSTGRES_POOL
+                else {}
+            ),
+        }
+    }
+elif DB_PROFILE == "sqlite":
+    # WAL lets readers run alongside the writer, busy_timeout makes writers
+    # queue for the lock instead of failing with "database is locked", and
+    # IMMEDIATE transactions take the write lock at BEGIN, so two transactions
+    # can't deadlock upgrading their read locks
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 20_000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 2**20))
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}"
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"unknown DJANGO_DB_PROFILE {DB_PROFILE!r}")
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Counters and registries shared between worker processes need a shared
+# backend, e.g. DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# with DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", ""),
     }
 }
 
@@ -137,5 +205,59 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# mask generation worker pool (manage.py run_mask_workers)
+MASKGEN_WORKERS = int(os.environ.get("MASKGEN_WORKERS", 2))
+MASKGEN_WORKER_POLL_INTERVAL = float(
+    os.environ.get("MASKGEN_WORKER_POLL_INTERVAL", 1.0)
+)
+# seconds after which a RUNNING job is taken to have lost its worker (on
+# another host; dead workers on the same host are noticed right away)
+MASKGEN_JOB_STALE_AFTER = float(os.environ.get("MASKGEN_JOB_STALE_AFTER", 6 * 3600))
+
+# how often GET /api/jobs/{id}/stream/ polls for new events, and how often a
+# running job stores the output buffered since the last flush (seconds)
+JOB_STREAM_POLL_INTERVAL = float(os.environ.get("JOB_STREAM_POLL_INTERVAL", 0.5))
+JOB_OUTPUT_FLUSH_INTERVAL = float(os.environ.get("JOB_OUTPUT_FLUSH_INTERVAL", 0.25))
+
+# how long the cached latest version of an instrument config is trusted
+# (seconds); uploads invalidate it, this only bounds staleness across processes
+# that don't share a cache backend
+INSTRUMENT_CACHE_TIMEOUT = int(os.environ.get("INSTRUMENT_CACHE_TIMEOUT", 300))
+
+# objects further than this outside the instrument's field (mm on the mask)
+# are left out of the .obj file given to maskgen; see maskgen_api/fov.py
+FOV_MARGIN_MM = float(os.environ.get("FOV_MARGIN_MM", 5.0))
+
+# parent of the per-run maskgen/maskcut working directories (system temp dir if unset)
+MASKGEN_SCRATCH_ROOT = os.environ.get("MASKGEN_SCRATCH_ROOT")
+
+# start method for the rotator sweep process pool; "spawn" works everywhere
+# (and is the macOS default), "fork" starts faster on Linux
+MASKGEN_POOL_START_METHOD = os.environ.get("MASKGEN_POOL_START_METHOD", "spawn")
+
+# content-addressed store of maskgen results (SMF, .obw, parsed features),
+# evicted least recently used first; MASKGEN_CACHE_MAX_BYTES=0 disables it
+MASKGEN_CACHE_DIR = os.environ.get("MASKGEN_CACHE_DIR", BASE_DIR / "maskgen_cache")
+MASKGEN_CACHE_MAX_BYTES = int(os.environ.get("MASKGEN_CACHE_MAX_BYTES", 512 * 2**20))
+# part of the cache key; defaults to the size/mtime of the maskgen binary
+MASKGEN_VERSION = os.environ.get("MASKGEN_VERSION", "")
+
+# wall-clock timeout of an external tool run: base + per_item seconds for each
+# object (maskgen) or mask feature (maskcut), capped at max
+TOOL_TIMEOUTS = {
+    "maskgen": {
+        "base": float(os.environ.get("MASKGEN_TIMEOUT_BASE", 5)),
+        "per_item": float(os.environ.get("MASKGEN_TIMEOUT_PER_OBJECT", 0.05)),
+        "max": float(os.environ.get("MASKGEN_TIMEOUT_MAX", 600)),
+    },
+    "maskcut": {
+        "base": float(os.environ.get("MASKCUT_TIMEOUT_BASE", 5)),
+        "per_item": float(os.environ.get("MASKCUT_TIMEOUT_PER_FEATURE", 0.02)),
+        "max": float(os.environ.get("MASKCUT_TIMEOUT_MAX", 300)),
+    },
+}
+# address space limit of a tool run; its CPU time is limited to its timeout
+TOOL_MEMORY_LIMIT = int(os.environ.get("TOOL_MEMORY_LIMIT", 4 * 2**30))
+
 # Test paths
 TEST_OBJ_FILE_PATH = BASE_DIR / "tests/data/DCM5V5E.obj"
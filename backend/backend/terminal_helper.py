@@ -1,60 +1,238 @@
+import codecs
 import subprocess
-from threading import Timer
+from contextlib import contextmanager
 import os
+import pty
+import select
+import shutil
+import signal
+import tempfile
+import termios
+import time
 
 
-def run_with_input(command, input_text=None):
-    proc = subprocess.Popen(
-        command.split(" "),
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    timer = Timer(5, proc.kill)  # kill if hung
+@contextmanager
+def scratch_directory(tool_directory, root=None, prefix="maskgen-"):
+    """
+    Private working directory for one maskgen/maskcut invocation.
+
+    Every file of the tool's install directory (binaries, support and licence
+    files) is symlinked in, so the tool finds them through MGPATH while its
+    cwd-relative outputs (.SMF, .obw, .nc, .loc_* files) stay separate from
+    any other run. The directory is removed on exit.
+
+    Yields:
+        str: path of the scratch directory
+    """
+    if root:
+        os.makedirs(root, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=prefix, dir=root)
     try:
-        timer.start()
-        stdout, stderr = proc.communicate(input=input_text)
-        if proc.returncode == 0:
-            return True, stdout.strip()
-        else:
-            return False, (stdout + "\n" + stderr).strip()
-    except Exception as e:
-        return False, str(e)
+        if tool_directory and os.path.isdir(tool_directory):
+            for entry in os.listdir(tool_directory):
+                os.symlink(
+                    os.path.join(os.path.abspath(tool_directory), entry),
+                    os.path.join(path, entry),
+                )
+        yield path
     finally:
-        timer.cancel()
-
-
-def run_maskgen(command, override):
-    success, output = run_with_input(command)
-    max_retries = 0
-    while (
-        override
-        and ("Do you wish to continue" in output or "Overwrite?" in output)
-        and max_retries < 5
-    ):
-        success, output = run_with_input(command, input_text="yes\n")
-        if "Writing object file with use counts to" in output:
-            break
-        max_retries += 1
-
-    return success, output
-
-
-def run_maskcut(command, override):
-    success, output = run_with_input(command)
-    max_retries = 0
-    while (
-        override
-        and ("Do you wish to continue" in output or "Overwrite?" in output)
-        and max_retries < 0
-    ):
-        success, output = run_with_input(command, input_text="yes\n")
-        if "Estimated cutting time" in output:
-            break
-        max_retries += 1
-
-    return success, output
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def tool_env(mgpath):
+    env = os.environ.copy()
+    env["MGPATH"] = mgpath if mgpath.endswith("/") else mgpath + "/"
+    return env
+
+
+# prompt -> answer tables for the interactive tools; None sends end-of-file,
+# which is what the tools used to see on a closed stdin
+OVERRIDE_ANSWERS = {"Do you wish to continue": "yes", "Overwrite?": "yes"}
+DECLINE_ANSWERS = {"Do you wish to continue": None, "Overwrite?": None}
+EOF_CHAR = b"\x04"
+STOP_POLL_INTERVAL = 0.5
+
+
+def _raw_pty():
+    # no echo of our answers and no \r\n translation, so the transcript is
+    # exactly what the tool printed
+    master, slave = pty.openpty()
+    attrs = termios.tcgetattr(slave)
+    attrs[1] &= ~termios.ONLCR
+    attrs[3] &= ~termios.ECHO
+    termios.tcsetattr(slave, termios.TCSANOW, attrs)
+    return master, slave
+
+
+def _with_limits(argv, limits):
+    # a shell sets the rlimits and execs the tool, which keeps its pid; a
+    # preexec_fn would run Python between fork and exec, unsafe in the
+    # threaded workers and executors that call this
+    settings = []
+    for name, value in limits.items():
+        value = int(value)
+        if name == "cpu_seconds":
+            # SIGXCPU at the soft CPU limit, SIGKILL a second later
+            settings += [f"ulimit -H -t {value + 1}", f"ulimit -S -t {value}"]
+        elif name == "memory_bytes":
+            settings.append(f"ulimit -v {max(value // 1024, 1)}")
+    # errors ignored, e.g. RLIMIT_AS is not enforceable on macOS
+    script = "".join(f"{line} 2>/dev/null; " for line in settings)
+    return ["/bin/sh", "-c", script + 'exec "$@"', "sh", *argv]
+
+
+def _kill_group(pid):
+    # the tool runs in its own session, so this also reaps anything it spawned
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_session(
+    command,
+    answers,
+    cwd=None,
+    env=None,
+    timeout=5,
+    limits=None,
+    on_output=None,
+    should_stop=None,
+):
+    """
+    Runs an interactive tool once under a pseudo-terminal, answering its
+    prompts as they appear.
+
+    Args:
+        command (str): command line, split on spaces
+        answers (dict): prompt text -> answer line (None sends end-of-file)
+        timeout (float): wall-clock seconds before the tool is killed
+        limits (dict): optional rlimits for the tool, cpu_seconds and/or
+            memory_bytes
+        on_output (callable): optional, called with each decoded chunk of
+            output as it arrives
+        should_stop (callable): optional, polled every STOP_POLL_INTERVAL
+            seconds; returning True kills the tool
+
+    Returns:
+        (bool, str, dict): (exit status 0, full transcript, metrics with
+        duration, cpu_seconds, max_rss, exit_status, timed_out and stopped)
+    """
+    master, slave = _raw_pty()
+    started = time.monotonic()
+    try:
+        argv = command.split(" ")
+        proc = subprocess.Popen(
+            _with_limits(argv, limits) if limits else argv,
+            stdin=slave,
+            stdout=slave,
+            stderr=slave,
+            cwd=cwd,
+            env=env,
+            start_new_session=True,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        os.close(master)
+        os.close(slave)
+        return (
+            False,
+            str(e),
+            {
+                "duration": 0.0,
+                "exit_status": None,
+                "timed_out": False,
+                "stopped": False,
+            },
+        )
+    os.close(slave)
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    transcript = ""
+    scanned = 0
+    timed_out = stopped = False
+    deadline = started + timeout
+    next_poll = started + STOP_POLL_INTERVAL
+    try:
+        while True:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                timed_out = True
+                transcript += f"\n{command.split(' ')[0]} killed after {timeout:g}s"
+                break
+            if should_stop:
+                remaining = min(remaining, max(next_poll - now, 0))
+            ready, _, _ = select.select([master], [], [], remaining)
+            # at most once per interval however much the tool prints, as
+            # should_stop may query the database
+            if should_stop and time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + STOP_POLL_INTERVAL
+                if should_stop():
+                    stopped = True
+                    transcript += f"\n{command.split(' ')[0]} stopped"
+                    break
+            if not ready:
+                continue
+            try:
+                data = os.read(master, 4096)
+            except OSError:  # EIO once the tool has exited on Linux
+                data = b""
+            if not data:
+                break
+            chunk = decoder.decode(data)
+            transcript += chunk
+            if on_output:
+                on_output(chunk)
+
+            # answer each prompt once, in the order they appear
+            while True:
+                positions = {
+                    prompt: transcript.find(prompt, scanned) for prompt in answers
+                }
+                found = [
+                    (pos, prompt) for prompt, pos in positions.items() if pos != -1
+                ]
+                if not found:
+                    break
+                position, prompt = min(found)
+                answer = answers[prompt]
+                os.write(master, EOF_CHAR if answer is None else f"{answer}\n".encode())
+                scanned = position + len(prompt)
+    finally:
+        if timed_out or stopped:
+            _kill_group(proc.pid)
+        os.close(master)
+        # wait for the tool to exit but leave it a zombie, so its pid (and
+        # with it the group id) can't be reused before the stragglers of its
+        # group are killed; only then reap it
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        _kill_group(proc.pid)
+        _, wait_status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    metrics = {
+        "duration": time.monotonic() - started,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "max_rss": usage.ru_maxrss,  # KiB on Linux, bytes on macOS
+        "exit_status": proc.returncode,
+        "timed_out": timed_out,
+        "stopped": stopped,
+    }
+    return proc.returncode == 0, transcript.strip(), metrics
+
+
+def run_maskgen(command, override, cwd=None, env=None, **session):
+    return run_session(
+        command,
+        OVERRIDE_ANSWERS if override else DECLINE_ANSWERS,
+        cwd=cwd,
+        env=env,
+        **session,
+    )
+
+
+# maskcut asks the same questions as maskgen
+run_maskcut = run_maskgen
 
 
 def remove_file(file_path):
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class MaskgenApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "maskgen_api"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import instruments
+        from .models import InstrumentConfig
+
+        post_save.connect(instruments._on_change, sender=InstrumentConfig)
+        post_delete.connect(instruments._on_change, sender=InstrumentConfig)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+
+SMF_NAME = "mask.SMF"
+OBW_NAME = "mask.obw"
+FEATURES_NAME = "features.json"
+HITS_KEY = "maskgen_cache:hits"
+MISSES_KEY = "maskgen_cache:misses"
+# .obs keywords left out of run_key; on a hit the SMF header lines they set
+# are rewritten for the new mask
+LABEL_KEYWORDS = {"FILENAME", "TITLE", "OBSERVER", "OBJFILE"}
+SMF_LABELS = {"FILENAME": "NAME", "TITLE": "TITLE", "OBSERVER": "OBSERVER"}
+
+
+def maskgen_version(tool_directory):
+    """
+    Identifies the maskgen build: MASKGEN_VERSION if configured, otherwise the
+    size and mtime of the binary, so an upgrade invalidates cached results.
+    """
+    if settings.MASKGEN_VERSION:
+        return settings.MASKGEN_VERSION
+    try:
+        info = os.stat(os.path.join(tool_directory, "maskgen"))
+    except OSError:
+        return "unknown"
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+def _semantic_lines(obs):
+    # the inputs' names and the comments only label the run; DATE stays, it
+    # sets the epoch maskgen computes positions for
+    for line in obs.splitlines(keepends=True):
+        words = line.split(None, 1)
+        if words and words[0] not in LABEL_KEYWORDS and line[0] not in "#!":
+            yield line
+
+
+def run_key(input_paths, tool_directory):
+    """
+    Cache key of a maskgen run: sha256 of the .obj inputs, the .obs without
+    the lines that only name or annotate the mask (LABEL_KEYWORDS and
+    comments), and the maskgen version
+    """
+    digest = hashlib.sha256()
+    for path in input_paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        if path.endswith(".obs"):
+            content = "".join(_semantic_lines(content.decode())).encode()
+        digest.update(content)
+        digest.update(b"\0")
+    digest.update(maskgen_version(tool_directory).encode())
+    return digest.hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(settings.MASKGEN_CACHE_DIR, key[:2], key)
+
+
+def _count(counter):
+    cache.add(counter, 0, timeout=None)
+    try:
+        cache.incr(counter)
+    except ValueError:
+        # evicted between add and incr
+        cache.set(counter, 1, timeout=None)
+
+
+def smf_labels(obs_path):
+    """
+    Returns:
+        dict: SMF header keyword -> value (NAME, TITLE, OBSERVER) as maskgen
+        would write them for the .obs file at obs_path
+    """
+    labels = {}
+    with open(obs_path) as f:
+        for line in f:
+            words = line.split(None, 1)
+            if words and words[0] in SMF_LABELS:
+                labels[SMF_LABELS[words[0]]] = (
+                    words[1].strip() if len(words) > 1 else ""
+                )
+    return labels
+
+
+def _copy_smf(source, smf_path, labels):
+    if not labels:
+        shutil.copyfile(source, smf_path)
+        return
+    with open(source) as f:
+        lines = f.readlines()
+    for number, line in enumerate(lines):
+        words = line.split(None, 1)
+        if words and words[0] in labels:
+            lines[number] = f"{words[0]} {labels[words[0]]}\n"
+        elif words and words[0] == "!.OC" and "NAME" in labels:
+            # the observing catalog line starts with the mask name too
+            words = line.split(None, 2)
+            rest = f" {words[2]}" if len(words) > 2 else "\n"
+            lines[number] = f"!.OC {labels['NAME']}{rest}"
+    with open(smf_path, "w") as f:
+        f.writelines(lines)
+
+
+def fetch(key, smf_path, labels=None):
+    """
+    Serves a cached run: copies the stored SMF to smf_path and returns the run
+    dict (as runner.run_maskgen_isolated would, plus parsed features), or None
+    on a miss.
+
+    Args:
+        labels (dict): optional SMF header lines to rewrite (smf_labels), as
+            the cached SMF may come from a run with another name or title;
+            NAME also renames the mask on the !.OC line. MADE is left as it
+            is: it records when and by which maskgen the layout was made.
+    """
+    if not settings.MASKGEN_CACHE_MAX_BYTES:
+        return None
+    entry = _entry_path(key)
+    try:
+        with open(os.path.join(entry, OBW_NAME)) as f:
+            obw = f.read()
+        with open(os.path.join(entry, FEATURES_NAME)) as f:
+            features = json.load(f)
+        os.makedirs(os.path.dirname(smf_path), exist_ok=True)
+        _copy_smf(os.path.join(entry, SMF_NAME), smf_path, labels)
+        # mtime of the entry is its last use, for LRU eviction
+        os.utime(entry)
+    except (OSError, ValueError):
+        _count(MISSES_KEY)
+        return None
+    _count(HITS_KEY)
+    return {
+        "ok": True,
+        "feedback": "served from maskgen result cache",
+        "smf_path": smf_path,
+        "obw": obw,
+        "features": features,
+        "cached": True,
+    }
+
+
+def store(key, run):
+    """
+    Stores a successful run (SMF, .obw text and parsed features) and evicts
+    least recently used entries beyond MASKGEN_CACHE_MAX_BYTES.
+    """
+    if not settings.MASKGEN_CACHE_MAX_BYTES:
+        return
+    entry = _entry_path(key)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    # build the entry next to its final location, then publish it atomically
+    staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=".staging-")
+    try:
+        shutil.copyfile(run["smf_path"], os.path.join(staging, SMF_NAME))
+        with open(os.path.join(staging, OBW_NAME), "w") as f:
+            f.write(run["obw"])
+        with open(os.path.join(staging, FEATURES_NAME), "w") as f:
+            json.dump(run["features"], f)
+        os.rename(staging, entry)
+    except OSError:
+        # another process stored the same key first
+        shutil.rmtree(staging, ignore_errors=True)
+    evict(settings.MASKGEN_CACHE_MAX_BYTES)
+
+
+def _entries():
+    root = settings.MASKGEN_CACHE_DIR
+    if not os.path.isdir(root):
+        return []
+    entries = []
+    for prefix in os.scandir(root):
+        if not prefix.is_dir():
+            continue
+        for entry in os.scandir(prefix.path):
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            entries.append((entry.stat().st_mtime, size, entry.path))
+    return entries
+
+
+def evict(max_bytes):
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def stats():
+    entries = _entries()
+    return {
+        "hits": cache.get(HITS_KEY, 0),
+        "misses": cache.get(MISSES_KEY, 0),
+        "entries": len(entries),
+        "bytes": sum(size for _, size, _ in entries),
+        "max_bytes": settings.MASKGEN_CACHE_MAX_BYTES,
+    }
@@ -0,0 +1,102 @@
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+
+from .healpix import box_ranges, cone_ranges, separation, unit_vectors
+
+COORDINATE_FIELDS = ["right_ascension", "declination"]
+
+
+def _in_ranges(queryset, ranges, user_id):
+    # None: the region is too large for pixel ranges to narrow anything
+    if ranges is None:
+        return queryset if user_id is None else queryset.filter(user_id=user_id)
+    # with user_id in every term SQLite seeks (user_id, healpix) once per range
+    # instead of scanning all of the user's objects
+    owner = {} if user_id is None else {"user_id": user_id}
+    return queryset.filter(
+        reduce(
+            or_,
+            (
+                Q(**owner, healpix__gte=start, healpix__lt=stop)
+                for start, stop in ranges
+            ),
+        )
+    )
+
+
+def objects_in_cone(queryset, ra, dec, radius, fields, user_id=None):
+    """
+    Objects within radius degrees of (ra, dec)
+
+    The (user_id, healpix) index turns the cone into a few range scans, the
+    unit vectors drop what the pixels hold outside the cone in SQL, and exact
+    distances are computed for what is left.
+
+    Args:
+        queryset: Objects to search
+        fields (list): Object fields of the returned rows
+        user_id (str): only the objects of this user
+
+    Returns:
+        list: rows (fields) sorted by distance, each with its distance in
+        degrees
+    """
+    x0, y0, z0 = (float(value) for value in unit_vectors(ra, dec))
+    # a little slack for rounding, the exact cut is below
+    min_cos = math.cos(math.radians(min(radius + 1e-9, 180.0)))
+    queryset = (
+        _in_ranges(queryset, cone_ranges(ra, dec, radius), user_id)
+        .alias(cos_distance=F("unit_x") * x0 + F("unit_y") * y0 + F("unit_z") * z0)
+        .filter(cos_distance__gte=min_cos)
+    )
+    rows = list(queryset.values(*_with_coordinates(fields)))
+    if not rows:
+        return []
+    distances = separation(
+        ra,
+        dec,
+        [row["right_ascension"] for row in rows],
+        [row["declination"] for row in rows],
+    )
+    inside = [
+        _only(row, fields) | {"distance": float(distance)}
+        for row, distance in zip(rows, distances)
+        if distance <= radius
+    ]
+    return sorted(inside, key=lambda row: row["distance"])
+
+
+def objects_in_box(queryset, ra_min, ra_max, dec_min, dec_max, fields, user_id=None):
+    """
+    Objects with dec_min <= dec <= dec_max and RA from ra_min to ra_max
+    (degrees; ra_min > ra_max wraps through RA 0, a span of 360 or more is
+    every RA), see objects_in_cone
+
+    Returns:
+        list: rows (fields) in id order
+    """
+    ranges = box_ranges(ra_min, ra_max, dec_min, dec_max)
+    queryset = _in_ranges(queryset, ranges, user_id)
+    queryset = queryset.filter(declination__gte=dec_min, declination__lte=dec_max)
+    if ra_max - ra_min >= 360:
+        pass  # every RA
+    elif ra_min <= ra_max:
+        queryset = queryset.filter(
+            right_ascension__gte=ra_min, right_ascension__lte=ra_max
+        )
+    else:
+        queryset = queryset.filter(
+            Q(right_ascension__gte=ra_min) | Q(right_ascension__lte=ra_max)
+        )
+    return list(queryset.order_by("id").values(*fields))
+
+
+def _with_coordinates(fields):
+    return list(fields) + [field for field in COORDINATE_FIELDS if field not in fields]
+
+
+def _only(row, fields):
+    return {field: row[field] for field in fields}
@@ -0,0 +1,55 @@
+"""
+Strong ETags and If-None-Match handling for the read endpoints
+
+An ETag is built from what identifies a representation without producing it:
+the row's id and revision counter (or the instrument config's version and
+content, or the file's stat for images) plus the query parameters that select
+the representation. Views compute it from a cheap lookup and answer 304
+before running the queries and serialization of the full response.
+"""
+
+import hashlib
+
+from django.db.models import F
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag of parts and the request's query parameters
+    """
+    params = sorted(request.query_params.lists())
+    digest = hashlib.sha256(repr((parts, params)).encode()).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def with_etag(response, etag):
+    # responses depend on the user-id header, and clients must revalidate
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["user-id"])
+    return response
+
+
+def not_modified(request, etag):
+    """
+    Returns:
+        HttpResponse | None: a 304 if the request's If-None-Match matches etag
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return with_etag(response, etag)
+    return None
+
+
+def bump_revision(queryset):
+    """
+    Increments the revision counter of every row in queryset (Mask or
+    ObjectList), invalidating their ETags
+    """
+    return queryset.update(revision=F("revision") + 1)
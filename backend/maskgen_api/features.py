@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+from django.db.models import Q
+
+from .models import MaskFeature
+
+FEATURE_BATCH_SIZE = 2000
+FEATURE_FIELDS = [
+    "type",
+    "object_name",
+    "ra",
+    "dec",
+    "x",
+    "y",
+    "width",
+    "a_len",
+    "b_len",
+    "angle",
+    "shape_code",
+]
+
+
+def store_features(mask, features):
+    """
+    Bulk inserts the MaskFeature rows of a mask
+
+    Args:
+        mask (Mask): the mask
+        features (list): feature dicts as stored in Mask.features (see
+            SMF.features)
+    """
+    MaskFeature.objects.bulk_create(
+        [
+            MaskFeature(
+                mask=mask,
+                type=feature["type"],
+                object_name=feature["id"],
+                ra=feature["ra_deg"],
+                dec=feature["dec_deg"],
+                x=feature["x"],
+                y=feature["y"],
+                width=feature["width"],
+                a_len=feature["a_len"],
+                b_len=feature["b_len"],
+                angle=feature["angle"],
+                shape_code=feature.get("shape_code"),
+            )
+            for feature in features
+        ],
+        batch_size=FEATURE_BATCH_SIZE,
+    )
+
+
+def in_box(queryset, xmin, xmax, ymin, ymax):
+    return queryset.filter(x__gte=xmin, x__lte=xmax, y__gte=ymin, y__lte=ymax)
+
+
+def in_cone(queryset, ra, dec, radius):
+    """
+    Features within radius degrees of (ra, dec)
+
+    The (mask, dec, ra) index narrows the search to the bounding box of the
+    cone, then exact angular distances are computed for what is left.
+
+    Returns:
+        list: feature dicts (FEATURE_FIELDS) sorted by distance, each with its
+        distance in degrees
+    """
+    queryset = queryset.filter(dec__gte=dec - radius, dec__lte=dec + radius)
+    if abs(dec) + radius < 90.0:
+        # widest RA extent of the cone
+        half_width = math.degrees(
+            math.asin(math.sin(math.radians(radius)) / math.cos(math.radians(dec)))
+        )
+        low, high = (ra - half_width) % 360, (ra + half_width) % 360
+        if low <= high:
+            queryset = queryset.filter(ra__gte=low, ra__lte=high)
+        else:
+            # the box wraps around RA = 0
+            queryset = queryset.filter(Q(ra__gte=low) | Q(ra__lte=high))
+
+    rows = list(queryset.values(*FEATURE_FIELDS))
+    if not rows:
+        return []
+    ras = np.radians([row["ra"] for row in rows])
+    decs = np.radians([row["dec"] for row in rows])
+    ra0, dec0 = np.radians(ra), np.radians(dec)
+    # haversine, accurate at small separations
+    hav = (
+        np.sin((decs - dec0) / 2) ** 2
+        + np.cos(decs) * np.cos(dec0) * np.sin((ras - ra0) / 2) ** 2
+    )
+    distances = np.degrees(2 * np.arcsin(np.sqrt(np.clip(hav, 0, 1))))
+    inside = [
+        row | {"distance": float(distance)}
+        for row, distance in zip(rows, distances)
+        if distance <= radius
+    ]
+    return sorted(inside, key=lambda row: row["distance"])
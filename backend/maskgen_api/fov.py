@@ -0,0 +1,121 @@
+"""
+Field-of-view prefilter for the objects handed to maskgen
+
+Objects are projected onto the mask (gnomonic projection about the field
+center, rotated by the position angle, scaled by the telescope's focal length)
+and those outside the instrument's usable field plus a margin are left out of
+the .obj file, so maskgen doesn't spend time rejecting them.
+"""
+
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .instruments import get_config
+from .obs_file_formatting import coords_to_deg
+
+# mm, as maskgen writes it on the TELESCOPE line of an SMF
+FOCAL_LENGTHS = {"Magellan": 71139.8}
+
+# usable field on the mask: ("circle", radius) or ("square", half side) in
+# arcmin, for instruments whose config doesn't give field_shape/field_size.
+# maskgen places f/2 slits up to about 14.9' from the center, beyond the
+# camera's nominal 27.4' diameter.
+FIELDS = {
+    "IMACS_sc": ("circle", 15.0),
+    "IMACS_f2": ("circle", 15.0),
+    "IMACS_f4": ("square", 7.7),
+    "LDSS": ("circle", 4.15),
+}
+
+
+def focal_plane(ra, dec, center_ra, center_dec, position=0.0, focal_length=None):
+    """
+    Mask coordinates of sky positions, like the x/y of SMF slits (x grows to
+    the west at position angle 0)
+
+    Args:
+        ra, dec (array-like): degrees
+        center_ra, center_dec (float): field center, degrees
+        position (float): position angle of the mask's +y axis, degrees east
+            of north
+        focal_length (float): mm, FOCAL_LENGTHS["Magellan"] by default
+
+    Returns:
+        (ndarray, ndarray): x, y in mm; NaN for positions 90 degrees or more
+        from the center
+    """
+    focal_length = focal_length or FOCAL_LENGTHS["Magellan"]
+    ra = np.radians(np.asarray(ra, dtype=np.float64))
+    dec = np.radians(np.asarray(dec, dtype=np.float64))
+    ra0, dec0 = math.radians(center_ra), math.radians(center_dec)
+    cos_c = math.sin(dec0) * np.sin(dec) + math.cos(dec0) * np.cos(dec) * np.cos(
+        ra - ra0
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_c = np.where(cos_c > 0, cos_c, np.nan)  # the far hemisphere
+        xi = np.cos(dec) * np.sin(ra - ra0) / cos_c  # east
+        eta = (
+            math.cos(dec0) * np.sin(dec)
+            - math.sin(dec0) * np.cos(dec) * np.cos(ra - ra0)
+        ) / cos_c  # north
+    theta = math.radians(position)
+    x = focal_length * (-xi * math.cos(theta) + eta * math.sin(theta))
+    y = focal_length * (xi * math.sin(theta) + eta * math.cos(theta))
+    return x, y
+
+
+def in_field(x, y, field, margin):
+    """
+    Args:
+        x, y (ndarray): mask coordinates, mm
+        field (tuple): ("circle", radius) or ("square", half side), mm
+        margin (float): mm added to the field
+
+    Returns:
+        ndarray: bool per position
+    """
+    shape, size = field
+    limit = size + margin
+    with np.errstate(invalid="ignore"):
+        if shape == "circle":
+            return np.hypot(x, y) <= limit
+        return (np.abs(x) <= limit) & (np.abs(y) <= limit)
+
+
+def field_filter(setup, spec=None):
+    """
+    Prefilter for an instrument setup
+
+    Args:
+        setup (dict): instrument setup of a generate request; fov_margin (mm)
+            overrides settings.FOV_MARGIN_MM
+        spec (InstrumentSpec): optional, the setup's instrument config
+
+    Returns:
+        callable | None: keep(ra, dec) -> bool array, or None when the
+        field or the center is unknown and every object goes to maskgen
+    """
+    spec = spec or get_config(setup.get("instrument"))
+    field = (spec and spec.field_of_view) or FIELDS.get(setup.get("instrument"))
+    if field is None:
+        return None
+    try:
+        (center_ra,), (center_dec,) = coords_to_deg(
+            [setup["center_ra"]], [setup["center_dec"]]
+        )
+        position = float(setup.get("position") or 0.0)
+        margin = float(setup.get("fov_margin", settings.FOV_MARGIN_MM))
+    except (KeyError, TypeError, ValueError):
+        # maskgen reports a bad center itself
+        return None
+    focal_length = FOCAL_LENGTHS.get(setup.get("telescope"), FOCAL_LENGTHS["Magellan"])
+    shape, size = field
+    size_mm = focal_length * math.radians(size / 60)
+
+    def keep(ra, dec):
+        x, y = focal_plane(ra, dec, center_ra, center_dec, position, focal_length)
+        return in_field(x, y, (shape, size_mm), margin)
+
+    return keep
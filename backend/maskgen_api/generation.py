@@ -0,0 +1,431 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .models import Mask, Status, ToolRun
+from .obs_file_formatting import (
+    generate_obj_file,
+    generate_obs_file,
+    categorize_objs,
+    get_objects,
+)
+from . import artifact_cache
+from .features import store_features
+from .fov import field_filter
+from .instruments import get_config, latest_version
+from .runner import init_pool_worker, run_in_pool_worker, run_maskgen_isolated
+from .smf import read_smf
+from django.conf import settings
+from backend.terminal_helper import STOP_POLL_INTERVAL
+
+MASKGEN_DIRECTORY = "/Users/maylinchen/downloads/maskgen-2.14-Darwin-12.6_arm64/"
+PROJECT_DIRECTORY = os.getcwd() + "/"
+API_FOLDER = "maskgen_api/"
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+def read_features(filepath):
+    """
+    Slits and holes of an SMF as the dicts stored in Mask.features
+    """
+    return read_smf(filepath).features()
+
+
+def _smf_path(user_id, proj_name, filename):
+    return (
+        f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{filename}.SMF"
+    )
+
+
+def tool_limits(tool, size):
+    """
+    Timeout and rlimits for one run of tool on size objects/features, from
+    settings.TOOL_TIMEOUTS and TOOL_MEMORY_LIMIT
+
+    Returns:
+        (float, dict): timeout in seconds and limits for run_session
+    """
+    config = settings.TOOL_TIMEOUTS[tool]
+    timeout = min(config["base"] + config["per_item"] * size, config["max"])
+    limits = {
+        "cpu_seconds": math.ceil(timeout),
+        "memory_bytes": settings.TOOL_MEMORY_LIMIT,
+    }
+    return timeout, limits
+
+
+def record_tool_run(tool, user_id, size, timeout, metrics):
+    if metrics is None:
+        return None
+    return ToolRun.objects.create(
+        tool=tool,
+        user_id=user_id,
+        size=size,
+        timeout=timeout,
+        duration=metrics["duration"],
+        cpu_seconds=metrics.get("cpu_seconds"),
+        max_rss=metrics.get("max_rss"),
+        exit_status=metrics["exit_status"],
+        timed_out=metrics["timed_out"],
+    )
+
+
+def _prepare_run(user_id, proj_name, data):
+    """
+    Writes the .obj/.obs inputs for one mask, without the objects outside the
+    instrument's field (fov.field_filter)
+
+    Returns:
+        (dict, int, list): keyword arguments for runner.run_maskgen_isolated,
+        with a timeout sized to the object count, the object count and the
+        ids of the objects pruned as outside the field
+    """
+    filename = data["filename"]
+    obj_file, object_count, pruned = generate_obj_file(
+        user_id, proj_name, filename, data["objects"], field_filter(data)
+    )
+    obj_path = os.path.join(os.path.dirname(__file__), obj_file)
+    obs_path = generate_obs_file(user_id, proj_name, data, [f"{filename}.obj"])
+    timeout, limits = tool_limits("maskgen", object_count)
+    return (
+        {
+            "filename": filename,
+            "input_paths": [obj_path, obs_path],
+            "smf_path": _smf_path(user_id, proj_name, filename),
+            "override": data.get("override") in (True, "true"),
+            "tool_directory": MASKGEN_DIRECTORY,
+            "scratch_root": settings.MASKGEN_SCRATCH_ROOT,
+            "timeout": timeout,
+            "limits": limits,
+        },
+        object_count,
+        pruned,
+    )
+
+
+def _finish_run(user_id, key, run_kwargs, object_count, run):
+    # metrics are recorded here in the parent, pool workers stay off the database
+    record_tool_run(
+        "maskgen", user_id, object_count, run_kwargs["timeout"], run.get("metrics")
+    )
+    # parse the SMF once and keep the result for identical future requests
+    if run["ok"]:
+        run["features"] = read_features(run["smf_path"])
+        artifact_cache.store(key, run)
+    return run
+
+
+def _fetch_cached(run_kwargs):
+    """
+    Returns:
+        (str, dict | None): artifact cache key of a run and the cached run,
+        its SMF named and titled for this request, or None
+    """
+    key = artifact_cache.run_key(
+        run_kwargs["input_paths"], run_kwargs["tool_directory"]
+    )
+    obs_path = next(p for p in run_kwargs["input_paths"] if p.endswith(".obs"))
+    run = artifact_cache.fetch(
+        key, run_kwargs["smf_path"], artifact_cache.smf_labels(obs_path)
+    )
+    return key, run
+
+
+def _run_with_cache(
+    user_id, run_kwargs, object_count, on_output=None, should_stop=None
+):
+    key, run = _fetch_cached(run_kwargs)
+    if run is None:
+        run = run_maskgen_isolated(
+            **run_kwargs, on_output=on_output, should_stop=should_stop
+        )
+        run = _finish_run(user_id, key, run_kwargs, object_count, run)
+    elif on_output:
+        on_output(run["feedback"] + "\n")
+    return run
+
+
+def _save_mask(user_id, proj_name, data, project, run, pruned=()):
+    """
+    Stores the Mask for a finished maskgen run
+
+    Args:
+        pruned (list): ids of the objects left out as outside the field,
+            stored in the mask's pruned_obj_list
+
+    Returns:
+        Mask | None, str: the mask, or None and an error message
+    """
+    if not run["ok"]:
+        return None, run["feedback"]
+
+    # process features from SMF
+    mask = Mask.objects.create(
+        name=data["filename"],
+        user_id=user_id,
+        status=Status.DRAFT,
+        center_ra=data["center_ra"],
+        center_dec=data["center_dec"],
+        instrument_setup=data,
+        instrument_version=latest_version(data["instrument"]),
+        features=run["features"],
+    )
+    store_features(mask, run["features"])
+
+    result, feedback = categorize_objs(
+        mask, run["obw"], get_objects(user_id, proj_name, data["objects"])
+    )
+    if not result:
+        return None, feedback
+    through = Mask.pruned_obj_list.through
+    through.objects.bulk_create(
+        [through(mask_id=mask.id, object_id=object_id) for object_id in pruned]
+    )
+
+    project.masks.add(mask)
+    return mask, ""
+
+
+def generate_single_mask(
+    user_id, proj_name, data, project, on_output=None, should_cancel=None
+):
+    """
+    Runs maskgen for one instrument setup and stores the resulting Mask
+
+    Args:
+        on_output (callable): optional, receives maskgen's output as it runs
+        should_cancel (callable): optional, polled while maskgen runs;
+            returning True kills it and raises GenerationCancelled
+
+    Returns:
+        (bool, dict, int): success, response payload ({"created": smf path,
+        "pruned": objects outside the field} or {"error": maskgen output}) and
+        the number of excluded objects
+    """
+    run_kwargs, object_count, pruned = _prepare_run(user_id, proj_name, data)
+    run = _run_with_cache(user_id, run_kwargs, object_count, on_output, should_cancel)
+    if run.get("metrics", {}).get("stopped"):
+        raise GenerationCancelled(data["filename"])
+    mask, feedback = _save_mask(user_id, proj_name, data, project, run, pruned)
+    if mask is None:
+        return False, {"error": feedback}, None
+    return (
+        True,
+        {"created": run["smf_path"], "pruned": len(pruned)},
+        mask.excluded_obj_list.count(),
+    )
+
+
+def sweep_rotator(
+    user_id,
+    proj_name,
+    data,
+    project,
+    angles,
+    should_cancel=None,
+    on_output=None,
+    on_progress=None,
+):
+    """
+    Generates one mask per rotator angle, running the maskgen invocations in
+    parallel on a process pool bounded by the CPU count. Masks are stored as
+    the runs finish. Pool runs can't stream, so on_output gets each run's
+    transcript once it is done. should_cancel is polled every
+    STOP_POLL_INTERVAL seconds; cancelling stops the runs in progress too.
+
+    Returns:
+        (bool, dict): success and payload with the created masks in angle
+        order and a summary ranking the angles by included objects
+    """
+    filename = data["filename"]
+    setups = {}
+    for angle in angles:
+        setup = dict(data)
+        setup["rotator_angle"] = angle
+        setup["position"] = angle
+        setup["filename"] = filename + f"_rot{angle}"
+        setups[angle] = setup
+
+    summary = []
+    errors = {}
+    pruned = {}  # the field turns with the rotator, so this varies by angle
+
+    def finished(angle, ok):
+        if on_progress:
+            on_progress(
+                {
+                    "stage": "finished",
+                    "mask": setups[angle]["filename"],
+                    "ok": ok,
+                    "completed": len(summary) + len(errors) + 1,
+                    "total": len(angles),
+                }
+            )
+
+    def save(angle, run):
+        if on_output:
+            on_output(f"[{setups[angle]['filename']}]\n{run['feedback']}\n")
+        mask, feedback = _save_mask(
+            user_id, proj_name, setups[angle], project, run, pruned[angle]
+        )
+        finished(angle, mask is not None)
+        if mask is None:
+            errors[angle] = feedback
+            return
+        summary.append(
+            {
+                "angle": angle,
+                "mask": mask.name,
+                "included": mask.objects_list.count(),
+                "excluded": mask.excluded_obj_list.count(),
+                "pruned": len(pruned[angle]),
+                "cached": run.get("cached", False),
+            }
+        )
+
+    # angles whose exact inputs were generated before are served from the
+    # artifact cache; only the rest go to the pool
+    pending = {}
+    for angle, setup in setups.items():
+        run_kwargs, object_count, pruned[angle] = _prepare_run(
+            user_id, proj_name, setup
+        )
+        key, run = _fetch_cached(run_kwargs)
+        if run is None:
+            pending[angle] = (key, run_kwargs, object_count)
+        else:
+            save(angle, run)
+
+    if pending:
+        workers = min(len(pending), os.cpu_count() or 1)
+        context = multiprocessing.get_context(settings.MASKGEN_POOL_START_METHOD)
+        stop = context.Event()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_pool_worker,
+            initargs=(stop,),
+        ) as pool:
+            futures = {
+                pool.submit(run_in_pool_worker, **pending[angle][1]): angle
+                for angle in pending
+            }
+            running = set(futures)
+            while running:
+                done, running = wait(
+                    running,
+                    timeout=STOP_POLL_INTERVAL if should_cancel else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                if should_cancel and should_cancel():
+                    # queued runs are dropped, running ones kill their maskgen
+                    stop.set()
+                    pool.shutdown(cancel_futures=True)
+                    raise GenerationCancelled(filename)
+                for future in done:
+                    angle = futures[future]
+                    try:
+                        run = future.result()
+                    except Exception as e:  # e.g. BrokenProcessPool
+                        finished(angle, False)
+                        errors[angle] = f"maskgen run failed: {e!r}"
+                        continue
+                    save(angle, _finish_run(user_id, *pending[angle], run))
+
+    summary.sort(key=lambda entry: (-entry["included"], entry["excluded"]))
+    created = [setups[angle]["filename"] for angle in angles if angle not in errors]
+    payload = {"created": created, "summary": summary}
+    if errors:
+        payload["error"] = {str(angle): errors[angle] for angle in sorted(errors)}
+        return False, payload
+    return True, payload
+
+
+def generate_masks(
+    user_id,
+    proj_name,
+    data,
+    project,
+    should_cancel=None,
+    on_output=None,
+    on_progress=None,
+):
+    """
+    Generates one mask, a rotator sweep (vary_rotator_range) or masks until
+    every object is included (generate_until_all_included).
+
+    Args:
+        should_cancel (callable): optional, checked before and during each
+            maskgen run; returning True raises GenerationCancelled
+        on_output (callable): optional, receives maskgen's output
+        on_progress (callable): optional, receives a dict per stage
+            ({"stage": "running" | "finished", "mask", ...})
+
+    Returns:
+        (bool, dict): success and response payload
+    """
+    data = dict(data)
+    spec = get_config(data["instrument"])
+    if spec:
+        # slit/refhole sizes and wavelength limits the request leaves out
+        data = spec.setup_defaults() | data
+    filename = data["filename"]
+    generate_until_all = data.get("generate_until_all_included", False)
+    vary_rotator = data.get("vary_rotator_range")
+
+    def run(filename):
+        if should_cancel and should_cancel():
+            raise GenerationCancelled(filename)
+        data["filename"] = filename
+        if on_progress:
+            on_progress({"stage": "running", "mask": filename})
+        result, payload, excluded_count = generate_single_mask(
+            user_id, proj_name, data, project, on_output, should_cancel
+        )
+        if on_progress:
+            on_progress(
+                {
+                    "stage": "finished",
+                    "mask": filename,
+                    "ok": result,
+                    "excluded": excluded_count,
+                }
+            )
+        return result, payload, excluded_count
+
+    generated = []
+    if vary_rotator:
+        angles = range(
+            vary_rotator["start"], vary_rotator["end"] + 1, vary_rotator["step"]
+        )
+        if on_progress:
+            on_progress({"stage": "running", "mask": filename, "total": len(angles)})
+        return sweep_rotator(
+            user_id,
+            proj_name,
+            data,
+            project,
+            list(angles),
+            should_cancel,
+            on_output,
+            on_progress,
+        )
+    elif generate_until_all:
+        suffix_count = 1
+        excluded_count = 1
+        while excluded_count > 0:
+            result, payload, excluded_count = run(filename + f"_v{suffix_count}")
+            if not result:
+                return False, payload
+            generated.append(data["filename"])
+            suffix_count += 1
+        # the masks share center and position, so each one prunes the same
+        # objects (recorded in its pruned_obj_list); pruned counts them once
+        return True, {"created": generated, "pruned": payload["pruned"]}
+    else:
+        result, payload, _ = run(filename)
+        return result, payload
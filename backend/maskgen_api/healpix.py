@@ -0,0 +1,222 @@
+"""
+HEALPix (nested scheme) pixel indices and unit vectors for sky positions
+
+Objects store their pixel at HEALPIX_ORDER. In the nested scheme every pixel
+of a coarser order k covers the contiguous range
+[p << 2 (HEALPIX_ORDER - k), (p + 1) << 2 (HEALPIX_ORDER - k)) of the stored
+order, so a cone or box becomes a few index range scans on the pixel column:
+cover the region with coarse pixels (covering_pixels), turn them into ranges
+(pixel_ranges) and check exact distances on what the ranges return.
+"""
+
+import math
+
+import numpy as np
+
+HEALPIX_ORDER = 16  # nside 65536, pixels of about 3.2 arcsec
+_MAX_SAMPLES = 200_000
+
+
+def unit_vectors(ra, dec):
+    """
+    Args:
+        ra, dec (array-like): degrees
+
+    Returns:
+        (ndarray, ndarray, ndarray): x, y, z of the points on the unit sphere
+    """
+    ra, dec = np.radians(ra), np.radians(dec)
+    cos_dec = np.cos(dec)
+    return cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)
+
+
+def _spread_bits(values):
+    # moves bit i of each 32-bit value to bit 2i
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def ang2pix_nest(order, ra, dec):
+    """
+    Nested HEALPix pixel of each position
+
+    Args:
+        order (int): nside = 2**order, at most 29
+        ra, dec (array-like): degrees
+
+    Returns:
+        ndarray: int64 pixel indices
+    """
+    nside = 1 << order
+    ra = np.asarray(ra, dtype=np.float64)
+    z = np.sin(np.radians(np.asarray(dec, dtype=np.float64)))
+    za = np.abs(z)
+    tt = np.mod(np.radians(ra), 2 * np.pi) / (np.pi / 2)  # in [0, 4)
+    tt = np.where(tt >= 4.0, 0.0, tt)
+
+    # equatorial belt, |z| <= 2/3
+    temp1 = nside * (0.5 + tt)
+    temp2 = nside * z * 0.75
+    jp = (temp1 - temp2).astype(np.int64)  # ascending edge line
+    jm = (temp1 + temp2).astype(np.int64)  # descending edge line
+    ifp, ifm = jp >> order, jm >> order
+    face_eq = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix_eq = jm & (nside - 1)
+    iy_eq = nside - (jp & (nside - 1)) - 1
+
+    # polar caps
+    ntt = np.minimum(tt.astype(np.int64), 3)
+    tp = tt - ntt
+    tmp = nside * np.sqrt(3 * (1 - za))
+    jp_cap = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+    jm_cap = np.minimum(((1 - tp) * tmp).astype(np.int64), nside - 1)
+    north = z >= 0
+    face_cap = np.where(north, ntt, ntt + 8)
+    ix_cap = np.where(north, nside - jm_cap - 1, jp_cap)
+    iy_cap = np.where(north, nside - jp_cap - 1, jm_cap)
+
+    equatorial = za <= 2.0 / 3.0
+    face = np.where(equatorial, face_eq, face_cap)
+    ix = np.where(equatorial, ix_eq, ix_cap)
+    iy = np.where(equatorial, iy_eq, iy_cap)
+    within_face = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+    return face.astype(np.int64) * nside * nside + within_face.astype(np.int64)
+
+
+def pixel_size(order):
+    """
+    Mean angular size of a pixel in degrees
+    """
+    return math.degrees(math.sqrt(4 * math.pi / (12 * 4**order)))
+
+
+def _order_for(size):
+    # the coarsest pixels no larger than half of size keep the covering
+    # within about twice the cone's radius, with a few dozen ranges
+    order = 0
+    while order < HEALPIX_ORDER and pixel_size(order) > size / 2:
+        order += 1
+    return order
+
+
+def covering_pixels(ra, dec, order):
+    """
+    Pixels at order containing any of the sample positions
+    """
+    return np.unique(ang2pix_nest(order, ra, dec))
+
+
+def pixel_ranges(pixels, order):
+    """
+    Merged half-open [start, stop) ranges of HEALPIX_ORDER pixels covered by
+    the given pixels of a coarser order
+    """
+    shift = 2 * (HEALPIX_ORDER - order)
+    ranges = []
+    for pixel in np.unique(pixels).tolist():
+        start, stop = pixel << shift, (pixel + 1) << shift
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = stop
+        else:
+            ranges.append([start, stop])
+    return [tuple(bounds) for bounds in ranges]
+
+
+def _sample_tangent_disc(ra, dec, radius, spacing):
+    # square grid on the tangent plane at (ra, dec) covering a disc of radius
+    # degrees, projected back to the sphere (inverse gnomonic)
+    extent = math.tan(math.radians(min(radius, 80.0)))
+    steps = np.arange(-extent, extent + 1e-12, math.radians(spacing))
+    xi, eta = np.meshgrid(steps, steps)
+    xi, eta = xi.ravel(), eta.ravel()
+    inside = xi**2 + eta**2 <= extent**2 + 1e-12
+    xi, eta = xi[inside], eta[inside]
+    ra0, dec0 = math.radians(ra), math.radians(dec)
+    denominator = math.cos(dec0) - eta * math.sin(dec0)
+    sample_ra = ra0 + np.arctan2(xi, denominator)
+    sample_dec = np.arctan2(
+        math.sin(dec0) + eta * math.cos(dec0), np.hypot(xi, denominator)
+    )
+    return np.degrees(sample_ra) % 360, np.degrees(sample_dec)
+
+
+def cone_ranges(ra, dec, radius):
+    """
+    Pixel ranges at HEALPIX_ORDER that contain every position within radius
+    degrees of (ra, dec), or None when the cone is too large to be worth it
+
+    The cone is widened by the diagonal of a coarse pixel and sampled at a
+    quarter of the pixel size, so every coarse pixel touching the cone holds
+    at least one sample.
+    """
+    order = _order_for(max(radius, pixel_size(HEALPIX_ORDER)))
+    size = pixel_size(order)
+    # pixels are not square, their diagonal stays under twice the mean size
+    padded = radius + 2 * size
+    spacing = size / 4
+    if padded >= 60 or (2 * padded / spacing) ** 2 > _MAX_SAMPLES:
+        return None
+    sample_ra, sample_dec = _sample_tangent_disc(ra, dec, padded, spacing)
+    return pixel_ranges(covering_pixels(sample_ra, sample_dec, order), order)
+
+
+def box_ranges(ra_min, ra_max, dec_min, dec_max):
+    """
+    Pixel ranges covering an RA/Dec box (degrees; ra_min > ra_max wraps
+    through RA 0), from the cone around its center that contains its edges,
+    or None when that cone is too large or the box spans all of RA
+    """
+    if ra_max - ra_min >= 360:
+        # the width modulo 360 below would be 0, a strip at ra_min
+        return None
+    width = (ra_max - ra_min) % 360
+    ra = (ra_min + width / 2) % 360
+    dec = (dec_min + dec_max) / 2
+    # the farthest point of a box can be inside an edge, so walk the edges
+    steps = np.linspace(0, 1, 65)
+    edge_ra = np.concatenate(
+        [ra_min + width * steps] * 2 + [np.full(65, ra_min), np.full(65, ra_max)]
+    )
+    edge_dec = np.concatenate(
+        [
+            np.full(65, dec_min),
+            np.full(65, dec_max),
+            dec_min + (dec_max - dec_min) * steps,
+            dec_min + (dec_max - dec_min) * steps,
+        ]
+    )
+    return cone_ranges(ra, dec, float(separation(ra, dec, edge_ra, edge_dec).max()))
+
+
+def separation(ra, dec, other_ra, other_dec):
+    """
+    Angular distances in degrees between (ra, dec) and each other position,
+    accurate at small separations
+    """
+    x0, y0, z0 = unit_vectors(ra, dec)
+    x, y, z = unit_vectors(other_ra, other_dec)
+    chord = np.sqrt((x - x0) ** 2 + (y - y0) ** 2 + (z - z0) ** 2)
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+
+SKY_FIELDS = ["healpix", "unit_x", "unit_y", "unit_z"]
+
+
+def sky_columns(ra, dec):
+    """
+    Values of the Object SKY_FIELDS for each position
+
+    Returns:
+        list: (healpix, unit_x, unit_y, unit_z) tuples of Python scalars
+    """
+    pixels = ang2pix_nest(HEALPIX_ORDER, ra, dec)
+    x, y, z = unit_vectors(ra, dec)
+    return list(zip(pixels.tolist(), x.tolist(), y.tolist(), z.tolist()))
@@ -0,0 +1,142 @@
+from itertools import islice
+
+import pandas as pd
+from django.db import transaction
+
+from .healpix import sky_columns
+from .models import Object, ObjectList
+from .obs_file_formatting import coords_to_deg
+
+BATCH_SIZE = 2000
+REQUIRED_COLUMNS = ["name", "type", "ra", "dec", "priority"]
+
+
+def _batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def row_batches(rows, batch_size=BATCH_SIZE):
+    """
+    Groups catalog rows (dicts, e.g. from JSON or the .obj parser) into column
+    batches. Keys other than the required columns end up in aux.
+
+    Raises:
+        ValueError: on a row without one of the required columns
+    """
+    for start, batch in enumerate(_batched(rows, batch_size)):
+        for number, row in enumerate(batch, start * batch_size + 1):
+            missing = [column for column in REQUIRED_COLUMNS if column not in row]
+            if missing:
+                raise ValueError(f"row {number} is missing required columns: {missing}")
+        columns = {
+            column: [row.pop(column) for row in batch] for column in REQUIRED_COLUMNS
+        }
+        columns["aux"] = batch
+        yield columns
+
+
+def _lazy_aux(chunk, aux_columns):
+    # aux dicts are only built while the Object rows for this chunk are made
+    if not aux_columns:
+        # zip() of no columns would yield no rows at all
+        for _ in range(len(chunk)):
+            yield {}
+        return
+    for values in zip(*(chunk[column] for column in aux_columns)):
+        yield {
+            column: value.item() if hasattr(value, "item") else value
+            for column, value in zip(aux_columns, values)
+            if not pd.isna(value)
+        }
+
+
+def csv_batches(file, batch_size=BATCH_SIZE):
+    """
+    Columnar CSV reader
+
+    Reads the file in chunks of batch_size rows so peak memory is bounded by
+    the chunk, not the catalog. The required columns are handed over as arrays;
+    any other columns are packed into per-object aux dicts lazily.
+    """
+    for chunk in pd.read_csv(file, chunksize=batch_size, skipinitialspace=True):
+        missing = [column for column in REQUIRED_COLUMNS if column not in chunk]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {missing}")
+        columns = {column: chunk[column].to_numpy() for column in REQUIRED_COLUMNS}
+        aux_columns = [column for column in chunk.columns if column not in columns]
+        columns["aux"] = _lazy_aux(chunk, aux_columns)
+        yield columns
+
+
+def bulk_create_objects(obj_list, user_id, batches):
+    """
+    Inserts column batches as Objects and links them to an ObjectList.
+
+    Each batch is one multi-row INSERT into the Object table followed by one
+    multi-row INSERT into the ObjectList<->Object through table. Callers should
+    run this inside a transaction so a failed upload leaves nothing behind.
+
+    Args:
+        obj_list (ObjectList): list the new objects are added to
+        user_id (str): owner of the objects
+        batches (iterable): dicts of equal-length name, type, ra, dec, priority
+            and aux columns (see row_batches and csv_batches)
+
+    Returns:
+        int: number of objects created
+    """
+    through = ObjectList.objects_list.through
+    created = 0
+    for columns in batches:
+        # convert hours to degs if in hrs, one pass per batch
+        ras, decs = coords_to_deg(columns["ra"], columns["dec"])
+        objs = [
+            Object(
+                name=str(name),
+                user_id=user_id,
+                type=str(obj_type),
+                right_ascension=float(ra),
+                declination=float(dec),
+                priority=int(priority),
+                aux=aux,
+                healpix=healpix,
+                unit_x=x,
+                unit_y=y,
+                unit_z=z,
+            )
+            for name, obj_type, ra, dec, priority, aux, (healpix, x, y, z) in zip(
+                columns["name"],
+                columns["type"],
+                ras,
+                decs,
+                columns["priority"],
+                columns["aux"],
+                sky_columns(ras, decs),
+            )
+        ]
+        objs = Object.objects.bulk_create(objs)
+        through.objects.bulk_create(
+            [through(objectlist_id=obj_list.id, object_id=obj.id) for obj in objs]
+        )
+        created += len(objs)
+    return created
+
+
+@transaction.atomic
+def ingest_object_list(user_id, list_name, proj_name, project, batches):
+    """
+    Creates an ObjectList from column batches in a single transaction and makes
+    it the project's object list.
+
+    Returns:
+        (ObjectList, int): the new list and the number of objects created
+    """
+    obj_list = ObjectList.objects.create(
+        name=list_name, user_id=user_id, project_name=proj_name
+    )
+    created = bulk_create_objects(obj_list, user_id, batches)
+    project.obj_list = obj_list
+    project.save()
+    return obj_list, created
@@ -0,0 +1,140 @@
+"""
+Instrument config registry on Django's cache
+
+Configs are looked up on every mask generation and instrument retrieve, but
+only change through uploadconfig. They are cached as typed InstrumentSpecs
+keyed by (instrument, version), plus a "latest" entry per instrument holding
+its newest version number; saving or deleting an InstrumentConfig invalidates
+both. With a shared cache backend (DJANGO_CACHE_BACKEND) every worker process
+sees the invalidation; with the per-process default, INSTRUMENT_CACHE_TIMEOUT
+bounds how long another process can serve a stale "latest".
+"""
+
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import InstrumentConfig
+
+# instrument setup keys an instrument config can give defaults for in its aux
+SLIT_DEFAULT_KEYS = [
+    "slit_width",
+    "a_len",
+    "b_len",
+    "slit_tilt",
+    "refhole_width",
+    "refhole_shape",
+    "refhole_a_len",
+    "refhole_b_len",
+    "refhole_orient_deg",
+]
+
+
+@dataclass(frozen=True)
+class InstrumentSpec:
+    instrument: str
+    version: int
+    filters: dict
+    dispersers: dict
+    slit_defaults: dict  # SLIT_DEFAULT_KEYS found in aux
+    wlimit: tuple[float, float] | None  # Angstrom, from aux wlimit_low/high
+    # ("circle" | "square", radius | half side in arcmin), from aux
+    # field_shape/field_size
+    field_of_view: tuple[str, float] | None = None
+    aux: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, config):
+        aux = config.aux or {}
+        wlimit = None
+        if "wlimit_low" in aux and "wlimit_high" in aux:
+            wlimit = (float(aux["wlimit_low"]), float(aux["wlimit_high"]))
+        field_of_view = None
+        if aux.get("field_shape") in ("circle", "square") and "field_size" in aux:
+            field_of_view = (aux["field_shape"], float(aux["field_size"]))
+        return cls(
+            instrument=config.instrument,
+            version=config.version,
+            filters=config.filters,
+            dispersers=config.dispersers,
+            slit_defaults={key: aux[key] for key in SLIT_DEFAULT_KEYS if key in aux},
+            wlimit=wlimit,
+            field_of_view=field_of_view,
+            aux=aux,
+        )
+
+    def setup_defaults(self):
+        """
+        Instrument setup values this config provides, for keys a generate
+        request leaves out
+        """
+        defaults = dict(self.slit_defaults)
+        if self.wlimit:
+            defaults["wlimit_low"], defaults["wlimit_high"] = self.wlimit
+        return defaults
+
+
+def _config_key(instrument, version):
+    return f"instrument_config:{instrument}:{version}"
+
+
+def _latest_key(instrument):
+    return f"instrument_config:{instrument}:latest"
+
+
+def latest_version(instrument):
+    """
+    Returns:
+        int | None: newest version of instrument's config, None if there is none
+    """
+    version = cache.get(_latest_key(instrument))
+    if version is None:
+        version = (
+            InstrumentConfig.objects.filter(instrument=instrument)
+            .order_by("-version")
+            .values_list("version", flat=True)
+            .first()
+        )
+        if version is not None:
+            cache.set(
+                _latest_key(instrument), version, settings.INSTRUMENT_CACHE_TIMEOUT
+            )
+    return version
+
+
+def get_config(instrument, version=None):
+    """
+    Args:
+        version (int): optional, the latest version if None
+
+    Returns:
+        InstrumentSpec | None
+    """
+    if version is None:
+        version = latest_version(instrument)
+        if version is None:
+            return None
+    key = _config_key(instrument, version)
+    spec = cache.get(key)
+    if spec is None:
+        config = InstrumentConfig.objects.filter(
+            instrument=instrument, version=version
+        ).first()
+        if config is None:
+            return None
+        spec = InstrumentSpec.from_config(config)
+        # a stored version doesn't change, only saves invalidate it
+        cache.set(key, spec, timeout=None)
+    return spec
+
+
+def invalidate(instrument, version):
+    cache.delete_many([_config_key(instrument, version), _latest_key(instrument)])
+
+
+def _on_change(sender, instance, **kwargs):
+    invalidate(instance.instrument, instance.version)
+    # again after commit, a reader may have cached the old rows in between
+    transaction.on_commit(lambda: invalidate(instance.instrument, instance.version))
@@ -0,0 +1,199 @@
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .generation import GenerationCancelled, generate_masks
+from .models import Job, JobEvent, JobEventKind, JobStatus, Project
+
+
+def claim_next_job(worker):
+    """
+    Atomically moves the oldest queued job to RUNNING for this worker.
+
+    The conditional UPDATE makes the claim safe when several worker processes
+    poll the same table, without relying on SELECT ... FOR UPDATE.
+
+    Returns:
+        Job | None: the claimed job, or None if the queue is empty
+    """
+    while True:
+        job_id = (
+            Job.objects.filter(status=JobStatus.QUEUED)
+            .order_by("id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(id=job_id, status=JobStatus.QUEUED).update(
+            status=JobStatus.RUNNING, worker=worker, started_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+
+def _worker_alive(worker):
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True  # can't tell from here
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def fail_stale_jobs(stale_after=None):
+    """
+    Fails RUNNING jobs whose worker died before finishing them: those of
+    workers on this host that no longer exist, and any started more than
+    stale_after seconds (MASKGEN_JOB_STALE_AFTER) ago. They are not requeued,
+    as the job itself may be what killed the worker.
+
+    Returns:
+        int: number of jobs failed
+    """
+    if stale_after is None:
+        stale_after = settings.MASKGEN_JOB_STALE_AFTER
+    running = Job.objects.filter(status=JobStatus.RUNNING)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    dead = [
+        worker
+        for worker in running.values_list("worker", flat=True).distinct()
+        if not _worker_alive(worker)
+    ]
+    stale = running.filter(Q(worker__in=dead) | Q(started_at__lt=cutoff))
+    return stale.update(
+        status=JobStatus.FAILED,
+        error="the worker stopped without finishing the job",
+        finished_at=timezone.now(),
+    )
+
+
+def cancel_requested(job_id):
+    return Job.objects.filter(id=job_id, cancel_requested=True).exists()
+
+
+class JobEventLog:
+    """
+    Stores a running job's maskgen output as JobEvents of whole lines, at
+    most every flush_interval seconds, and its progress as they happen
+    """
+
+    def __init__(self, job_id, flush_interval=None):
+        self.job_id = job_id
+        self.flush_interval = (
+            settings.JOB_OUTPUT_FLUSH_INTERVAL
+            if flush_interval is None
+            else flush_interval
+        )
+        self.lines = []
+        self.partial = ""
+        self.flushed_at = time.monotonic()
+
+    def output(self, chunk):
+        *lines, self.partial = (self.partial + chunk).split("\n")
+        self.lines.extend(lines)
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def progress(self, data):
+        self.flush()
+        JobEvent.objects.create(
+            job_id=self.job_id, kind=JobEventKind.PROGRESS, data=data
+        )
+
+    def flush(self, final=False):
+        if final and self.partial:
+            self.lines.append(self.partial)
+            self.partial = ""
+        if self.lines:
+            JobEvent.objects.create(
+                job_id=self.job_id, kind=JobEventKind.OUTPUT, data={"lines": self.lines}
+            )
+            self.lines = []
+        self.flushed_at = time.monotonic()
+
+
+def run_job(job):
+    def finish(job_status, result=None, error=""):
+        Job.objects.filter(id=job.id).update(
+            status=job_status,
+            result=result,
+            error=error,
+            finished_at=timezone.now(),
+        )
+
+    events = JobEventLog(job.id)
+    try:
+        project = Project.objects.get(name=job.project_name, user_id=job.user_id)
+        try:
+            result, payload = generate_masks(
+                job.user_id,
+                job.project_name,
+                job.payload,
+                project,
+                should_cancel=lambda: cancel_requested(job.id),
+                on_output=events.output,
+                on_progress=events.progress,
+            )
+        finally:
+            # before the final status, so streams see all output
+            events.flush(final=True)
+    except GenerationCancelled:
+        finish(JobStatus.CANCELLED)
+    except Exception:
+        finish(JobStatus.FAILED, error=traceback.format_exc())
+    else:
+        if result:
+            finish(JobStatus.SUCCEEDED, result=payload)
+        else:
+            finish(JobStatus.FAILED, result=payload, error=str(payload.get("error")))
+
+
+def cancel_job(job):
+    """
+    Cancels a queued job outright; a running job is flagged and its maskgen
+    run is stopped.
+    """
+    if Job.objects.filter(id=job.id, status=JobStatus.QUEUED).update(
+        status=JobStatus.CANCELLED, cancel_requested=True, finished_at=timezone.now()
+    ):
+        return
+    Job.objects.filter(id=job.id, status=JobStatus.RUNNING).update(
+        cancel_requested=True
+    )
+
+
+def work(poll_interval=1.0, burst=False):
+    """
+    Worker process loop: claims and runs jobs, sleeping poll_interval seconds
+    while the queue is empty. In burst mode it returns once the queue is empty.
+    Whenever the queue is empty, jobs left RUNNING by dead workers are failed
+    (fail_stale_jobs).
+
+    Returns:
+        int: number of jobs run
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    while True:
+        close_old_connections()
+        job = claim_next_job(worker)
+        if job is None:
+            fail_stale_jobs()
+            if burst:
+                return done
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        done += 1
@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from maskgen_api.obs_file_formatting import coords_to_deg, to_deg
+
+
+def _random_coords(count, seed=0):
+    rng = np.random.default_rng(seed)
+    ra_hours = rng.uniform(0, 24, count)
+    decs = rng.uniform(-89, 89, count)
+    ras, dec_strs = [], []
+    for i, (h, d) in enumerate(zip(ra_hours, decs)):
+        if i % 2:
+            # every other row stays in decimal degrees, like mixed catalogs
+            ras.append(f"{h * 15:.7f}")
+            dec_strs.append(f"{d:.7f}")
+            continue
+        hm, hs = divmod(round(h * 3_600_000), 60_000)
+        hh, hm = divmod(hm, 60)
+        sign = "-" if d < 0 else "+"
+        dm, ds = divmod(round(abs(d) * 360_000), 6_000)
+        dd, dm = divmod(dm, 60)
+        ras.append(f"{hh:02d}:{hm:02d}:{hs / 1000:06.3f}")
+        dec_strs.append(f"{sign}{dd:02d}:{dm:02d}:{ds / 100:05.2f}")
+    return ras, dec_strs
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-row to_deg against the batch coords_to_deg converter"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        ras, decs = _random_coords(options["count"])
+
+        start = time.perf_counter()
+        rowwise = [to_deg(ra, dec) for ra, dec in zip(ras, decs)]
+        rowwise_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ra_deg, dec_deg = coords_to_deg(ras, decs)
+        batch_time = time.perf_counter() - start
+
+        expected = np.array(rowwise, dtype=float)
+        max_err = max(
+            np.abs(expected[:, 0] - ra_deg).max(),
+            np.abs(expected[:, 1] - dec_deg).max(),
+        )
+        self.stdout.write(f"coordinates:   {len(ras)}")
+        self.stdout.write(f"to_deg:        {rowwise_time:.3f} s")
+        self.stdout.write(f"coords_to_deg: {batch_time:.3f} s")
+        self.stdout.write(f"speedup:       {rowwise_time / batch_time:.1f}x")
+        self.stdout.write(f"max abs diff:  {max_err:.2e} deg")
@@ -0,0 +1,271 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from maskgen_api.catalog import objects_in_cone
+from maskgen_api.healpix import sky_columns
+from maskgen_api.models import Mask, Object, ObjectList, Project, Status
+from maskgen_api.obs_file_formatting import get_objects
+
+BATCH_SIZE = 5000
+
+
+def _seed(stdout, users, objects, masks, objects_per_mask):
+    """
+    users each own one project with one object list; objects and masks are
+    spread evenly over them
+    """
+    start = time.perf_counter()
+    projects = Project.objects.bulk_create(
+        [
+            Project(name=f"proj{u}", user_id=f"user{u}", center_ra="0", center_dec="0")
+            for u in range(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    lists = ObjectList.objects.bulk_create(
+        [
+            ObjectList(name=f"list{u}", user_id=f"user{u}", project_name=f"proj{u}")
+            for u in range(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    Project.objects.bulk_update(
+        [
+            Project(id=project.id, obj_list_id=obj_list.id)
+            for project, obj_list in zip(projects, lists)
+        ],
+        ["obj_list"],
+        batch_size=BATCH_SIZE,
+    )
+
+    through = ObjectList.objects_list.through
+    object_ids = {}  # user index -> ids of their objects
+    for offset in range(0, objects, BATCH_SIZE):
+        indices = range(offset, min(offset + BATCH_SIZE, objects))
+        ras = [(i * 0.001) % 360 for i in indices]
+        decs = [((i * 0.0007) % 180) - 90 for i in indices]
+        batch = Object.objects.bulk_create(
+            [
+                Object(
+                    name=f"obj{i}",
+                    user_id=f"user{i % users}",
+                    type="TARGET",
+                    right_ascension=ra,
+                    declination=dec,
+                    priority=i % 10,
+                    aux={},
+                    healpix=healpix,
+                    unit_x=x,
+                    unit_y=y,
+                    unit_z=z,
+                )
+                for i, ra, dec, (healpix, x, y, z) in zip(
+                    indices, ras, decs, sky_columns(ras, decs)
+                )
+            ]
+        )
+        through.objects.bulk_create(
+            [
+                through(objectlist_id=lists[(offset + n) % users].id, object_id=obj.id)
+                for n, obj in enumerate(batch)
+            ]
+        )
+        for n, obj in enumerate(batch):
+            object_ids.setdefault((offset + n) % users, []).append(obj.id)
+        stdout.write(f"\rseeded {offset + len(batch)} objects", ending="")
+    stdout.write("")
+
+    statuses = [Status.DRAFT, Status.FINALIZED, Status.COMPLETED]
+    created = Mask.objects.bulk_create(
+        [
+            Mask(
+                name=f"mask{m}",
+                user_id=f"user{m % users}",
+                center_ra="0",
+                center_dec="0",
+                status=statuses[m % 3],
+                features=[],
+                instrument_version=1,
+                instrument_setup={"instrument": "IMACS_sc"},
+            )
+            for m in range(masks)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    project_masks = Project.masks.through
+    project_masks.objects.bulk_create(
+        [
+            project_masks(project_id=projects[m % users].id, mask_id=mask.id)
+            for m, mask in enumerate(created)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    mask_objects = Mask.objects_list.through
+    mask_objects.objects.bulk_create(
+        [
+            mask_objects(mask_id=mask.id, object_id=object_id)
+            for m, mask in enumerate(created)
+            for object_id in object_ids.get(m % users, [])[:objects_per_mask]
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    stdout.write(f"seeded in {time.perf_counter() - start:.1f} s")
+
+
+def _lookups(users, objects, masks):
+    """
+    The database lookups each endpoint starts with, on random keys
+    """
+
+    def user():
+        return random.randrange(users)
+
+    def project():
+        u = user()
+        return Project.objects.get(name=f"proj{u}", user_id=f"user{u}")
+
+    def object_list():
+        u = user()
+        return ObjectList.objects.filter(name=f"list{u}", user_id=f"user{u}").first()
+
+    def mask_in_project():
+        m = random.randrange(masks)
+        u = m % users
+        project = Project.objects.get(name=f"proj{u}", user_id=f"user{u}")
+        return project.masks.get(name=f"mask{m}")
+
+    def mask_retrieve():
+        m = random.randrange(masks)
+        u = m % users
+        return (
+            Mask.objects.defer("features")
+            .filter(project__name=f"proj{u}", project__user_id=f"user{u}")
+            .get(name=f"mask{m}")
+        )
+
+    def object_in_list():
+        i = random.randrange(objects)
+        u = i % users
+        obj_list = ObjectList.objects.get(name=f"list{u}", user_id=f"user{u}")
+        return obj_list.objects_list.get(name=f"obj{i}")
+
+    def object_by_name():
+        i = random.randrange(objects)
+        return Object.objects.filter(user_id=f"user{i % users}", name=f"obj{i}").get()
+
+    def list_objects():
+        # what categorize_objs resolves .obw names against
+        u = user()
+        return list(
+            get_objects(f"user{u}", f"proj{u}", f"list{u}").values_list("name", "id")
+        )
+
+    def projects_of_user():
+        return list(Project.objects.filter(user_id=f"user{user()}").values("name"))
+
+    def cone_search():
+        # the objects search endpoint, 15 arcmin around a random object
+        i = random.randrange(objects)
+        return objects_in_cone(
+            Object.objects.all(),
+            (i * 0.001) % 360,
+            ((i * 0.0007) % 180) - 90,
+            0.25,
+            ["name"],
+            f"user{i % users}",
+        )
+
+    def finalized_listing():
+        return list(
+            Mask.objects.filter(status=Status.FINALIZED)
+            .order_by("id")
+            .values("id", "name")[:100]
+        )
+
+    return {
+        "project": project,
+        "object_list": object_list,
+        "mask_in_project": mask_in_project,
+        "mask_retrieve": mask_retrieve,
+        "object_in_list": object_in_list,
+        "object_by_name": object_by_name,
+        "list_objects": list_objects,
+        "projects_of_user": projects_of_user,
+        "cone_search": cone_search,
+        "finalized_listing": finalized_listing,
+    }
+
+
+def _plans(func):
+    # EXPLAIN of every query the lookup runs
+    explain = _Explain()
+    with connection.execute_wrapper(explain):
+        func()
+    return explain.plans
+
+
+class _Explain:
+    def __init__(self):
+        self.plans = []
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if sql.lstrip().upper().startswith("SELECT"):
+            prefix = (
+                "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                self.plans.append([str(row[-1]) for row in cursor.fetchall()])
+        return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with objects and masks and report "
+        "p50/p95 latency and the query plan of each endpoint's lookup"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--objects", type=int, default=1_000_000)
+        parser.add_argument("--masks", type=int, default=10_000)
+        parser.add_argument("--objects-per-mask", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=500)
+        parser.add_argument("--plans", action="store_true", help="print EXPLAIN")
+        parser.add_argument(
+            "--keepdb", action="store_true", help="reuse/keep the seeded test DB"
+        )
+
+    def handle(self, *args, **options):
+        users, objects, masks = options["users"], options["objects"], options["masks"]
+        # never touch the configured database: seed Django's test database
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            if not Object.objects.exists():
+                _seed(self.stdout, users, objects, masks, options["objects_per_mask"])
+            random.seed(0)
+            self.stdout.write(f"{'lookup':<20}{'p50 ms':>10}{'p95 ms':>10}")
+            for name, func in _lookups(users, objects, masks).items():
+                func()  # warm up
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - start)
+                p50, p95 = np.percentile(timings, [50, 95]) * 1000
+                self.stdout.write(f"{name:<20}{p50:>10.3f}{p95:>10.3f}")
+                if options["plans"]:
+                    for plan in _plans(func):
+                        self.stdout.write("    " + " | ".join(plan))
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from maskgen_api.obs_file_formatting import coords_to_deg
+from maskgen_api.smf import read_smf
+
+
+def _line_parser(filepath):
+    # the per-line parser read_smf replaced, kept as the baseline
+    features = []
+    with open(filepath, "rb") as f:
+        for line in f:
+            line = line.decode("utf-8").strip()
+            if line.startswith("SLIT"):
+                parts = line.split()
+                features.append(
+                    {
+                        "type": "SLIT",
+                        "id": parts[1],
+                        "ra": parts[2],
+                        "dec": parts[3],
+                        "x": float(parts[4]),
+                        "y": float(parts[5]),
+                        "width": float(parts[6]),
+                        "a_len": float(parts[7]),
+                        "b_len": float(parts[8]),
+                        "angle": float(parts[9]),
+                    }
+                )
+            elif line.startswith("HOLE"):
+                parts = line.split()
+                features.append(
+                    {
+                        "type": "HOLE",
+                        "id": parts[1],
+                        "ra": parts[2],
+                        "dec": parts[3],
+                        "x": float(parts[4]),
+                        "y": float(parts[5]),
+                        "width": float(parts[6]),
+                        "shape_code": int(parts[7]),
+                        "a_len": float(parts[8]),
+                        "b_len": float(parts[9]),
+                        "angle": float(parts[10]),
+                    }
+                )
+    ras, decs = coords_to_deg(
+        [feature["ra"] for feature in features],
+        [feature["dec"] for feature in features],
+    )
+    for feature, ra, dec in zip(features, ras, decs):
+        feature["ra_deg"] = float(ra)
+        feature["dec_deg"] = float(dec)
+    return features
+
+
+def _best_of(repeat, func, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = "Benchmark the per-line SMF parser against the columnar read_smf"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default=str(settings.BASE_DIR / "tests/data/DCM5V5E.SMF")
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        path, repeat = options["path"], options["repeat"]
+
+        line_time, expected = _best_of(repeat, _line_parser, path)
+        array_time, smf = _best_of(repeat, read_smf, path)
+        dict_time, features = _best_of(repeat, lambda: read_smf(path).features())
+
+        self.stdout.write(
+            f"records:            {len(smf.slits)} SLIT, {len(smf.holes)} HOLE"
+        )
+        self.stdout.write(f"per-line parser:    {line_time * 1000:.2f} ms")
+        self.stdout.write(f"read_smf (arrays):  {array_time * 1000:.2f} ms")
+        self.stdout.write(f"read_smf + dicts:   {dict_time * 1000:.2f} ms")
+        self.stdout.write(f"speedup (arrays):   {line_time / array_time:.1f}x")
+        self.stdout.write(f"identical features: {features == expected}")
@@ -0,0 +1,52 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from maskgen_api.jobs import work
+
+
+def _worker_main(poll_interval, burst):
+    # children get a fresh database connection instead of the parent's
+    connections.close_all()
+    work(poll_interval=poll_interval, burst=burst)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of local worker processes for queued mask generation jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.MASKGEN_WORKERS)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.MASKGEN_WORKER_POLL_INTERVAL,
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="exit once the queue is empty instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_worker_main,
+                args=(options["poll_interval"], options["burst"]),
+            )
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"started {len(processes)} mask generation workers")
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
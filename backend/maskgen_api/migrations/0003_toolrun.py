@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0002_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ToolRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tool", models.CharField(max_length=20)),
+                ("user_id", models.CharField(max_length=100)),
+                ("size", models.IntegerField()),
+                ("timeout", models.FloatField()),
+                ("duration", models.FloatField()),
+                ("cpu_seconds", models.FloatField(null=True)),
+                ("max_rss", models.BigIntegerField(null=True)),
+                ("exit_status", models.IntegerField(null=True)),
+                ("timed_out", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["tool", "size"], name="tool_run_size_idx")
+                ],
+            },
+        ),
+    ]
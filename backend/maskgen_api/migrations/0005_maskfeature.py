@@ -0,0 +1,98 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _to_deg(value, scale):
+    # sexagesimal "[+-]d:m:s" (RA in hours) or decimal degrees
+    value = str(value).strip()
+    if ":" not in value:
+        return float(value)
+    sign = -1.0 if value.startswith("-") else 1.0
+    parts = [float(part) for part in value.lstrip("+-").split(":")] + [0.0, 0.0]
+    return sign * (parts[0] + parts[1] / 60 + parts[2] / 3600) * scale
+
+
+def populate_features(apps, schema_editor):
+    Mask = apps.get_model("maskgen_api", "Mask")
+    MaskFeature = apps.get_model("maskgen_api", "MaskFeature")
+    for mask in Mask.objects.only("id", "features").iterator():
+        MaskFeature.objects.bulk_create(
+            [
+                MaskFeature(
+                    mask_id=mask.id,
+                    type=feature["type"],
+                    object_name=feature["id"],
+                    ra=feature.get("ra_deg", _to_deg(feature["ra"], 15.0)),
+                    dec=feature.get("dec_deg", _to_deg(feature["dec"], 1.0)),
+                    x=feature["x"],
+                    y=feature["y"],
+                    width=feature["width"],
+                    a_len=feature["a_len"],
+                    b_len=feature["b_len"],
+                    angle=feature["angle"],
+                    shape_code=feature.get("shape_code"),
+                )
+                for feature in mask.features or []
+            ],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0004_jobevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaskFeature",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("SLIT", "Slit"), ("HOLE", "Hole")], max_length=4
+                    ),
+                ),
+                ("object_name", models.CharField(max_length=100)),
+                ("ra", models.FloatField()),
+                ("dec", models.FloatField()),
+                ("x", models.FloatField()),
+                ("y", models.FloatField()),
+                ("width", models.FloatField()),
+                ("a_len", models.FloatField()),
+                ("b_len", models.FloatField()),
+                ("angle", models.FloatField()),
+                ("shape_code", models.IntegerField(null=True)),
+                (
+                    "mask",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feature_rows",
+                        to="maskgen_api.mask",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["mask", "x", "y"], name="feature_xy_idx"),
+                    models.Index(fields=["mask", "dec", "ra"], name="feature_sky_idx"),
+                    models.Index(
+                        fields=["mask", "object_name"], name="feature_object_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0005_maskfeature"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mask",
+            name="revision",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="objectlist",
+            name="revision",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
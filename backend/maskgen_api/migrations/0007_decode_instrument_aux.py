@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:18
+
+import json
+
+from django.db import migrations
+
+
+def decode_aux(apps, schema_editor):
+    # uploadconfig used to store aux=json.dumps(...), a JSON string in the
+    # JSONField; unwrap those into the object they encode
+    InstrumentConfig = apps.get_model("maskgen_api", "InstrumentConfig")
+    for config in InstrumentConfig.objects.only("id", "aux").iterator():
+        aux = config.aux
+        while isinstance(aux, str):
+            try:
+                aux = json.loads(aux)
+            except ValueError:
+                break
+        if isinstance(aux, dict) and aux != config.aux:
+            config.aux = aux
+            config.save(update_fields=["aux"])
+
+
+def encode_aux(apps, schema_editor):
+    InstrumentConfig = apps.get_model("maskgen_api", "InstrumentConfig")
+    for config in InstrumentConfig.objects.only("id", "aux").iterator():
+        if isinstance(config.aux, dict):
+            config.aux = json.dumps(config.aux)
+            config.save(update_fields=["aux"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0006_revision"),
+    ]
+
+    operations = [
+        migrations.RunPython(decode_aux, encode_aux),
+    ]
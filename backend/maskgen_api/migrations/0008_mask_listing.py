@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0007_decode_instrument_aux"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mask",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="mask",
+            index=models.Index(fields=["status", "id"], name="mask_status_idx"),
+        ),
+    ]
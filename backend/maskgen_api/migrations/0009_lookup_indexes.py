@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0008_mask_listing"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mask",
+            index=models.Index(fields=["name"], name="mask_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="object",
+            index=models.Index(fields=["user_id", "name"], name="object_user_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="objectlist",
+            index=models.Index(fields=["user_id", "name"], name="obj_list_user_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(fields=["user_id", "name"], name="project_user_idx"),
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:27
+
+import numpy as np
+from django.db import migrations, models
+
+# frozen copy of maskgen_api.healpix as of this migration, so later changes
+# there can't change what it stores
+ORDER = 16
+SKY_FIELDS = ["healpix", "unit_x", "unit_y", "unit_z"]
+
+
+def _spread_bits(values):
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def ang2pix_nest(ra, dec):
+    nside = 1 << ORDER
+    ra = np.asarray(ra, dtype=np.float64)
+    z = np.sin(np.radians(np.asarray(dec, dtype=np.float64)))
+    za = np.abs(z)
+    tt = np.mod(np.radians(ra), 2 * np.pi) / (np.pi / 2)
+    tt = np.where(tt >= 4.0, 0.0, tt)
+
+    temp1 = nside * (0.5 + tt)
+    temp2 = nside * z * 0.75
+    jp = (temp1 - temp2).astype(np.int64)
+    jm = (temp1 + temp2).astype(np.int64)
+    ifp, ifm = jp >> ORDER, jm >> ORDER
+    face_eq = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix_eq = jm & (nside - 1)
+    iy_eq = nside - (jp & (nside - 1)) - 1
+
+    ntt = np.minimum(tt.astype(np.int64), 3)
+    tp = tt - ntt
+    tmp = nside * np.sqrt(3 * (1 - za))
+    jp_cap = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+    jm_cap = np.minimum(((1 - tp) * tmp).astype(np.int64), nside - 1)
+    north = z >= 0
+    face_cap = np.where(north, ntt, ntt + 8)
+    ix_cap = np.where(north, nside - jm_cap - 1, jp_cap)
+    iy_cap = np.where(north, nside - jp_cap - 1, jm_cap)
+
+    equatorial = za <= 2.0 / 3.0
+    face = np.where(equatorial, face_eq, face_cap)
+    ix = np.where(equatorial, ix_eq, ix_cap)
+    iy = np.where(equatorial, iy_eq, iy_cap)
+    within_face = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+    return face.astype(np.int64) * nside * nside + within_face.astype(np.int64)
+
+
+def sky_columns(ra, dec):
+    pixels = ang2pix_nest(ra, dec)
+    ra, dec = np.radians(ra), np.radians(dec)
+    cos_dec = np.cos(dec)
+    x, y, z = cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)
+    return list(zip(pixels.tolist(), x.tolist(), y.tolist(), z.tolist()))
+
+
+def populate_sky_columns(apps, schema_editor):
+    Object = apps.get_model("maskgen_api", "Object")
+    pending = Object.objects.filter(healpix__isnull=True).only(
+        "id", "right_ascension", "declination"
+    )
+    # updated rows drop out of pending
+    while batch := list(pending.order_by("id")[:2000]):
+        columns = sky_columns(
+            [obj.right_ascension for obj in batch], [obj.declination for obj in batch]
+        )
+        for obj, values in zip(batch, columns):
+            obj.healpix, obj.unit_x, obj.unit_y, obj.unit_z = values
+        Object.objects.bulk_update(batch, SKY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0009_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="object",
+            name="healpix",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="object",
+            name="unit_x",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="object",
+            name="unit_y",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="object",
+            name="unit_z",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="object",
+            index=models.Index(fields=["user_id", "healpix"], name="object_sky_idx"),
+        ),
+        migrations.RunPython(populate_sky_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0010_object_sky_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mask",
+            name="pruned_obj_list",
+            field=models.ManyToManyField(
+                blank=True, related_name="objs_outside_mask", to="maskgen_api.object"
+            ),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .healpix import SKY_FIELDS, sky_columns
+
 
 class Instrument(models.TextChoices):
     IMACS_F4 = "IMACS f/4"
@@ -12,6 +14,19 @@ class Status(models.TextChoices):
     COMPLETED = "completed", "Completed (mask has been cut successfully)"
 
 
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+    CANCELLED = "cancelled", "Cancelled"
+
+
+class JobEventKind(models.TextChoices):
+    OUTPUT = "output", "Tool output"
+    PROGRESS = "progress", "Progress"
+
+
 # Models
 class Project(models.Model):
     name = models.CharField()
@@ -30,6 +45,8 @@ class Project(models.Model):
                 fields=["name", "user_id"], name="unique_project_per_user"
             )
         ]
+        # list_projects filters on user_id alone
+        indexes = [models.Index(fields=["user_id", "name"], name="project_user_idx")]
 
 
 class Image(models.Model):
@@ -70,8 +87,13 @@ class Mask(models.Model):
     excluded_obj_list = models.ManyToManyField(
         "Object", blank=True, related_name="objs_not_on_mask"
     )  # objs left out of the mask
+    pruned_obj_list = models.ManyToManyField(
+        "Object", blank=True, related_name="objs_outside_mask"
+    )  # objs outside the field, never handed to maskgen
     instrument_version = models.IntegerField()
     instrument_setup = models.JSONField()
+    revision = models.PositiveIntegerField(default=1)  # bumped on change, for ETags
+    created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Mask {self.name}"
@@ -80,6 +102,45 @@ class Mask(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user_id", "name"], name="unique_mask_name")
         ]
+        indexes = [
+            # technician listings: one status, in id order
+            models.Index(fields=["status", "id"], name="mask_status_idx"),
+            # masks are looked up by name within a project, not by user_id
+            models.Index(fields=["name"], name="mask_name_idx"),
+        ]
+
+
+# one slit or hole of a mask, mirrors Mask.features for indexed lookups
+class MaskFeature(models.Model):
+    TYPE_CHOICES = [
+        ("SLIT", "Slit"),
+        ("HOLE", "Hole"),
+    ]
+
+    mask = models.ForeignKey(
+        "Mask", on_delete=models.CASCADE, related_name="feature_rows"
+    )
+    type = models.CharField(max_length=4, choices=TYPE_CHOICES)
+    object_name = models.CharField(max_length=100)
+    ra = models.FloatField()  # degrees
+    dec = models.FloatField()  # degrees
+    x = models.FloatField()  # mm
+    y = models.FloatField()  # mm
+    width = models.FloatField()
+    a_len = models.FloatField()
+    b_len = models.FloatField()
+    angle = models.FloatField()
+    shape_code = models.IntegerField(null=True)  # holes only
+
+    def __str__(self):
+        return f"{self.type} {self.object_name} on mask {self.mask_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["mask", "x", "y"], name="feature_xy_idx"),
+            models.Index(fields=["mask", "dec", "ra"], name="feature_sky_idx"),
+            models.Index(fields=["mask", "object_name"], name="feature_object_idx"),
+        ]
 
 
 class Object(models.Model):
@@ -96,10 +157,34 @@ class Object(models.Model):
     declination = models.FloatField()
     priority = models.IntegerField(default=0.0)
     aux = models.JSONField(null=True)  # a_len, b_len
+    # nested HEALPix pixel (healpix.HEALPIX_ORDER) and unit vector of the
+    # position, for index range cone/box searches (see catalog.py)
+    healpix = models.BigIntegerField(null=True)
+    unit_x = models.FloatField(null=True)
+    unit_y = models.FloatField(null=True)
+    unit_z = models.FloatField(null=True)
 
     def __str__(self):
         return f"{self.type} Object {self.name}"
 
+    def save(self, *args, **kwargs):
+        # bulk inserts fill these in ingest.bulk_create_objects instead
+        [(self.healpix, self.unit_x, self.unit_y, self.unit_z)] = sky_columns(
+            [self.right_ascension], [self.declination]
+        )
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | set(SKY_FIELDS)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "name"], name="object_user_idx"),
+            # objects belong to their list's owner, so a list's cone search
+            # is a range scan within one user
+            models.Index(fields=["user_id", "healpix"], name="object_sky_idx"),
+        ]
+
 
 # object list: user_id, name, id, objects
 class ObjectList(models.Model):
@@ -107,6 +192,7 @@ class ObjectList(models.Model):
     project_name = models.CharField(max_length=100)
     name = models.CharField(max_length=100)
     objects_list = models.ManyToManyField("Object", blank=True)
+    revision = models.PositiveIntegerField(default=1)  # bumped on change, for ETags
 
     class Meta:
         constraints = [
@@ -114,3 +200,60 @@ class ObjectList(models.Model):
                 fields=["name", "project_name"], name="unique_obj_list_per_project"
             )
         ]
+        # views look lists up by (name, user_id)
+        indexes = [models.Index(fields=["user_id", "name"], name="obj_list_user_idx")]
+
+
+# mask generation request run by the worker pool (manage.py run_mask_workers)
+class Job(models.Model):
+    user_id = models.CharField(max_length=100)
+    project_name = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=20, choices=JobStatus.choices, default=JobStatus.QUEUED
+    )
+    payload = models.JSONField()  # generate request body
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status})"
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"], name="job_queue_idx")]
+
+
+# maskgen output lines and progress of a running job, streamed to clients by
+# GET /api/jobs/{id}/stream/
+class JobEvent(models.Model):
+    job = models.ForeignKey("Job", on_delete=models.CASCADE, related_name="events")
+    kind = models.CharField(max_length=20, choices=JobEventKind.choices)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Job {self.job_id} {self.kind} event {self.id}"
+
+
+# one maskgen/maskcut invocation, for tuning TOOL_TIMEOUTS and TOOL_MEMORY_LIMIT
+class ToolRun(models.Model):
+    tool = models.CharField(max_length=20)
+    user_id = models.CharField(max_length=100)
+    size = models.IntegerField()  # objects (maskgen) or features (maskcut)
+    timeout = models.FloatField()
+    duration = models.FloatField()
+    cpu_seconds = models.FloatField(null=True)
+    max_rss = models.BigIntegerField(null=True)
+    exit_status = models.IntegerField(null=True)
+    timed_out = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.tool} run {self.id} ({self.duration:.1f}s)"
+
+    class Meta:
+        indexes = [models.Index(fields=["tool", "size"], name="tool_run_size_idx")]
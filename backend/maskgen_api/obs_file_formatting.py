@@ -1,9 +1,11 @@
-from .models import Object, ObjectList
+from .models import Mask, Object, ObjectList
+import codecs
+from itertools import islice
 import re
-from pathlib import Path
 import os
 from astropy.coordinates import Angle
 import astropy.units as u
+import numpy as np
 
 
 def to_deg(ra, dec):
@@ -18,63 +20,193 @@ def to_deg(ra, dec):
     return ra, dec
 
 
-def categorize_objs(mask, file_path):
-    lines = Path(file_path).read_text().splitlines()
-    for line in lines:
+def _sexagesimal_to_deg(values):
+    """
+    Converts an array of "[+-]d:m:s" strings to decimal units of d, in one pass.
+    """
+    negative = np.char.startswith(values, "-")
+    values = np.char.lstrip(values, "+-")
+    parts = np.char.partition(values, ":")
+    degrees = parts[:, 0]
+    parts = np.char.partition(parts[:, 2], ":")
+    minutes, seconds = parts[:, 0], parts[:, 2]
+    fields = np.stack([degrees, minutes, seconds])
+    fields = np.where(fields == "", "0", fields).astype(float)
+    result = fields[0] + fields[1] / 60.0 + fields[2] / 3600.0
+    return np.where(negative, -result, result)
+
+
+def column_to_deg(values, scale):
+    """
+    Converts one coordinate column to decimal degrees
+
+    Args:
+        values (array-like): sexagesimal strings, multiplied by scale (15 for
+            RA in hours, 1 for Dec), and/or decimal degrees as numbers or
+            strings
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        return values.astype(float)
+    values = np.char.strip(values.astype(str))
+    sexagesimal = np.char.find(values, ":") >= 0
+    result = np.empty(values.shape, dtype=float)
+    result[~sexagesimal] = values[~sexagesimal].astype(float)
+    if sexagesimal.any():
+        result[sexagesimal] = _sexagesimal_to_deg(values[sexagesimal]) * scale
+    return result
+
+
+def coords_to_deg(ra, dec):
+    """
+    Batch version of to_deg for whole coordinate columns
+
+    Each column may mix sexagesimal strings (RA in hours, Dec in degrees) and
+    decimal degrees, given as strings or numbers.
+
+    Args:
+        ra (array-like): right ascensions
+        dec (array-like): declinations
+
+    Returns:
+        (np.ndarray, np.ndarray): ra and dec in decimal degrees
+    """
+    return column_to_deg(ra, 15.0), column_to_deg(dec, 1.0)
+
+
+OBW_NAME_RE = re.compile(r"[@\*](\S+)")
+OBW_USE_RE = re.compile(r"Use=\d+")
+
+
+def get_objects(user_id, proj_name, objects):
+    """
+    Resolves the "objects" field of an instrument setup to an Object queryset
+
+    Args:
+        objects (str | list): name of one of the project's object lists, or a
+            list of Object ids; only the user's own objects are returned
+    """
+    if isinstance(objects, list):
+        return Object.objects.filter(id__in=objects, user_id=user_id)
+    return Object.objects.filter(
+        objectlist__name=objects,
+        objectlist__project_name=proj_name,
+        objectlist__user_id=user_id,
+    )
+
+
+def check_objects(user_id, proj_name, objects):
+    """
+    Raises:
+        ValueError: if objects names an object list the project doesn't have
+    """
+    if isinstance(objects, list):
+        return
+    if not ObjectList.objects.filter(
+        name=objects, project_name=proj_name, user_id=user_id
+    ).exists():
+        raise ValueError(f"no object list named {objects!r} in project {proj_name!r}")
+
+
+def categorize_objs(mask, obw_text, objects):
+    """
+    Sorts the objects maskgen listed in the .obw file into the mask's included
+    (Use=n) and excluded object lists.
+
+    Names are resolved against the mask's own objects with one query and the
+    memberships are written with one bulk insert per list.
+
+    Args:
+        mask (Mask): newly generated mask
+        obw_text (str): contents of the .obw file written by maskgen
+        objects (QuerySet): Objects the mask was generated from
+    """
+    entries = []
+    for line in obw_text.splitlines():
         # get obj name
-        match = re.match(r"[@\*](\S+)", line)
+        match = OBW_NAME_RE.match(line)
         if match:
-            try:
-                obj = Object.objects.get(name=match.group(1))
-                if re.search(r"Use=\d+", line):
-                    mask.objects_list.add(obj)
-                else:
-                    mask.excluded_obj_list.add(obj)
-                mask.save()
-            except Object.DoesNotExist:
-                mask.delete()
-                return False, f"warning: object with name '{match.group(1)}' not found."
+            entries.append((match.group(1), bool(OBW_USE_RE.search(line))))
+
+    ids = dict(objects.values_list("name", "id"))
+    for name, _ in entries:
+        if name not in ids:
+            mask.delete()
+            return False, f"warning: object with name '{name}' not found."
+
+    for m2m, used in ((Mask.objects_list, True), (Mask.excluded_obj_list, False)):
+        through = m2m.through
+        through.objects.bulk_create(
+            [
+                through(mask_id=mask.id, object_id=ids[name])
+                for name, is_used in entries
+                if is_used == used
+            ],
+            ignore_conflicts=True,
+        )
     return True, "yay it worked"
 
 
-def obj_to_json(file_bytes):
-    text = file_bytes.decode("utf-8")
-    lines = text.splitlines()
-    objects = []
+OBJ_LINE_RE = re.compile(
+    r"(?P<marker>[@\*])(?P<name>\S+)\s+(?P<ra>[\d\.]+)\s+(?P<dec>[-\d\.]+)\s+Pri=(?P<priority>[-\d\.]+)(?:\s+alen=(?P<a_len>[\d\.]+)\s+blen=(?P<b_len>[\d\.]+))?"
+)
+OBJ_TYPES = {"@": "TARGET", "*": "ALIGN"}
+OBJ_MARKERS = {obj_type: marker for marker, obj_type in OBJ_TYPES.items()}
+OBJ_FILE_CHUNK_SIZE = 2000
+OBJ_FILE_BUFFER_SIZE = 1 << 16
 
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
 
-        if line.startswith("@"):
-            obj_type = "TARGET"
-            line = line[1:]
-        elif line.startswith("*"):
-            obj_type = "ALIGN"
-            line = line[1:]
-        else:
-            continue  # skip invalid or unmarked lines
-
-        match = re.match(
-            r"(?P<name>\S+)\s+(?P<ra>[\d\.]+)\s+(?P<dec>[-\d\.]+)\s+Pri=(?P<priority>[-\d\.]+)(?:\s+alen=(?P<a_len>[\d\.]+)\s+blen=(?P<b_len>[\d\.]+))?",
-            line,
-        )
+def iter_lines(chunks, encoding="utf-8"):
+    """
+    Yields decoded lines from an iterable of byte chunks (e.g. UploadedFile.chunks())
+    without holding more than one chunk plus a partial line in memory.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # the last piece may be a line cut in half by the chunk boundary
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield line.rstrip("\r\n")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
 
-        if match:
-            obj = {
-                "name": match.group("name"),
-                "type": obj_type,
-                "ra": float(match.group("ra")),
-                "dec": float(match.group("dec")),
-                "priority": float(match.group("priority")),
-            }
-            if match.group("a_len") and match.group("b_len"):
-                obj["a_len"] = float(match.group("a_len"))
-                obj["b_len"] = float(match.group("b_len"))
-            objects.append(obj)
 
-    return objects
+def iter_obj_records(chunks):
+    """
+    Streams object records out of a .obj catalog
+
+    Lines starting with @ are TARGETs and * are ALIGN stars; anything else
+    (headers like &RADEGREE, comments, blank lines) is skipped.
+
+    Args:
+        chunks (iterable): byte chunks of the .obj file
+
+    Yields:
+        dict: name, type, ra, dec, priority and optional a_len/b_len
+    """
+    for line in iter_lines(chunks):
+        match = OBJ_LINE_RE.match(line.strip())
+        if not match:
+            continue
+        obj = {
+            "name": match["name"],
+            "type": OBJ_TYPES[match["marker"]],
+            "ra": float(match["ra"]),
+            "dec": float(match["dec"]),
+            "priority": float(match["priority"]),
+        }
+        if match["a_len"] and match["b_len"]:
+            obj["a_len"] = float(match["a_len"])
+            obj["b_len"] = float(match["b_len"])
+        yield obj
+
+
+def obj_to_json(file_bytes):
+    return list(iter_obj_records([file_bytes]))
 
 
 """
@@ -89,7 +221,7 @@ output_path.write_text(json.dumps(parsed_objects, indent=2))
 """
 
 
-def generate_obj_file(user_id, proj_name, filename, objects):
+def generate_obj_file(user_id, proj_name, filename, objects, keep=None):
     """
     Generates a .obj file following Carnegie OBS formatting
 
@@ -97,11 +229,18 @@ def generate_obj_file(user_id, proj_name, filename, objects):
 
     Args:
         filename (str): name of the ob
-        objects (str): list of json objects of all the objects
+        objects (str | list): object list name or list of Object ids
+        keep (callable): optional, keep(ra, dec) -> bool array of the objects
+            to write (see fov.field_filter)
 
     Returns:
-        str: path to obj file
+        (str, int, list): path to obj file, objects written and ids of the
+        objects left out by keep
+
+    Raises:
+        ValueError: if objects names an object list the project doesn't have
     """
+    check_objects(user_id, proj_name, objects)
     script_dir = os.path.dirname(__file__)
     path = os.path.join(script_dir, "obj_files", user_id, proj_name, f"{filename}.obj")
     os.makedirs(os.path.join(script_dir, "obj_files", user_id), exist_ok=True)
@@ -109,42 +248,28 @@ def generate_obj_file(user_id, proj_name, filename, objects):
         os.path.join(script_dir, "obj_files", user_id, proj_name), exist_ok=True
     )
 
-    with open(path, "w") as file:
+    rows = (
+        get_objects(user_id, proj_name, objects)
+        .exclude(type="GUIDE")
+        .order_by("id")
+        .values_list("name", "type", "right_ascension", "declination", "priority", "id")
+        .iterator(chunk_size=OBJ_FILE_CHUNK_SIZE)
+    )
+    written, pruned = 0, []
+    with open(path, "w", buffering=OBJ_FILE_BUFFER_SIZE) as file:
         file.write("&RADEGREE\n")
-        if not isinstance(objects, list):
-            objects = list(
-                ObjectList.objects.get(
-                    name=objects, project_name=proj_name
-                ).objects_list.values_list("id", flat=True)
+        while chunk := list(islice(rows, OBJ_FILE_CHUNK_SIZE)):
+            if keep is not None:
+                inside = keep([row[2] for row in chunk], [row[3] for row in chunk])
+                pruned += [row[5] for row, ok in zip(chunk, inside) if not ok]
+                chunk = [row for row, ok in zip(chunk, inside) if ok]
+            written += len(chunk)
+            file.writelines(
+                f"{OBJ_MARKERS.get(obj_type, '')}{name} {ra} {dec} Pri={float(priority)}\n"
+                for name, obj_type, ra, dec, priority, _ in chunk
             )
-        for id in objects:
-            obj = Object.objects.get(id=id)
-            if obj.type != "GUIDE":
-                new_line = f"{obj.name} {obj.right_ascension} {obj.declination} Pri={float(obj.priority)}"
-                if obj.aux:
-                    if hasattr(obj.aux, "use"):
-                        new_line += f" use={obj.aux.use}"
-                    if hasattr(obj.aux, "width"):
-                        new_line += f" width={obj.aux.width}"
-                    if hasattr(obj.aux, "shape"):
-                        new_line += f" shape={obj.aux.shape}"
-                    if hasattr(obj.aux, "a_len"):
-                        new_line += f" a_len={obj.aux.a_len}"
-                    if hasattr(obj.aux, "b_len"):
-                        new_line += f" b_len={obj.aux.b_len}"
-                    if hasattr(obj.aux, "tilt"):
-                        new_line += f" tilt={obj.aux.tilt}"
-                    if hasattr(obj.aux, "pa"):
-                        new_line += f" pa={obj.aux.pa}"
-
-                if obj.type == "ALIGN":
-                    new_line = "*" + new_line
-                elif obj.type == "TARGET":
-                    new_line = "@" + new_line
-
-                file.write(new_line + "\n")
-
-    return f"obj_files/{user_id}/{proj_name}/{filename}.obj"
+
+    return f"obj_files/{user_id}/{proj_name}/{filename}.obj", written, pruned
 
 
 def generate_obs_file(user_id, proj_name, instrument_setup, obj_file_paths):
@@ -0,0 +1,50 @@
+import base64
+import binascii
+
+MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: if the cursor was not made by encode_cursor
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor {cursor!r}") from e
+
+
+def values_page(queryset, fields, page_size=None, cursor=None):
+    """
+    Keyset (id-ordered) page of queryset.values(*fields)
+
+    Args:
+        page_size (int): rows per page, everything if None
+        cursor (str): "next" cursor of the previous page
+
+    Returns:
+        (list, str | None): rows (without their id unless it is one of
+        fields), and the cursor of the next page (None on the last page)
+    """
+    queryset = queryset.order_by("id")
+    if cursor:
+        queryset = queryset.filter(id__gt=decode_cursor(cursor))
+    keep_id = "id" in fields
+    rows = queryset.values("id", *[field for field in fields if field != "id"])
+    next_cursor = None
+    if page_size is None:
+        rows = list(rows)
+    else:
+        rows = list(rows[: page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1]["id"])
+    if not keep_id:
+        for row in rows:
+            del row["id"]
+    return rows, next_cursor
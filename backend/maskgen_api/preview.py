@@ -0,0 +1,194 @@
+"""
+Slit-layout preview: a quick estimate of which objects fit on a mask
+
+Objects are projected onto the mask (fov.focal_plane). Each object's slit
+runs along y (b_len below to a_len above the object, SLITSIZE arcsec) and its
+spectrum along x, as long as WLIMIT spans at the disperser's dispersion. Two
+slits conflict when their slit extents, widened by the OVERLAP gap, and their
+spectra both overlap. Objects are then placed greedily: alignment stars
+first, then targets by priority, higher first.
+
+This ignores distortion, detector gaps and maskgen's slit shortening and
+tilting, so it only approximates what maskgen will place.
+"""
+
+import time
+
+import numpy as np
+
+from .fov import FOCAL_LENGTHS, field_filter, focal_plane
+from .instruments import get_config
+from .obs_file_formatting import check_objects, coords_to_deg, get_objects
+
+ARCSEC = np.pi / (180 * 3600)
+
+
+def dispersion_of(setup, spec=None):
+    """
+    Angstrom per mm on the mask: the setup's dispersion, or that of its
+    disperser in the instrument config ({"<disperser>": {"dispersion": ...}})
+
+    Raises:
+        ValueError: if neither gives a positive one
+    """
+    dispersion = setup.get("dispersion")
+    if dispersion in (None, ""):
+        spec = spec or get_config(setup.get("instrument"))
+        disperser = spec.dispersers.get(setup.get("disperser")) if spec else None
+        if isinstance(disperser, dict):
+            dispersion = disperser.get("dispersion")
+    if dispersion not in (None, "") and float(dispersion) > 0:
+        return float(dispersion)
+    raise ValueError(
+        f"no dispersion for disperser {setup.get('disperser')!r}, "
+        "give one (Angstrom/mm) in the request"
+    )
+
+
+def conflict_pairs(x, y_low, y_high, trace_length):
+    """
+    Pairs of slits whose y extents and spectra overlap
+
+    Sweeps the slits in y_low order: slit i can only overlap the following
+    slits that start below its top, found with one searchsorted; the x test
+    then runs on all candidate pairs at once.
+
+    Returns:
+        (ndarray, ndarray): indices i, j (i != j) of each conflicting pair
+    """
+    order = np.argsort(y_low, kind="stable")
+    starts = y_low[order]
+    stops = np.searchsorted(starts, y_high[order], side="left")
+    counts = np.maximum(stops - np.arange(len(order)) - 1, 0)
+    first = np.repeat(np.arange(len(order)), counts)
+    # offsets 1..count of each slit's candidates
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    i, j = order[first], order[first + 1 + offsets]
+    # spectra of equal length overlap when their centers are closer than it
+    overlap = np.abs(x[i] - x[j]) < trace_length
+    return i[overlap], j[overlap]
+
+
+def allocate(rank, i, j):
+    """
+    Greedy placement: slits in rank order, each unless it conflicts with one
+    already placed
+
+    Args:
+        rank (ndarray): placement order, best first
+        i, j (ndarray): conflicting pairs (conflict_pairs)
+
+    Returns:
+        ndarray: bool per slit, placed or not
+    """
+    size = len(rank)
+    # neighbours of each slit, CSR style
+    pairs_from = np.concatenate([i, j])
+    pairs_to = np.concatenate([j, i])
+    by_slit = np.argsort(pairs_from, kind="stable")
+    neighbours = pairs_to[by_slit]
+    bounds = np.searchsorted(pairs_from[by_slit], np.arange(size + 1))
+    placed = np.zeros(size, dtype=bool)
+    blocked = np.zeros(size, dtype=bool)
+    for slit in rank.tolist():
+        if not blocked[slit]:
+            placed[slit] = True
+            blocked[neighbours[bounds[slit] : bounds[slit + 1]]] = True
+    return placed
+
+
+def preview_layout(setup, names, types, ra, dec, priority, spec=None):
+    """
+    Args:
+        setup (dict): instrument setup as for generate (center, position,
+            wlimit_low/high, wavelength, a_len, b_len, refhole_width, overlap,
+            disperser or dispersion)
+        names, types, ra, dec, priority (array-like): the objects
+
+    Returns:
+        dict: included objects (name, type, priority and x/y in mm), names of
+        the excluded objects, number pruned as outside the field
+    """
+    spec = spec or get_config(setup.get("instrument"))
+    names, types = np.asarray(names, dtype=object), np.asarray(types, dtype=object)
+    ra, dec = np.asarray(ra, dtype=np.float64), np.asarray(dec, dtype=np.float64)
+    priority = np.asarray(priority, dtype=np.float64)
+    usable = types != "GUIDE"
+    keep = field_filter(setup | {"fov_margin": 0}, spec)
+    inside = usable & (keep(ra, dec) if keep else True)
+    pruned = int(usable.sum() - inside.sum())
+    names, types = names[inside], types[inside]
+    ra, dec, priority = ra[inside], dec[inside], priority[inside]
+
+    (center_ra,), (center_dec,) = coords_to_deg(
+        [setup["center_ra"]], [setup["center_dec"]]
+    )
+    focal_length = FOCAL_LENGTHS.get(setup.get("telescope"), FOCAL_LENGTHS["Magellan"])
+    mm = focal_length * ARCSEC  # per arcsec
+    position = float(setup.get("position") or 0.0)
+    x, y = focal_plane(ra, dec, center_ra, center_dec, position, focal_length)
+
+    align = types == "ALIGN"
+    # alignment stars get square refholes instead of slits
+    half_hole = float(setup["refhole_width"]) / 2
+    above = np.where(align, half_hole, float(setup["a_len"]))
+    below = np.where(align, half_hole, float(setup["b_len"]))
+    # OVERLAP < 0 is a minimum gap between slits, > 0 an allowed overlap
+    gap = -float(setup.get("overlap", 0.0)) / 2
+    y_low = y - (below + gap) * mm
+    y_high = y + (above + gap) * mm
+    dispersion = dispersion_of(setup, spec)
+    trace_length = (
+        float(setup["wlimit_high"]) - float(setup["wlimit_low"])
+    ) / dispersion
+
+    i, j = conflict_pairs(x, y_low, y_high, trace_length)
+    # alignment stars first, then by priority; ties in catalog order
+    rank = np.lexsort((np.arange(len(x)), -priority, ~align))
+    placed = allocate(rank, i, j)
+    return {
+        "included": [
+            {
+                "name": names[k],
+                "type": types[k],
+                "priority": float(priority[k]),
+                "x": round(float(x[k]), 3),
+                "y": round(float(y[k]), 3),
+            }
+            for k in rank.tolist()
+            if placed[k]
+        ],
+        "excluded": [names[k] for k in rank.tolist() if not placed[k]],
+        "pruned": pruned,
+    }
+
+
+def preview_mask(user_id, proj_name, setup):
+    """
+    preview_layout of the objects a generate request would hand to maskgen
+
+    Returns:
+        dict: preview_layout's result, plus the seconds it took
+
+    Raises:
+        ValueError: on a setup the preview can't use
+    """
+    start = time.perf_counter()
+    spec = get_config(setup.get("instrument"))
+    setup = dict(setup)
+    check_objects(user_id, proj_name, setup["objects"])
+    if spec:
+        # the slit sizes and wavelength limits generate would fill in
+        setup = spec.setup_defaults() | setup
+    rows = list(
+        get_objects(user_id, proj_name, setup["objects"])
+        .order_by("id")
+        .values_list("name", "type", "right_ascension", "declination", "priority")
+    )
+    columns = list(zip(*rows)) if rows else [[], [], [], [], []]
+    try:
+        result = preview_layout(setup, *columns, spec=spec)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"missing or invalid instrument setup value: {e}") from e
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
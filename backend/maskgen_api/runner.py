@@ -0,0 +1,90 @@
+# Runs maskgen without touching the database or Django settings, so it can be
+# handed to worker processes (including spawned ones, the macOS default).
+import os
+import shutil
+from pathlib import Path
+
+from backend.terminal_helper import run_maskgen, scratch_directory, tool_env
+
+MASKGEN_SUCCESS = "Writing object file with use counts to"
+
+
+def run_maskgen_isolated(
+    filename,
+    input_paths,
+    smf_path,
+    override,
+    tool_directory,
+    scratch_root=None,
+    timeout=5,
+    limits=None,
+    on_output=None,
+    should_stop=None,
+):
+    """
+    Runs maskgen on {filename}.obs inside a private scratch directory
+
+    Args:
+        filename (str): mask filename, without extension
+        input_paths (list): .obs and .obj files copied into the scratch directory
+        smf_path (str): where the generated .SMF is moved to on success
+        override (bool): answer yes to maskgen's overwrite/continue prompts
+        tool_directory (str): maskgen install directory
+        scratch_root (str): parent of the scratch directory, system temp if None
+        timeout (float): seconds before maskgen is killed
+        limits (dict): rlimits for maskgen (see terminal_helper.run_session)
+        on_output, should_stop (callable): optional, see run_session; only
+            for in-process runs as they don't pickle
+
+    Returns:
+        dict: ok, feedback (maskgen output), metrics of the invocation and on
+        success smf_path and obw (text of the .obw file with use counts)
+    """
+    # each run gets its own cwd/MGPATH so concurrent runs can't clobber
+    # each other's .SMF, .obw and .loc_* files
+    with scratch_directory(tool_directory, root=scratch_root) as workdir:
+        for path in input_paths:
+            shutil.copy(path, workdir)
+
+        ok, feedback, metrics = run_maskgen(
+            f"{os.path.join(tool_directory, 'maskgen')} -s {filename}.obs",
+            override,
+            cwd=workdir,
+            env=tool_env(workdir),
+            timeout=timeout,
+            limits=limits,
+            on_output=on_output,
+            should_stop=should_stop,
+        )
+        if not (ok and MASKGEN_SUCCESS in feedback):
+            return {"ok": False, "feedback": feedback, "metrics": metrics}
+
+        os.makedirs(os.path.dirname(smf_path), exist_ok=True)
+        shutil.move(os.path.join(workdir, f"{filename}.SMF"), smf_path)
+        obw = Path(workdir, f"{filename}.obw").read_text()
+
+    return {
+        "ok": True,
+        "feedback": feedback,
+        "metrics": metrics,
+        "smf_path": smf_path,
+        "obw": obw,
+    }
+
+
+# set in each process of a rotator sweep pool (init_pool_worker); the parent
+# sets it to stop the runs in progress
+_pool_stop = None
+
+
+def init_pool_worker(stop):
+    global _pool_stop
+    _pool_stop = stop
+
+
+def run_in_pool_worker(**run_kwargs):
+    """
+    run_maskgen_isolated in a pool process, stopped once the pool's stop
+    event is set
+    """
+    return run_maskgen_isolated(**run_kwargs, should_stop=_pool_stop.is_set)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Object, Mask
+from .models import Object, Job
 
 
 class UploadObjectSerializer(serializers.ModelSerializer):
@@ -24,13 +24,16 @@ class ObjectSerializer(serializers.ModelSerializer):
         ]
 
 
-class MaskSerializer(serializers.ModelSerializer):
-    project_name = serializers.SerializerMethodField()
-
+class JobSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Mask
-        fields = ["id", "name", "status", "project_name", "user_id"]
-
-    def get_project_name(self, obj):
-        project = obj.project_set.first()
-        return project.name if project else None
+        model = Job
+        fields = [
+            "id",
+            "status",
+            "project_name",
+            "user_id",
+            "cancel_requested",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
@@ -0,0 +1,226 @@
+"""
+Reader for maskgen's .SMF (slit mask file) output
+
+The SLIT and HOLE records are parsed column-wise into NumPy structured arrays,
+with RA/Dec converted to degrees in one pass, and the header keywords into a
+typed SMFHeader.
+"""
+
+from dataclasses import asdict, dataclass, field
+from itertools import repeat
+
+import numpy as np
+
+from .obs_file_formatting import column_to_deg, coords_to_deg
+
+SLIT_COLUMNS = ["x", "y", "width", "a_len", "b_len", "angle"]
+HOLE_COLUMNS = ["x", "y", "width", "shape_code", "a_len", "b_len", "angle"]
+
+# "line" is the record's line number, which keeps SLITs and HOLEs in file order
+_COMMON_DTYPE = [
+    ("line", np.int32),
+    ("id", object),
+    ("ra", object),
+    ("dec", object),
+    ("ra_deg", np.float64),
+    ("dec_deg", np.float64),
+]
+SLIT_DTYPE = np.dtype(_COMMON_DTYPE + [(name, np.float64) for name in SLIT_COLUMNS])
+HOLE_DTYPE = np.dtype(
+    _COMMON_DTYPE
+    + [
+        (name, np.int32 if name == "shape_code" else np.float64)
+        for name in HOLE_COLUMNS
+    ]
+)
+
+
+@dataclass
+class SMFHeader:
+    name: str | None = None
+    observer: str | None = None
+    title: str | None = None
+    made: str | None = None
+    telescope: str | None = None
+    telescope_params: tuple[float, ...] = ()
+    instrument: str | None = None
+    disperser: str | None = None
+    disperser_order: int | None = None
+    disperser_angle: float | None = None
+    position_angle: float | None = None
+    center_ra: str | None = None
+    center_dec: str | None = None
+    center_ra_deg: float | None = None
+    center_dec_deg: float | None = None
+    equinox: float | None = None
+    wavelength: float | None = None
+    temperature: float | None = None
+    epoch: float | None = None
+    wlimit: tuple[float, float] | None = None
+    dref: int | None = None
+    hangle: float | None = None
+    date: int | None = None  # MJD
+    comments: list[str] = field(default_factory=list)
+    extra: dict[str, str] = field(default_factory=dict)  # unknown keywords
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _telescope(header, values):
+    *params, header.telescope = values
+    header.telescope_params = tuple(float(value) for value in params)
+
+
+def _disperser(header, values):
+    header.disperser = values[0]
+    if len(values) > 2:
+        header.disperser_order = int(values[1])
+        header.disperser_angle = float(values[2])
+
+
+def _position(header, values):
+    header.position_angle = float(values[0])
+    if len(values) > 3:
+        header.center_ra, header.center_dec = values[1], values[2]
+        (ra,), (dec,) = coords_to_deg([values[1]], [values[2]])
+        header.center_ra_deg, header.center_dec_deg = float(ra), float(dec)
+        header.equinox = float(values[3])
+
+
+def _text(name):
+    def parse(header, values):
+        setattr(header, name, " ".join(values))
+
+    return parse
+
+
+def _number(name, kind):
+    def parse(header, values):
+        setattr(header, name, kind(values[0]))
+
+    return parse
+
+
+HEADER_KEYWORDS = {
+    "NAME": _text("name"),
+    "OBSERVER": _text("observer"),
+    "TITLE": _text("title"),
+    "MADE": _text("made"),
+    "INSTRUMENT": _text("instrument"),
+    "TELESCOPE": _telescope,
+    "DISPERSER": _disperser,
+    "POSITION": _position,
+    "WAVELENGTH": _number("wavelength", float),
+    "TEMPERATURE": _number("temperature", float),
+    "EPOCH": _number("epoch", float),
+    "WLIMIT": lambda header, values: setattr(
+        header, "wlimit", (float(values[0]), float(values[1]))
+    ),
+    "DREF": _number("dref", int),
+    "HANGLE": _number("hangle", float),
+    "DATE": _number("date", int),
+}
+
+
+def _parse_header_line(header, line):
+    line = line.strip(b"\0 \t")
+    if line.startswith(b"!"):
+        header.comments.append(line[1:].decode("utf-8", "replace").strip())
+    elif line:
+        keyword, *values = line.decode("utf-8", "replace").split()
+        parse = HEADER_KEYWORDS.get(keyword)
+        if parse:
+            parse(header, values)
+        else:
+            header.extra[keyword] = " ".join(values)
+
+
+@dataclass
+class SMF:
+    header: SMFHeader
+    slits: np.ndarray  # SLIT_DTYPE
+    holes: np.ndarray  # HOLE_DTYPE
+
+    def features(self):
+        """
+        Features as the list of dicts stored in Mask.features, in file order
+        """
+        features = _records(self.slits, "SLIT", SLIT_COLUMNS) + _records(
+            self.holes, "HOLE", HOLE_COLUMNS
+        )
+        if len(self.slits) and len(self.holes):
+            lines = np.concatenate([self.slits["line"], self.holes["line"]])
+            features = [features[i] for i in np.argsort(lines, kind="stable")]
+        return features
+
+
+def _records(array, kind, columns):
+    names = ["id", "ra", "dec"] + columns + ["ra_deg", "dec_deg"]
+    values = [array[name].tolist() for name in names]
+    return [dict(zip(["type"] + names, row)) for row in zip(repeat(kind), *values)]
+
+
+def _sexagesimal_column(values, scale):
+    # SMF coordinates are always [-]dd:mm:ss.s, so the fields of the whole
+    # column are converted in a single float parse
+    fields = b" ".join(values).replace(b":", b" ").split()
+    if len(fields) != 3 * len(values):
+        return column_to_deg([value.decode() for value in values], scale)
+    fields = np.array(fields, dtype=np.float64).reshape(len(values), 3)
+    degrees = np.abs(fields[:, 0]) + fields[:, 1] / 60.0 + fields[:, 2] / 3600.0
+    negative = np.array([value.startswith(b"-") for value in values])
+    return np.where(negative, -degrees, degrees) * scale
+
+
+def _parse_records(lines, numbers, dtype, columns):
+    array = np.zeros(len(lines), dtype=dtype)
+    if not lines:
+        return array
+    # one split for all records, then every column is a strided slice
+    width = 4 + len(columns)
+    tokens = b" ".join(lines).split()
+    if len(tokens) != width * len(lines):
+        raise ValueError(f"SMF {lines[0][:4].decode()} records need {width} fields")
+    array["line"] = numbers
+    for index, name in enumerate(["id", "ra", "dec"], start=1):
+        array[name] = [token.decode() for token in tokens[index::width]]
+    array["ra_deg"] = _sexagesimal_column(tokens[2::width], 15.0)
+    array["dec_deg"] = _sexagesimal_column(tokens[3::width], 1.0)
+    for index, name in enumerate(columns, start=4):
+        array[name] = np.array(tokens[index::width], dtype=np.float64)
+    return array
+
+
+def read_smf(source):
+    """
+    Parses an SMF file
+
+    Args:
+        source (str | Path | bytes): path of the file, or its contents
+
+    Returns:
+        SMF: typed header and SLIT/HOLE structured arrays
+    """
+    if not isinstance(source, bytes):
+        with open(source, "rb") as f:
+            source = f.read()
+
+    header = SMFHeader()
+    slits, slit_lines, holes, hole_lines = [], [], [], []
+    for number, line in enumerate(source.splitlines()):
+        kind = line[:4]
+        if kind == b"SLIT":
+            slits.append(line)
+            slit_lines.append(number)
+        elif kind == b"HOLE":
+            holes.append(line)
+            hole_lines.append(number)
+        else:
+            _parse_header_line(header, line)
+
+    return SMF(
+        header=header,
+        slits=_parse_records(slits, slit_lines, SLIT_DTYPE, SLIT_COLUMNS),
+        holes=_parse_records(holes, hole_lines, HOLE_DTYPE, HOLE_COLUMNS),
+    )
@@ -7,6 +7,7 @@ from .views import (
     ImageViewSet,
     ProjectViewSet,
     MachineViewSet,
+    JobViewSet,
 )
 
 router = DefaultRouter()
@@ -16,5 +17,6 @@ router.register(r"instruments", InstrumentViewSet, basename="instrum")
 router.register(r"images", ImageViewSet, basename="image")
 router.register(r"project", ProjectViewSet, basename="project")
 router.register(r"machine", MachineViewSet, basename="machine")
+router.register(r"jobs", JobViewSet, basename="job")
 
 urlpatterns = router.urls
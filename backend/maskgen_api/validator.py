@@ -1,21 +1,34 @@
 import math
-from .obs_file_formatting import to_deg
+from .obs_file_formatting import coords_to_deg
 
 pdx_lat = -29.01418  # las campanas coordinate
 
 
 # TODO: figure out what hrf is set to (defaults to 30 but other times is recalculated?)
-def validate(instrum_setup):
+def validate(instrum_setup, spec=None):
+    """
+    Args:
+        spec (InstrumentSpec): optional, config of the setup's instrument
+    """
+    if spec and spec.wlimit and "wavelength" in instrum_setup:
+        low, high = spec.wlimit
+        try:
+            wavelength = float(instrum_setup["wavelength"])
+        except (KeyError, TypeError, ValueError):
+            return False, f"invalid wavelength {instrum_setup.get('wavelength')!r}"
+        if not low <= wavelength <= high:
+            return (
+                False,
+                f"wavelength {instrum_setup['wavelength']} outside the "
+                f"{spec.instrument} range {low}-{high}",
+            )
+
     hrf = 30
     if hrf > 24.0:
         return True, "OK"
     else:
         # defc: Dec. field center in degrees
-        defc = instrum_setup["center_dec"]
-        if ":" in defc:
-            _, defc = to_deg("10:00:18.500", instrum_setup["center_dec"])
-        else:
-            defc = float(defc)
+        _, (defc,) = coords_to_deg([], [instrum_setup["center_dec"]])
 
         hk = gsda(30.0, defc, pdx_lat)
         if math.fabs(hrf) < hk:
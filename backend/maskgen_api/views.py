@@ -2,31 +2,58 @@
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
-
-from astropy.table import Table
-
-from .models import Object, Mask, ObjectList, InstrumentConfig, Status, Project, Image
-from .serializers import ObjectSerializer, MaskSerializer
-from .obs_file_formatting import (
-    generate_obj_file,
-    generate_obs_file,
-    obj_to_json,
-    categorize_objs,
-    to_deg,
+from django.http import FileResponse, StreamingHttpResponse
+from django.conf import settings
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    Mask,
+    Object,
+    ObjectList,
+    InstrumentConfig,
+    Status,
+    Project,
+    Image,
+    Job,
+    JobEvent,
+    JobStatus,
 )
-from backend.terminal_helper import run_maskgen, run_maskcut, remove_file
+from .serializers import ObjectSerializer, JobSerializer
+from .obs_file_formatting import check_objects, coords_to_deg, iter_obj_records
+from .generation import (
+    generate_masks,
+    record_tool_run,
+    tool_limits,
+    MASKGEN_DIRECTORY,
+    PROJECT_DIRECTORY,
+    API_FOLDER,
+)
+from backend.terminal_helper import (
+    run_maskcut,
+    remove_file,
+    scratch_directory,
+    tool_env,
+)
+from .catalog import objects_in_box, objects_in_cone
+from .conditional import bump_revision, make_etag, not_modified, with_etag
+from .features import FEATURE_FIELDS, in_box, in_cone
+from .instruments import get_config
+from .pagination import MAX_PAGE_SIZE, values_page
+from .preview import preview_mask
+from .ingest import ingest_object_list, row_batches, csv_batches
+from .jobs import cancel_job
+from . import artifact_cache
+from .renderers import EventStreamRenderer
 from .validator import validate
 import json
 import os
-import io
 import shutil
-
-MASKGEN_DIRECTORY = "/Users/maylinchen/downloads/maskgen-2.14-Darwin-12.6_arm64/"
-PROJECT_DIRECTORY = os.getcwd() + "/"
-API_FOLDER = "maskgen_api/"
+import time
 
 
 class ProjectViewSet(viewsets.ViewSet):
@@ -111,21 +138,34 @@ class ProjectViewSet(viewsets.ViewSet):
 class InstrumentViewSet(viewsets.ViewSet):
     def retrieve(self, request, pk=None):
         version = request.query_params.get("version")
-        if version:
-            config = get_object_or_404(InstrumentConfig, instrument=pk, version=version)
-        else:
-            config = (
-                InstrumentConfig.objects.filter(instrument=pk)
-                .order_by("-version")
-                .first()
+        try:
+            config = get_config(pk, int(version) if version else None)
+        except ValueError:
+            return Response(
+                {"error": "version must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            if config:
-                return Response(
-                    {"error": f"No instrument config found with name '{pk}'"},
-                    status=404,
-                )
+        if config is None:
+            return Response(
+                {"error": f"No instrument config found with name '{pk}'"},
+                status=404,
+            )
+        # configs can be edited in place (admin, shell), so the ETag covers
+        # their content and not just the version
+        etag = make_etag(
+            request,
+            "instrument",
+            pk,
+            config.version,
+            config.filters,
+            config.dispersers,
+            config.aux,
+        )
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
 
-        return Response(
+        response = Response(
             {
                 "name": config.instrument,
                 "filters": config.filters,
@@ -133,6 +173,7 @@ class InstrumentViewSet(viewsets.ViewSet):
                 "aux": config.aux,
             }
         )
+        return with_etag(response, etag)
 
     @action(detail=False, methods=["post"], url_path="uploadconfig")
     def upload(self, request):
@@ -151,7 +192,7 @@ class InstrumentViewSet(viewsets.ViewSet):
             instrument=data.pop("instrument"),
             filters=data.pop("filters"),
             dispersers=data.pop("dispersers"),
-            aux=json.dumps(data),
+            aux=dict(data),
             version=version,
         )
 
@@ -166,10 +207,20 @@ class ImageViewSet(viewsets.ViewSet):
         user_id = request.headers.get("user-id")
         img_name = request.query_params.get("img_name")
         proj_name = request.query_params.get("project_name")
-        project = get_object_or_404(Project, name=proj_name, user_id=user_id)
-        img_obj = project.images.get(name=img_name)
+        img_obj = get_object_or_404(
+            Image,
+            project__name=proj_name,
+            project__user_id=user_id,
+            name=img_name,
+        )
         img_path = img_obj.image.path
-        return FileResponse(open(img_path, "rb"), content_type="image/jpeg")
+        stat = os.stat(img_path)
+        etag = make_etag(request, "image", img_obj.id, stat.st_mtime_ns, stat.st_size)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        response = FileResponse(open(img_path, "rb"), content_type="image/jpeg")
+        return with_etag(response, etag)
 
     @action(detail=False, methods=["post"], url_path="uploadimg")
     def upload(self, request):
@@ -186,6 +237,14 @@ class ImageViewSet(viewsets.ViewSet):
         )
 
 
+def _bump_revisions_of(obj):
+    # lists and masks embed their objects, so an edit changes them too
+    bump_revision(ObjectList.objects.filter(objects_list=obj))
+    bump_revision(
+        Mask.objects.filter(Q(objects_list=obj) | Q(excluded_obj_list=obj)).distinct()
+    )
+
+
 class ObjectViewSet(viewsets.ViewSet):
     @action(detail=False, methods=["post"], url_path="upload")
     def upload(self, request):
@@ -194,19 +253,6 @@ class ObjectViewSet(viewsets.ViewSet):
         proj_name = request.data.get("project_name")
         project = Project.objects.get(name=proj_name, user_id=user_id)
 
-        uploaded_file = request.data.get("file")
-        uploaded_file_bytes = uploaded_file.read()
-
-        # check if file is .obj or json
-        if uploaded_file.name.endswith(".obj"):
-            data = obj_to_json(uploaded_file_bytes)
-        elif uploaded_file.name.endswith(".csv"):
-            table = Table.read(io.BytesIO(uploaded_file_bytes), format="csv")
-            data = table.to_pandas().to_dict(orient="records")
-        else:
-            data_str = uploaded_file_bytes.decode("utf-8")
-            data = json.loads(data_str)
-
         # Check if a list with the same name and user_id already exists
         existing = ObjectList.objects.filter(name=list_name, user_id=user_id).first()
         if existing:
@@ -215,29 +261,31 @@ class ObjectViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        obj_list = ObjectList.objects.create(
-            name=list_name, user_id=user_id, project_name=proj_name
-        )
+        uploaded_file = request.data.get("file")
+        start = time.perf_counter()
 
-        for row in data:
-            # convert hours to degs if in hrs
-            ra, dec = to_deg(row.pop("ra"), row.pop("dec"))
+        # check if file is .obj, csv or json
+        if uploaded_file.name.endswith(".obj"):
+            # parsed lazily so inserts start while the file is still being read
+            batches = row_batches(iter_obj_records(uploaded_file.chunks()))
+        elif uploaded_file.name.endswith(".csv"):
+            batches = csv_batches(uploaded_file)
+        else:
+            batches = row_batches(json.loads(uploaded_file.read().decode("utf-8")))
 
-            obj = Object.objects.create(
-                name=row.pop("name"),
-                user_id=request.headers.get("user-id"),
-                type=row.pop("type"),
-                right_ascension=ra,
-                declination=dec,
-                priority=int(row.pop("priority")),
-                aux=row,
+        try:
+            obj_list, created = ingest_object_list(
+                user_id, list_name, proj_name, project, batches
             )
-            obj_list.objects_list.add(obj)
-
-        project.obj_list = obj_list
-        project.save()
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        elapsed = time.perf_counter() - start
         return Response(
-            {"obj_list": obj_list.name},
+            {
+                "obj_list": obj_list.name,
+                "created": created,
+                "rows_per_second": round(created / elapsed, 1) if elapsed else None,
+            },
             status=status.HTTP_201_CREATED,
         )
 
@@ -246,19 +294,97 @@ class ObjectViewSet(viewsets.ViewSet):
     def view_list(self, request):
         list_name = request.query_params.get("list_name")
         user_id = request.headers.get("user-id")
-        obj_list = ObjectList.objects.get(name=list_name, user_id=user_id)
+        obj_list = (
+            ObjectList.objects.filter(name=list_name, user_id=user_id)
+            .values("id", "name", "revision")
+            .first()
+        )
 
         if not obj_list:
             return Response(
                 {"error": f"No ObjectList found with name '{list_name}'"}, status=404
             )
+        etag = make_etag(request, "objectlist", obj_list["id"], obj_list["revision"])
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
 
         results = []
 
-        serialized_objects = ObjectSerializer(obj_list.objects_list.all(), many=True)
-        results.append({"list_name": obj_list.name, "objects": serialized_objects.data})
+        serialized_objects = ObjectSerializer(
+            Object.objects.filter(objectlist=obj_list["id"]), many=True
+        )
+        results.append(
+            {"list_name": obj_list["name"], "objects": serialized_objects.data}
+        )
 
-        return Response(results)
+        return with_etag(Response(results), etag)
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """
+        Objects of the user (of one list with list_name=) in
+        - a sky cone (degrees): ra, dec, radius; sorted by distance. With
+          project_name= instead of ra/dec the cone is centered on the project
+        - an RA/Dec box (degrees): ra_min, ra_max, dec_min, dec_max; ra_min >
+          ra_max wraps through RA 0
+        """
+        user_id = request.headers.get("user-id")
+        if not user_id:
+            return Response(
+                {"error": "missing user-id header"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        params = request.query_params
+        # objects belong to their list's owner, so the search runs on the
+        # (user_id, healpix) index
+        objects = Object.objects.all()
+        if params.get("list_name"):
+            obj_list = get_object_or_404(
+                ObjectList, name=params["list_name"], user_id=user_id
+            )
+            objects = objects.filter(objectlist=obj_list)
+
+        center = None
+        if params.get("project_name"):
+            project = get_object_or_404(
+                Project, name=params["project_name"], user_id=user_id
+            )
+            ras, decs = coords_to_deg([project.center_ra], [project.center_dec])
+            center = [float(ras[0]), float(decs[0])]
+        try:
+            box = [
+                params.get(key) for key in ("ra_min", "ra_max", "dec_min", "dec_max")
+            ]
+            box = [float(value) for value in box] if any(box) else None
+            cone = [params.get(key) for key in ("ra", "dec")]
+            cone = [float(value) for value in cone] if any(cone) else center
+            if cone is not None:
+                cone.append(float(params.get("radius")))
+        except (TypeError, ValueError):
+            return Response(
+                {
+                    "error": "ra/dec (or project_name) and radius, or "
+                    "ra_min/ra_max/dec_min/dec_max must all be numbers"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (box is None) == (cone is None):
+            return Response(
+                {"error": "give either a cone or a box"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if cone and not 0 <= cone[2] <= 180:
+            return Response(
+                {"error": "radius must be between 0 and 180 degrees"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if cone:
+            results = objects_in_cone(objects, *cone, OBJECT_FIELDS, user_id)
+        else:
+            results = objects_in_box(objects, *box, OBJECT_FIELDS, user_id)
+        return Response({"objects": results})
 
     @action(detail=False, methods=["get"], url_path="list_all")
     def list_obj_lists(self, request):
@@ -275,7 +401,7 @@ class ObjectViewSet(viewsets.ViewSet):
             {"object lists": list(obj_lists)},
             status=status.HTTP_200_OK,
         )
-      
+
     @action(detail=False, methods=["delete"], url_path="delete_obj")
     def delete_obj(self, request):
         list_name = request.query_params.get("list_name")
@@ -283,6 +409,7 @@ class ObjectViewSet(viewsets.ViewSet):
         user_id = request.headers.get("user-id")
         obj_list = get_object_or_404(ObjectList, name=list_name, user_id=user_id)
         obj = get_object_or_404(obj_list.objects, name=obj_name)
+        _bump_revisions_of(obj)
         obj_list.objects_list.remove(obj)
         obj.delete()
         return Response(
@@ -322,269 +449,255 @@ class ObjectViewSet(viewsets.ViewSet):
             obj.aux.update(request.data)
 
         obj.save()
+        _bump_revisions_of(obj)
 
         return Response(
             {"message": f"Object '{obj_name}' updated"}, status=status.HTTP_200_OK
         )
 
 
-class MaskViewSet(viewsets.ViewSet):
-    @staticmethod
-    def _file_cleanup(filename):
-        # clean up auto generated files
-        remove_file(f"{PROJECT_DIRECTORY}.loc_mgvers.dat")
-        remove_file(f"{PROJECT_DIRECTORY}.loc_ociw214.pem")
-        remove_file(f"{PROJECT_DIRECTORY}{filename}.obw")
+MASK_FIELDS = [
+    "name",
+    "status",
+    "center_ra",
+    "center_dec",
+    "instrument_version",
+    "instrument_setup",
+]
+MASK_ARRAYS = ["objects_list", "excluded_objects", "pruned_objects", "features"]
+OBJECT_FIELDS = ["name", "type", "right_ascension", "declination", "priority"]
 
-    @staticmethod
-    def _get_features(filepath):
-        features = []
-        with open(filepath, "rb") as f:
-            for line in f:
-                line = line.decode("utf-8").strip()
-                if line.startswith("SLIT"):
-                    parts = line.split()
-                    features.append(
-                        {
-                            "type": "SLIT",
-                            "id": parts[1],
-                            "ra": parts[2],
-                            "dec": parts[3],
-                            "x": float(parts[4]),
-                            "y": float(parts[5]),
-                            "width": float(parts[6]),
-                            "a_len": float(parts[7]),
-                            "b_len": float(parts[8]),
-                            "angle": float(parts[9]),
-                        }
-                    )
-                elif line.startswith("HOLE"):
-                    parts = line.split()
-                    features.append(
-                        {
-                            "type": "HOLE",
-                            "id": parts[1],
-                            "ra": parts[2],
-                            "dec": parts[3],
-                            "x": float(parts[4]),
-                            "y": float(parts[5]),
-                            "width": float(parts[6]),
-                            "shape_code": int(parts[7]),
-                            "a_len": float(parts[8]),
-                            "b_len": float(parts[9]),
-                            "angle": float(parts[10]),
-                        }
-                    )
-        return features
 
-    def retrieve(self, request, pk=None):
-        proj_name = request.query_params.get("project_name")
-        user_id = request.headers.get("user-id")
-        project = Project.objects.get(name=proj_name, user_id=user_id)
-        mask = project.masks.get(name=pk)
+def _param_list(value, allowed):
+    names = [name for name in value.split(",") if name]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"unknown names {unknown}, expected some of {allowed}")
+    return names
 
-        return Response(
-            {
-                "name": pk,
-                "status": mask.status,
-                "instrument_version": mask.instrument_version,
-                "instrument_setup": mask.instrument_setup,
-                "objects_list": [
-                    {
-                        "name": obj.name,
-                        "type": obj.type,
-                        "right_ascension": obj.right_ascension,
-                        "declination": obj.declination,
-                        "priority": obj.priority,
-                    }
-                    | (obj.aux or {})
-                    for obj in mask.objects_list.all()
-                ],
-                "excluded_objects": [
-                    {
-                        "name": obj.name,
-                        "type": obj.type,
-                        "right_ascension": obj.right_ascension,
-                        "declination": obj.declination,
-                        "priority": obj.priority,
-                    }
-                    | (obj.aux or {})
-                    for obj in mask.excluded_obj_list.all()
-                ],
-                "features": mask.features,
-            }
-        )
 
-    def _generate_single_mask(self, user_id, proj_name, data, project):
-        filename = data["filename"]
+def _with_aux(row):
+    aux = row.pop("aux")
+    return row | (aux or {})
 
-        generate_obj_file(user_id, proj_name, filename, data["objects"])
-        generate_obs_file(user_id, proj_name, data, [f"{filename}.obj"])
-        os.environ["MGPATH"] = MASKGEN_DIRECTORY
-        shutil.copy(
-            f"{PROJECT_DIRECTORY}{API_FOLDER}obj_files/{user_id}/{proj_name}/{filename}.obj",
-            f"{PROJECT_DIRECTORY}{API_FOLDER}obj_files/{user_id}/{proj_name}/{filename}.obj",
-            f"{MASKGEN_DIRECTORY}{filename}.obj",
-        )
-        shutil.copy(
-            f"{PROJECT_DIRECTORY}{API_FOLDER}obs_files/{user_id}/{proj_name}/{filename}.obs",
-            f"{PROJECT_DIRECTORY}{API_FOLDER}obs_files/{user_id}/{proj_name}/{filename}.obs",
-            f"{MASKGEN_DIRECTORY}{filename}.obs",
-        )
 
-        result, feedback = run_maskgen(
-            f"{MASKGEN_DIRECTORY}/maskgen -s {filename}.obs",
-            data["override"] == "true",
-        )
-        os.makedirs(
-            os.path.join(f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id),
-            exist_ok=True,
-        )
-        os.makedirs(
-            os.path.join(
-                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id, proj_name
-            ),
-            exist_ok=True,
-        )
-        result, feedback = run_maskgen(
-            f"{MASKGEN_DIRECTORY}/maskgen -s {filename}.obs",
-            data["override"] == "true",
-        )
-        os.makedirs(
-            os.path.join(f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id),
-            exist_ok=True,
+LISTING_FIELDS = ["id", "name", "status", "project_name", "user_id", "created_at"]
+LISTING_PAGE_SIZE = 100
+
+
+def _mask_listing(request, mask_status):
+    """
+    One page of the masks with mask_status, oldest first, in a single query.
+    Optional filters: user_id, instrument, created_after/created_before
+    (ISO date or datetime). page_size (default LISTING_PAGE_SIZE) and cursor
+    page through the results; next is null on the last page.
+    """
+    params = request.query_params
+    masks = Mask.objects.filter(status=mask_status).annotate(
+        project_name=Subquery(
+            Project.objects.filter(masks=OuterRef("pk")).values("name")[:1]
         )
-        os.makedirs(
-            os.path.join(
-                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id, proj_name
-            ),
-            exist_ok=True,
+    )
+    if params.get("user_id"):
+        masks = masks.filter(user_id=params["user_id"])
+    if params.get("instrument"):
+        masks = masks.filter(instrument_setup__instrument=params["instrument"])
+    try:
+        for param, lookup in (
+            ("created_after", "created_at__gte"),
+            ("created_before", "created_at__lt"),
+        ):
+            if params.get(param):
+                masks = masks.filter(**{lookup: _parse_when(params[param])})
+        page_size = min(int(params.get("page_size", LISTING_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+        results, next_cursor = values_page(
+            masks, LISTING_FIELDS, page_size, params.get("cursor")
         )
-        os.rename(
-            f"{PROJECT_DIRECTORY}{filename}.SMF",
-            f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{filename}.SMF",
-            f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{filename}.SMF",
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"results": results, "next": next_cursor})
+
+
+def _parse_when(value):
+    # dates parse as midnight
+    when = parse_datetime(value)
+    if when is None:
+        raise ValueError(f"invalid date {value!r}")
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+class MaskViewSet(viewsets.ViewSet):
+    def retrieve(self, request, pk=None):
+        """
+        A mask, by default with every field and array. fields= (comma list of
+        MASK_FIELDS) and include= (MASK_ARRAYS) select parts of it; with
+        fields= alone no arrays are included.
+
+        With page_size, each included array is paginated and next holds the
+        cursor to pass back as <array>_cursor (null on the last page).
+        """
+        proj_name = request.query_params.get("project_name")
+        user_id = request.headers.get("user-id")
+        params = request.query_params
+        # Mask.features is served from MaskFeature rows, the JSON isn't needed
+        mask = get_object_or_404(
+            Mask.objects.defer("features"),
+            project__name=proj_name,
+            project__user_id=user_id,
+            name=pk,
         )
+        etag = make_etag(request, "mask", mask.id, mask.revision)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
 
-        if result and "Writing object file with use counts to" in feedback:
-            # process features from SMF
-            filepath = os.path.join(
-                PROJECT_DIRECTORY,
-                API_FOLDER,
-                "smf_files",
-                user_id,
-                proj_name,
-                f"{filename}.SMF",
-                PROJECT_DIRECTORY,
-                API_FOLDER,
-                "smf_files",
-                user_id,
-                proj_name,
-                f"{filename}.SMF",
-            )
-            mask = Mask.objects.create(
-                name=filename,
-                user_id=user_id,
-                status=Status.DRAFT,
-                center_ra=data["center_ra"],
-                center_dec=data["center_dec"],
-                instrument_setup=data,
-                instrument_version=InstrumentConfig.objects.filter(
-                    instrument=data["instrument"]
+        try:
+            fields = _param_list(params.get("fields", ""), MASK_FIELDS) or MASK_FIELDS
+            if "include" in params:
+                include = _param_list(params["include"], MASK_ARRAYS)
+            else:
+                include = [] if "fields" in params else MASK_ARRAYS
+            page_size = params.get("page_size")
+            page_size = min(int(page_size), MAX_PAGE_SIZE) if page_size else None
+            if page_size is not None and page_size < 1:
+                raise ValueError("page_size must be positive")
+
+            data = {field: getattr(mask, field) for field in fields}
+            querysets = {
+                "objects_list": (mask.objects_list.all(), OBJECT_FIELDS + ["aux"]),
+                "excluded_objects": (
+                    mask.excluded_obj_list.all(),
+                    OBJECT_FIELDS + ["aux"],
+                ),
+                "pruned_objects": (
+                    mask.pruned_obj_list.all(),
+                    OBJECT_FIELDS + ["aux"],
+                ),
+                "features": (mask.feature_rows.all(), FEATURE_FIELDS),
+            }
+            next_cursors = {}
+            for array in include:
+                queryset, values = querysets[array]
+                rows, next_cursors[array] = values_page(
+                    queryset, values, page_size, params.get(f"{array}_cursor")
                 )
-                .order_by("-version")
-                .first()
-                .version,
-                features=self._get_features(filepath),
-            )
+                if array != "features":
+                    rows = [_with_aux(row) for row in rows]
+                data[array] = rows
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if page_size is not None:
+            data["next"] = next_cursors
+        return with_etag(Response(data), etag)
+
+    @action(detail=True, methods=["get"], url_path="features")
+    def features(self, request, pk=None):
+        """
+        Slits and holes of a mask, optionally only those
+        - in an x/y box (mm): xmin, xmax, ymin, ymax
+        - in a sky cone (degrees): ra, dec, radius; sorted by distance
+        - of one object: object=<name>
+        """
+        proj_name = request.query_params.get("project_name")
+        user_id = request.headers.get("user-id")
+        project = get_object_or_404(Project, name=proj_name, user_id=user_id)
+        mask = get_object_or_404(project.masks, name=pk)
+        params = request.query_params
 
-            result, feedback = categorize_objs(
-                mask, f"{PROJECT_DIRECTORY}{filename}.obw"
+        try:
+            box = [params.get(key) for key in ("xmin", "xmax", "ymin", "ymax")]
+            box = [float(value) for value in box] if any(box) else None
+            cone = [params.get(key) for key in ("ra", "dec", "radius")]
+            cone = [float(value) for value in cone] if any(cone) else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "xmin/xmax/ymin/ymax and ra/dec/radius must all be numbers"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            self._file_cleanup(filename)
 
-            project.masks.add(mask)
-            project.save()
-            return (
-                True,
-                Response(
-                    {
-                        "created": f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{filename}.SMF"
-                    },
-                    status=status.HTTP_201_CREATED,
-                ),
-                mask.excluded_obj_list.count(),
-            )
-        else:
-            self._file_cleanup(filename)
-            return False, Response(
-                {"error": feedback}, status=status.HTTP_400_BAD_REQUEST
-            )
+        queryset = mask.feature_rows.order_by("id")
+        if params.get("object"):
+            queryset = queryset.filter(object_name=params["object"])
+        if box:
+            queryset = in_box(queryset, *box)
+        if cone:
+            return Response({"features": in_cone(queryset, *cone)})
+        return Response({"features": list(queryset.values(*FEATURE_FIELDS))})
 
     @action(detail=False, methods=["post"], url_path="generate")
     def generate_masks(self, request):
         data = request.data
-        filename = data["filename"]
         proj_name = data["project_name"]
         user_id = request.headers.get("user-id")
         project = Project.objects.get(name=proj_name, user_id=user_id)
 
-        if project.masks.filter(name=filename).exists():
+        error = self._check_generation_request(project, data)
+        if error:
+            return error
+
+        result, payload = generate_masks(user_id, proj_name, data, project)
+        return Response(
+            payload,
+            status=status.HTTP_201_CREATED if result else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(detail=False, methods=["post"], url_path="preview")
+    def preview(self, request):
+        """
+        Estimate of the slit layout of a generate request (same body) without
+        running maskgen or storing anything, see preview.py
+        """
+        data = request.data
+        user_id = request.headers.get("user-id")
+        get_object_or_404(Project, name=data.get("project_name"), user_id=user_id)
+        try:
+            result = preview_mask(user_id, data["project_name"], data)
+        except (KeyError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    @action(detail=False, methods=["post"], url_path="submit")
+    def submit_masks(self, request):
+        """
+        Queue a mask generation job (same body as generate) for the worker
+        pool and return immediately with the job id
+        """
+        data = request.data
+        proj_name = data["project_name"]
+        user_id = request.headers.get("user-id")
+        project = Project.objects.get(name=proj_name, user_id=user_id)
+
+        error = self._check_generation_request(project, data)
+        if error:
+            return error
+
+        job = Job.objects.create(user_id=user_id, project_name=proj_name, payload=data)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _check_generation_request(project, data):
+        if project.masks.filter(name=data["filename"]).exists():
             return Response(
                 {"error": "mask name already exists for project"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        valid, feedback = validate(data)
+        valid, feedback = validate(data, get_config(data.get("instrument")))
         if not valid:
             return Response(
                 {"error": feedback},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        generate_until_all = data.get("generate_until_all_included", False)
-        vary_rotator = data.get("vary_rotator_range")
-        generated = []
-        if vary_rotator:
-            for angle in range(
-                vary_rotator["start"], vary_rotator["end"] + 1, vary_rotator["step"]
-            ):
-                data["rotator_angle"] = angle
-                data["filename"] = filename + f"_rot{angle}"
-                result, response, _ = self._generate_single_mask(
-                    self, user_id, proj_name, data, project
-                )
-                if result:
-                    generated.append(data["filename"])
-                else:
-                    return response
-            return Response(
-                {"created": generated},
-                status=status.HTTP_201_CREATED,
-            )
-        elif generate_until_all:
-            suffix_count = 1
-            excluded_count = 1
-            while excluded_count > 0:
-                data["filename"] = filename + f"_v{suffix_count}"
-                result, response, excluded_count = self._generate_single_mask(
-                    self, user_id, proj_name, data, project
-                )
-                if not result:
-                    return response
-                generated.append(data["filename"])
-                suffix_count += 1
-            return Response(
-                {"created": generated},
-                status=status.HTTP_201_CREATED,
-            )
-        else:
-            result, response, _ = self._generate_single_mask(
-                user_id, proj_name, data, project
-            )
-            if result:
-                generated.append(data["filename"])
-            return response
+        try:
+            check_objects(project.user_id, project.name, data.get("objects"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return None
 
     @action(detail=False, methods=["post"], url_path="finalize")
     def finalize_mask(self, request):
@@ -596,6 +709,7 @@ class MaskViewSet(viewsets.ViewSet):
         mask = project.masks.get(name=mask_name)
         if mask:
             mask.status = Status.FINALIZED
+            mask.revision = F("revision") + 1
             mask.save()
             return Response(
                 {"message": "Mask marked as FINALIZED"}, status=status.HTTP_200_OK
@@ -616,6 +730,7 @@ class MaskViewSet(viewsets.ViewSet):
         mask = project.masks.get(name=mask_name)
         if mask:
             mask.status = Status.COMPLETED
+            mask.revision = F("revision") + 1
             mask.save()
             return Response(
                 {"message": "Mask marked as COMPLETED"}, status=status.HTTP_200_OK
@@ -636,6 +751,7 @@ class MaskViewSet(viewsets.ViewSet):
         mask = project.masks.get(name=mask_name)
         if mask:
             mask.status = Status.DRAFT
+            mask.revision = F("revision") + 1
             mask.save()
             return Response(
                 {"message": "Mask marked as COMPLETED"}, status=status.HTTP_200_OK
@@ -691,20 +807,103 @@ class MaskViewSet(viewsets.ViewSet):
     @action(detail=False, methods=["get"], url_path="finalized_masks")
     def get_finalized_masks(self, request):
         """
-        Return all masks whose status is FINALIZED
+        Return masks whose status is FINALIZED (see _mask_listing)
         """
-        masks = Mask.objects.filter(status="finalized")
-        serializer = MaskSerializer(masks, many=True)
-        return Response(serializer.data)
+        return _mask_listing(request, Status.FINALIZED)
 
     @action(detail=False, methods=["get"], url_path="completed_masks")
     def get_completed_masks(self, request):
         """
-        Return all masks whose status is COMPLETED
+        Return masks whose status is COMPLETED (see _mask_listing)
+        """
+        return _mask_listing(request, Status.COMPLETED)
+
+    @action(detail=False, methods=["get"], url_path="cache_stats")
+    def cache_stats(self, request):
+        """
+        Return hit/miss counters and size of the maskgen result cache
+        """
+        return Response(artifact_cache.stats())
+
+
+def _job_event_stream(job_id, last_id):
+    idle_since = time.monotonic()
+    while True:
+        # events are stored before the job's final status, so once a finished
+        # status is seen the query below returns everything that is left
+        job_status = (
+            Job.objects.filter(id=job_id).values_list("status", flat=True).first()
+        )
+        events = JobEvent.objects.filter(job_id=job_id, id__gt=last_id).order_by("id")
+        for event in events:
+            last_id = event.id
+            idle_since = time.monotonic()
+            yield f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+        if job_status not in (JobStatus.QUEUED, JobStatus.RUNNING):
+            yield f"event: end\ndata: {json.dumps({'status': job_status})}\n\n"
+            return
+        if time.monotonic() - idle_since > 15:
+            idle_since = time.monotonic()
+            yield ": keep-alive\n\n"
+        time.sleep(settings.JOB_STREAM_POLL_INTERVAL)
+
+
+class JobViewSet(viewsets.ViewSet):
+    def retrieve(self, request, pk=None):
+        user_id = request.headers.get("user-id")
+        job = get_object_or_404(Job, id=pk, user_id=user_id)
+        return Response(JobSerializer(job).data)
+
+    @action(detail=True, methods=["post"], url_path="cancel")
+    def cancel(self, request, pk=None):
+        user_id = request.headers.get("user-id")
+        job = get_object_or_404(Job, id=pk, user_id=user_id)
+        if job.status not in (JobStatus.QUEUED, JobStatus.RUNNING):
+            return Response(
+                {"error": f"job already {job.status}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        cancel_job(job)
+        job.refresh_from_db()
+        return Response(JobSerializer(job).data)
+
+    @action(detail=True, methods=["get"], url_path="result")
+    def result(self, request, pk=None):
+        user_id = request.headers.get("user-id")
+        job = get_object_or_404(Job, id=pk, user_id=user_id)
+        if job.status in (JobStatus.QUEUED, JobStatus.RUNNING):
+            return Response(
+                {"error": f"job is {job.status}"}, status=status.HTTP_409_CONFLICT
+            )
+        return Response(
+            {"status": job.status, "result": job.result, "error": job.error}
+        )
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="stream",
+        renderer_classes=[EventStreamRenderer, JSONRenderer],
+    )
+    def stream(self, request, pk=None):
+        """
+        Server-sent events of a job: "output" events ({"lines": [...]}) with
+        maskgen's output, "progress" events and a final "end" event with the
+        job's status. Resumes after the Last-Event-ID header if given.
+        EventSource can't set headers, so user_id may be a query parameter.
         """
-        masks = Mask.objects.filter(status="completed")
-        serializer = MaskSerializer(masks, many=True)
-        return Response(serializer.data)
+        user_id = request.headers.get("user-id") or request.query_params.get("user_id")
+        job = get_object_or_404(Job, id=pk, user_id=user_id)
+        try:
+            last_id = int(request.headers.get("Last-Event-ID", 0))
+        except ValueError:
+            last_id = 0
+        response = StreamingHttpResponse(
+            _job_event_stream(job.id, last_id), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+        return response
 
 
 class MachineViewSet(viewsets.ViewSet):
@@ -715,7 +914,6 @@ class MachineViewSet(viewsets.ViewSet):
         user_id = request.headers.get("user-id")
         mask_name = data["mask_name"]
         overwrite = data["overwrite"] == "true"
-        overwrite = data["overwrite"] == "true"
         project = Project.objects.get(name=proj_name, user_id=user_id)
         mask = project.masks.get(name=mask_name)
         file_path = f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files/{user_id}/{proj_name}/I{mask_name}.nc"
@@ -727,40 +925,28 @@ class MachineViewSet(viewsets.ViewSet):
             )
 
         if mask.status == Status.FINALIZED:
-            os.environ["MGPATH"] = MASKGEN_DIRECTORY
-            shutil.copy(
-                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{mask_name}.SMF",
-                f"{MASKGEN_DIRECTORY}{mask_name}.SMF",
-            )
-            result, feedback = run_maskcut(
-                f"{MASKGEN_DIRECTORY}/maskcut {mask_name}", overwrite
-            )
-            result, feedback = run_maskcut(
-                f"{MASKGEN_DIRECTORY}/maskcut {mask_name}", overwrite
-            )
-            if result and "Estimated cutting time" in feedback:
-                os.makedirs(
-                    os.path.join(
-                        f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files", user_id, proj_name
-                    ),
-                    exist_ok=True,
-                )
-                os.makedirs(
-                    os.path.join(f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files", user_id),
-                    exist_ok=True,
-                )
-                os.makedirs(
-                    os.path.join(
-                        f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files", user_id, proj_name
-                    ),
-                    exist_ok=True,
+            with scratch_directory(
+                MASKGEN_DIRECTORY, root=settings.MASKGEN_SCRATCH_ROOT
+            ) as workdir:
+                shutil.copy(
+                    f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{mask_name}.SMF",
+                    workdir,
                 )
-                os.rename(
-                    f"{PROJECT_DIRECTORY}I{mask_name}.nc",
-                    f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files/{user_id}/{proj_name}/I{mask_name}.nc",
-                    f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files/{user_id}/{proj_name}/I{mask_name}.nc",
+                feature_count = len(mask.features)
+                timeout, limits = tool_limits("maskcut", feature_count)
+                result, feedback, metrics = run_maskcut(
+                    f"{MASKGEN_DIRECTORY}maskcut {mask_name}",
+                    overwrite,
+                    cwd=workdir,
+                    env=tool_env(workdir),
+                    timeout=timeout,
+                    limits=limits,
                 )
-
+                record_tool_run("maskcut", user_id, feature_count, timeout, metrics)
+                if result and "Estimated cutting time" in feedback:
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    shutil.move(os.path.join(workdir, f"I{mask_name}.nc"), file_path)
+            if result and "Estimated cutting time" in feedback:
                 mask.status = Status.COMPLETED
                 return Response(
                     {"created": f"I{mask_name}.nc"},
@@ -0,0 +1,178 @@
+import importlib
+import numpy as np
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api.catalog import objects_in_box, objects_in_cone
+from maskgen_api.healpix import (
+    HEALPIX_ORDER,
+    ang2pix_nest,
+    cone_ranges,
+    separation,
+    sky_columns,
+)
+from maskgen_api.ingest import bulk_create_objects
+from maskgen_api.models import Object, ObjectList, Project
+
+client = APIClient()
+FIELDS = ["name", "right_ascension", "declination"]
+
+
+def _in_ranges(pixels, ranges):
+    return np.array(
+        [any(start <= pixel < stop for start, stop in ranges) for pixel in pixels]
+    )
+
+
+def test_cone_ranges_cover_the_cone():
+    rng = np.random.default_rng(0)
+    for ra, dec, radius in [(150.1, 2.2, 0.25), (0.01, 89.9, 0.2), (359.9, -45, 1)]:
+        # points spread over and just around the cone
+        offsets = radius * 1.2 * np.sqrt(rng.random(2000))
+        angles = 2 * np.pi * rng.random(2000)
+        decs = np.clip(dec + offsets * np.sin(angles), -90, 90)
+        ras = (ra + offsets * np.cos(angles) / np.cos(np.radians(decs))) % 360
+        inside = separation(ra, dec, ras, decs) <= radius
+
+        ranges = cone_ranges(ra, dec, radius)
+        covered = _in_ranges(ang2pix_nest(HEALPIX_ORDER, ras, decs), ranges)
+        assert covered[inside].all()
+        assert len(ranges) < 40
+
+    assert cone_ranges(10, 10, 70) is None
+
+
+@pytest.fixture
+def objects(db):
+    project = Project.objects.create(
+        name="field", user_id="test", center_ra="10:00:24", center_dec="02:12:00"
+    )
+    obj_list = ObjectList.objects.create(
+        name="targets", user_id="test", project_name=project.name
+    )
+    rng = np.random.default_rng(1)
+    # a 2 degree patch around the project's center, across RA 0 and a pole
+    ras = np.concatenate(
+        [
+            150.1 + 2 * rng.random(1000) - 1,
+            2 * rng.random(300) - 1,
+            360 * rng.random(100),
+        ]
+    )
+    ras %= 360
+    decs = np.concatenate(
+        [2.2 + 2 * rng.random(1000) - 1, 2 * rng.random(300) - 1, 89 + rng.random(100)]
+    )
+    columns = {
+        "name": [f"obj{i}" for i in range(len(ras))],
+        "type": ["TARGET"] * len(ras),
+        "ra": ras,
+        "dec": decs,
+        "priority": [1] * len(ras),
+        "aux": [{}] * len(ras),
+    }
+    bulk_create_objects(obj_list, "test", [columns])
+    return ras, decs
+
+
+@pytest.mark.parametrize(
+    "ra,dec,radius", [(150.1, 2.2, 0.3), (0.05, 0.1, 0.5), (120, 89.6, 0.5)]
+)
+def test_objects_in_cone(objects, ra, dec, radius):
+    ras, decs = objects
+    distances = separation(ra, dec, ras, decs)
+    expected = sorted(f"obj{i}" for i in np.flatnonzero(distances <= radius))
+
+    rows = objects_in_cone(Object.objects.all(), ra, dec, radius, FIELDS, "test")
+
+    assert sorted(row["name"] for row in rows) == expected
+    assert len(expected) > 10
+    found = [row["distance"] for row in rows]
+    assert found == sorted(found)
+    assert set(rows[0]) == set(FIELDS) | {"distance"}
+
+
+def test_objects_in_box(objects):
+    ras, decs = objects
+    inside = ((ras >= 359.5) | (ras <= 0.5)) & (decs >= -0.2) & (decs <= 0.4)
+    expected = sorted(f"obj{i}" for i in np.flatnonzero(inside))
+
+    rows = objects_in_box(Object.objects.all(), 359.5, 0.5, -0.2, 0.4, FIELDS)
+
+    assert sorted(row["name"] for row in rows) == expected
+    assert len(expected) > 10
+
+
+@pytest.mark.parametrize("ra_min,ra_max", [(0, 360), (-180, 180)])
+def test_objects_in_full_ra_box(objects, ra_min, ra_max):
+    ras, decs = objects
+    inside = (decs >= 1.5) & (decs <= 2.5)
+    expected = sorted(f"obj{i}" for i in np.flatnonzero(inside))
+
+    rows = objects_in_box(Object.objects.all(), ra_min, ra_max, 1.5, 2.5, FIELDS)
+
+    # the patch at RA 150 is as far from ra_min as it gets
+    assert sorted(row["name"] for row in rows) == expected
+    assert len(expected) > 10
+
+
+def test_sky_columns_follow_saves(objects):
+    obj = Object.objects.get(name="obj0")
+    assert obj.healpix == ang2pix_nest(
+        HEALPIX_ORDER, obj.right_ascension, obj.declination
+    )
+
+    obj.right_ascension, obj.declination = 200.0, -30.0
+    obj.save(update_fields=["right_ascension", "declination"])
+    obj.refresh_from_db()
+    assert obj.healpix == ang2pix_nest(HEALPIX_ORDER, 200.0, -30.0)
+    assert obj.unit_z == pytest.approx(-0.5)
+
+
+def _search(**params):
+    return client.get("/api/objects/search/", params, HTTP_USER_ID="test")
+
+
+def test_search_endpoint(objects):
+    ras, decs = objects
+    # the project's center is 10:00:24 +02:12:00, (150.1, 2.2)
+    distances = separation(150.1, 2.2, ras, decs)
+    expected = sorted(f"obj{i}" for i in np.flatnonzero(distances <= 0.25))
+
+    response = _search(list_name="targets", project_name="field", radius=0.25)
+
+    assert response.status_code == 200
+    assert sorted(obj["name"] for obj in response.data["objects"]) == expected
+    same = _search(ra=150.1, dec=2.2, radius=0.25)
+    assert same.data["objects"] == response.data["objects"]
+
+    box = _search(ra_min=150, ra_max=150.2, dec_min=2, dec_max=2.1)
+    assert box.status_code == 200
+    assert all(
+        150 <= obj["right_ascension"] <= 150.2 and 2 <= obj["declination"] <= 2.1
+        for obj in box.data["objects"]
+    )
+
+    assert _search(list_name="nope", ra=1, dec=1, radius=1).status_code == 404
+
+
+def test_search_rejects_bad_params(objects):
+    for params in (
+        {},
+        {"ra": 1, "dec": 1},
+        {"ra": "x", "dec": 1, "radius": 1},
+        {"ra": 1, "dec": 1, "radius": 200},
+        {"ra": 1, "dec": 1, "radius": 1, "ra_min": 0, "ra_max": 1},
+    ):
+        assert _search(**params).status_code == 400
+    response = client.get("/api/objects/search/", {"ra": 1, "dec": 1, "radius": 1})
+    assert response.status_code == 400
+
+
+def test_sky_index_migration_matches_healpix():
+    # the backfill keeps its own copy of the pixel function
+    migration = importlib.import_module("maskgen_api.migrations.0010_object_sky_index")
+    rng = np.random.default_rng(2)
+    ras = np.concatenate([360 * rng.random(2000), [0.0, 360.0, 90.0]])
+    decs = np.concatenate([180 * rng.random(2000) - 90, [90.0, -90.0, 41.8]])
+
+    assert migration.sky_columns(ras, decs) == sky_columns(ras, decs)
@@ -0,0 +1,161 @@
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from maskgen_api.models import (
+    Image,
+    InstrumentConfig,
+    Mask,
+    Object,
+    ObjectList,
+    Project,
+)
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+HEADERS = {"HTTP_USER_ID": "test"}
+
+
+@pytest.fixture
+def project():
+    project = Project.objects.create(
+        name="test", user_id="test", center_ra="10:00:18.5", center_dec="02:22:04"
+    )
+    obj = Object.objects.create(
+        name="o1",
+        user_id="test",
+        type="TARGET",
+        right_ascension=150.0,
+        declination=2.0,
+        aux={},
+    )
+    obj_list = ObjectList.objects.create(
+        name="list", user_id="test", project_name="test"
+    )
+    obj_list.objects_list.add(obj)
+    mask = Mask.objects.create(
+        name="m1",
+        user_id="test",
+        center_ra="10:00:18.5",
+        center_dec="02:22:04",
+        features=[],
+        instrument_version=1,
+        instrument_setup={},
+    )
+    mask.objects_list.add(obj)
+    project.masks.add(mask)
+    return project
+
+
+def _get_mask(etag=None, **params):
+    headers = dict(HEADERS)
+    if etag:
+        headers["HTTP_IF_NONE_MATCH"] = etag
+    return client.get("/api/masks/m1/", {"project_name": "test", **params}, **headers)
+
+
+def _get_list(etag=None):
+    headers = dict(HEADERS)
+    if etag:
+        headers["HTTP_IF_NONE_MATCH"] = etag
+    return client.get("/api/objects/viewlist/", {"list_name": "list"}, **headers)
+
+
+def test_mask_not_modified(project, django_assert_num_queries):
+    response = _get_mask()
+    etag = response["ETag"]
+    assert response.status_code == 200
+    assert "no-cache" in response["Cache-Control"]
+
+    # only the mask row is read
+    with django_assert_num_queries(1):
+        response = _get_mask(etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    assert response.content == b""
+
+
+def test_mask_etag_depends_on_params_and_status(project):
+    etag = _get_mask()["ETag"]
+    assert _get_mask(etag, fields="name")["ETag"] != etag
+
+    client.post(
+        "/api/masks/finalize/",
+        {"project_name": "test", "mask_name": "m1"},
+        format="json",
+        **HEADERS,
+    )
+    response = _get_mask(etag)
+    assert response.status_code == 200
+    assert response.data["status"] == "finalized"
+    assert response["ETag"] != etag
+
+
+def test_object_edit_changes_list_and_mask_etags(project):
+    list_etag = _get_list()["ETag"]
+    mask_etag = _get_mask()["ETag"]
+    assert _get_list(list_etag).status_code == 304
+
+    client.patch(
+        "/api/objects/edit/",
+        {"list_name": "list", "obj_name": "o1", "priority": 5},
+        format="json",
+        **HEADERS,
+    )
+
+    response = _get_list(list_etag)
+    assert response.status_code == 200
+    assert response.data[0]["objects"][0]["priority"] == 5
+    assert _get_mask(mask_etag).status_code == 200
+
+
+def test_instrument_etag_follows_latest_version():
+    url = "/api/instruments/IMACS_sc/"
+    InstrumentConfig.objects.create(
+        instrument="IMACS_sc", version=1, filters={}, dispersers={}, aux={}
+    )
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    InstrumentConfig.objects.create(
+        instrument="IMACS_sc", version=2, filters={"B": "H"}, dispersers={}, aux={}
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data["filters"] == {"B": "H"}
+    # pinned versions keep their own ETag
+    pinned = client.get(url, {"version": 1})["ETag"]
+    assert client.get(url, {"version": 1}, HTTP_IF_NONE_MATCH=pinned).status_code == 304
+
+
+def test_instrument_etag_follows_edits_in_place():
+    url = "/api/instruments/IMACS_sc/"
+    config = InstrumentConfig.objects.create(
+        instrument="IMACS_sc", version=1, filters={}, dispersers={}, aux={}
+    )
+    etag = client.get(url)["ETag"]
+
+    config.aux = {"wlimit_low": 4000.0, "wlimit_high": 6000.0}
+    config.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response.data["aux"]["wlimit_low"] == 4000.0
+
+
+def test_image_not_modified(project, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    image = Image.objects.create(
+        name="field.jpg",
+        image=SimpleUploadedFile("field.jpg", b"\xff\xd8\xff\xe0 not really a jpeg"),
+    )
+    project.images.add(image)
+    params = {"img_name": "field.jpg", "project_name": "test"}
+
+    response = client.get("/api/images/getimg/", params, **HEADERS)
+    assert response.status_code == 200
+    etag = response["ETag"]
+
+    response = client.get(
+        "/api/images/getimg/", params, HTTP_IF_NONE_MATCH=etag, **HEADERS
+    )
+    assert response.status_code == 304
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from django.conf import settings
+from django.db import connection
+
+script_dir = os.path.dirname(__file__)
+SCRIPT = os.path.join(script_dir, "test_files", "concurrent_uploads.py")
+UPLOADS = 8
+OBJECTS_PER_UPLOAD = 500
+
+
+def _profile_env(profile, tmp_path):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="backend.settings")
+    env["PYTHONPATH"] = os.pathsep.join([settings.BASE_DIR.as_posix(), script_dir])
+    env["DJANGO_DB_PROFILE"] = profile
+    if profile == "sqlite":
+        env["SQLITE_PATH"] = str(tmp_path / "db.sqlite3")
+    else:
+        # a scratch database: the script migrates it and writes to it
+        if not os.environ.get("MASKGEN_TEST_POSTGRES_DB"):
+            pytest.skip("set MASKGEN_TEST_POSTGRES_DB (and POSTGRES_*) to run")
+        env["POSTGRES_DB"] = os.environ["MASKGEN_TEST_POSTGRES_DB"]
+    return env
+
+
+@pytest.mark.parametrize("profile", ["sqlite", "postgresql"])
+def test_parallel_uploads(profile, tmp_path):
+    result = subprocess.run(
+        [sys.executable, SCRIPT, str(UPLOADS), str(OBJECTS_PER_UPLOAD)],
+        env=_profile_env(profile, tmp_path),
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    outcome = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # no "database is locked": every upload waits for the writer before it
+    assert outcome["statuses"] == [201] * UPLOADS
+    assert outcome["lists"] == UPLOADS
+    assert outcome["objects"] == UPLOADS * OBJECTS_PER_UPLOAD
+    if profile == "sqlite":
+        assert outcome["journal_mode"] == "wal"
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "sqlite", reason="SQLite profile only")
+def test_sqlite_pragmas():
+    pragmas = {}
+    with connection.cursor() as cursor:
+        for name in ("busy_timeout", "synchronous", "mmap_size"):
+            cursor.execute(f"PRAGMA {name}")
+            row = cursor.fetchone()
+            pragmas[name] = row[0] if row else None
+
+    assert pragmas["busy_timeout"] == settings.SQLITE_BUSY_TIMEOUT_MS
+    assert pragmas["synchronous"] == 1  # NORMAL
+    # in-memory test databases have no mmap_size
+    assert pragmas["mmap_size"] in (None, settings.SQLITE_MMAP_SIZE)
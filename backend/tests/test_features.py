@@ -0,0 +1,131 @@
+import math
+import os
+import numpy as np
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+from maskgen_api.features import FEATURE_BATCH_SIZE, store_features
+from maskgen_api.models import Mask, MaskFeature, Project
+from maskgen_api.smf import read_smf
+
+pytestmark = pytest.mark.django_db
+script_dir = os.path.dirname(__file__)
+SMF_PATH = os.path.join(script_dir, "data", "DCM5V5E.SMF")
+client = APIClient()
+
+
+def _mask(features, name="DCM5V5E"):
+    project, _ = Project.objects.get_or_create(
+        name="test", user_id="test", center_ra="10:00:18.5", center_dec="02:22:04"
+    )
+    mask = Mask.objects.create(
+        name=name,
+        user_id="test",
+        center_ra="10:00:18.5",
+        center_dec="02:22:04",
+        features=features,
+        instrument_version=1,
+        instrument_setup={},
+    )
+    store_features(mask, features)
+    project.masks.add(mask)
+    return mask
+
+
+def _get(mask_name, **params):
+    return client.get(
+        f"/api/masks/{mask_name}/features/",
+        {"project_name": "test", **params},
+        **{"HTTP_USER_ID": "test"},
+    )
+
+
+@pytest.fixture
+def smf_features():
+    features = read_smf(SMF_PATH).features()
+    _mask(features)
+    return features
+
+
+def test_features_are_bulk_inserted(smf_features, django_assert_num_queries):
+    mask = Mask.objects.get(name="DCM5V5E")
+    assert MaskFeature.objects.filter(mask=mask).count() == 1834
+
+    empty = _mask([], name="empty")
+    # multi-row INSERTs, as large as the database allows (999 params on SQLite)
+    fields = [f for f in MaskFeature._meta.concrete_fields if not f.primary_key]
+    batch = min(
+        FEATURE_BATCH_SIZE,
+        connection.ops.bulk_batch_size(fields, smf_features),
+    )
+    with django_assert_num_queries(math.ceil(len(smf_features) / batch)):
+        store_features(empty, smf_features)
+
+
+def test_features_in_box(smf_features):
+    response = _get("DCM5V5E", xmin=-50, xmax=50, ymin=-20, ymax=20)
+
+    assert response.status_code == 200
+    expected = {
+        f["id"] for f in smf_features if -50 <= f["x"] <= 50 and -20 <= f["y"] <= 20
+    }
+    assert {f["object_name"] for f in response.data["features"]} == expected
+    assert 0 < len(expected) < len(smf_features)
+
+
+def test_features_in_cone(smf_features):
+    ra, dec, radius = 150.05, 2.35, 0.05
+    response = _get("DCM5V5E", ra=ra, dec=dec, radius=radius)
+
+    assert response.status_code == 200
+    ras = np.radians([f["ra_deg"] for f in smf_features])
+    decs = np.radians([f["dec_deg"] for f in smf_features])
+    cos_distance = np.sin(decs) * np.sin(np.radians(dec)) + np.cos(decs) * np.cos(
+        np.radians(dec)
+    ) * np.cos(ras - np.radians(ra))
+    inside = np.degrees(np.arccos(np.clip(cos_distance, -1, 1))) <= radius
+    expected = {f["id"] for f, keep in zip(smf_features, inside) if keep}
+    features = response.data["features"]
+    assert {f["object_name"] for f in features} == expected
+    assert [f["distance"] for f in features] == sorted(f["distance"] for f in features)
+
+
+def test_cone_wraps_around_ra_zero():
+    feature = {
+        "type": "HOLE",
+        "x": 0.0,
+        "y": 0.0,
+        "width": 1.7,
+        "shape_code": 1,
+        "a_len": 0.8,
+        "b_len": 0.8,
+        "angle": 0.0,
+        "dec_deg": 0.0,
+    }
+    _mask(
+        [
+            feature | {"id": "east", "ra_deg": 359.99},
+            feature | {"id": "west", "ra_deg": 0.01},
+            feature | {"id": "far", "ra_deg": 1.0},
+        ],
+        name="wrap",
+    )
+
+    response = _get("wrap", ra=0.0, dec=0.0, radius=0.05)
+
+    assert {f["object_name"] for f in response.data["features"]} == {"east", "west"}
+
+
+def test_feature_of_object(smf_features):
+    response = _get("DCM5V5E", object="DC-1033218")
+
+    assert response.status_code == 200
+    [feature] = response.data["features"]
+    assert feature["type"] == "SLIT"
+    assert feature["x"] == pytest.approx(180.029)
+
+
+def test_bad_region(smf_features):
+    assert _get("DCM5V5E", xmin=0, xmax=1).status_code == 400
+    assert _get("DCM5V5E", ra="x", dec=0, radius=1).status_code == 400
+    assert _get("missing").status_code == 404
@@ -0,0 +1,95 @@
+"""
+Runs parallel object list uploads against the database selected by the
+environment (DJANGO_DB_PROFILE etc.) and prints the outcome as JSON.
+Used by tests/test_database.py in a subprocess, so the uploads see the real
+database profile instead of pytest's in-memory test database.
+
+usage: python concurrent_uploads.py <uploads> <objects per upload>
+"""
+
+import json
+import sys
+import threading
+from io import BytesIO
+
+import django
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from maskgen_api.models import Object, ObjectList, Project  # noqa: E402
+
+
+def upload(index, size, statuses):
+    rows = [
+        {
+            "name": f"u{index}_o{i}",
+            "type": "TARGET",
+            "ra": 1.0,
+            "dec": 2.0,
+            "priority": 1,
+        }
+        for i in range(size)
+    ]
+    file = BytesIO(json.dumps(rows).encode())
+    file.name = "upload.json"
+    try:
+        response = APIClient().post(
+            "/api/objects/upload/",
+            {"file": file, "list_name": f"list{index}", "project_name": "concurrent"},
+            format="multipart",
+            HTTP_USER_ID="concurrent",
+        )
+        statuses[index] = response.status_code
+    except Exception as e:
+        statuses[index] = repr(e)
+    finally:
+        connections.close_all()
+
+
+def main(uploads, size):
+    setup_test_environment()  # lets the test client's host through
+    call_command("migrate", verbosity=0)
+    # leftovers of an earlier run on a reused database
+    ObjectList.objects.filter(user_id="concurrent").delete()
+    Object.objects.filter(user_id="concurrent").delete()
+    Project.objects.get_or_create(
+        name="concurrent", user_id="concurrent", center_ra="0", center_dec="0"
+    )
+    statuses = [None] * uploads
+    barrier = threading.Barrier(uploads)
+
+    def run(index):
+        barrier.wait()
+        upload(index, size, statuses)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(uploads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    journal_mode = None
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+    lists = ObjectList.objects.filter(user_id="concurrent")
+    print(
+        json.dumps(
+            {
+                "statuses": statuses,
+                "lists": lists.count(),
+                "objects": sum(obj_list.objects_list.count() for obj_list in lists),
+                "journal_mode": journal_mode,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]), int(sys.argv[2]))
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+from maskgen_api.fov import field_filter, focal_plane, in_field
+from maskgen_api.smf import read_smf
+
+script_dir = os.path.dirname(__file__)
+SMF_PATH = os.path.join(script_dir, "data", "DCM5V5E.SMF")
+CENTER = {"center_ra": "10:00:18.500", "center_dec": "02:22:04.00"}
+
+
+@pytest.fixture
+def slits():
+    features = read_smf(SMF_PATH).features()
+    return {
+        key: np.array([feature[key] for feature in features])
+        for key in ("ra_deg", "dec_deg", "x", "y")
+    }
+
+
+def test_projection_matches_maskgen(slits):
+    x, y = focal_plane(slits["ra_deg"], slits["dec_deg"], 150.0770833, 2.3677778)
+
+    # maskgen also corrects for distortion and refraction, a millimeter or so
+    assert np.abs(x - slits["x"]).max() < 2
+    assert np.abs(y - slits["y"]).max() < 2
+
+
+def test_rotation_and_far_side():
+    x, y = focal_plane([10.0, 190.0], [0.0, 0.0], 0.0, 0.0, position=90)
+
+    # east of the center lands on +y once the mask's +y points east
+    assert y[0] == pytest.approx(71139.8 * np.tan(np.radians(10)))
+    assert x[0] == pytest.approx(0, abs=1e-9)
+    assert np.isnan(x[1]) and not in_field(x, y, ("circle", 1e9), 0)[1]
+
+
+@pytest.mark.django_db
+def test_field_filter(slits):
+    keep = field_filter({"instrument": "IMACS_sc", "position": 0, **CENTER})
+
+    # everything maskgen placed is inside the field
+    assert keep(slits["ra_deg"], slits["dec_deg"]).all()
+    assert not keep([150.077], [2.9]).any()  # 32' north
+
+    square = {"instrument": "IMACS_f4", "fov_margin": 0, **CENTER}
+    # 9' north: outside the 15.4' square, inside it turned by 45 degrees
+    ra, dec = 150.0770833, 2.3677778 + 0.15
+    assert not field_filter(square | {"position": 0})([ra], [dec]).any()
+    assert field_filter(square | {"position": 45})([ra], [dec]).all()
+
+    assert field_filter({"instrument": "unknown", **CENTER}) is None
+    assert (
+        field_filter({"instrument": "IMACS_sc", "center_ra": "x", "center_dec": 1})
+        is None
+    )
@@ -0,0 +1,302 @@
+import json
+import os
+import shutil
+import stat
+import time
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from maskgen_api import artifact_cache, generation
+from maskgen_api.models import (
+    InstrumentConfig,
+    Mask,
+    MaskFeature,
+    Object,
+    ObjectList,
+    Project,
+    ToolRun,
+)
+
+pytestmark = pytest.mark.django_db
+script_dir = os.path.dirname(__file__)
+API_DIR = os.path.join(script_dir, "..", "maskgen_api")
+SETUP_PATH = os.path.join(script_dir, "test_files", "instrum_setup_works_ex.json")
+USER_ID = "generation_test_user"
+client = APIClient()
+
+# Stand-in for the maskgen binary: writes an SMF with one slit and an .obw that
+# marks the first POSITION/10 + 1 objects as used
+FAKE_MASKGEN = """#!/bin/sh
+base=${2%.obs}
+pos=$(awk '/^POSITION/ {print int($2)}' $2)
+echo "NAME $base" > $base.SMF
+echo "MADE 2018-08-17  MaskGen  2.27.93" >> $base.SMF
+echo "!.OC $base 10:00:18.500 +02:22:04.00 2000.0" >> $base.SMF
+echo "SLIT o1 10:00:00.000 02:00:00.00 1.0 2.0 0.414 1.0 1.0 0.00" >> $base.SMF
+awk -v n=$pos 'NR > 1 { if (NR - 2 <= n / 10) print $0 " Use=1"; else print $0 }' \
+    $base.obj > $base.obw
+echo "Writing object file with use counts to $base.obw"
+"""
+
+
+@pytest.fixture
+def fake_maskgen(tmp_path, monkeypatch, settings):
+    tool_dir = tmp_path / "maskgen-dist"
+    tool_dir.mkdir()
+    script = tool_dir / "maskgen"
+    script.write_text(FAKE_MASKGEN)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(generation, "MASKGEN_DIRECTORY", f"{tool_dir}/")
+    monkeypatch.setattr(generation, "PROJECT_DIRECTORY", f"{tmp_path}/")
+    settings.MASKGEN_CACHE_DIR = str(tmp_path / "maskgen_cache")
+    settings.MASKGEN_VERSION = "fake-1"
+    cache.clear()
+    yield tool_dir
+    for folder in ("obj_files", "obs_files"):
+        shutil.rmtree(os.path.join(API_DIR, folder, USER_ID), ignore_errors=True)
+
+
+@pytest.fixture
+def setup_payload():
+    Project.objects.create(name="test", user_id=USER_ID, center_ra=1.0, center_dec=1.0)
+    InstrumentConfig.objects.create(
+        instrument="IMACS_sc", version=1, filters={}, dispersers={}, aux={}
+    )
+    obj_list = ObjectList.objects.create(
+        name="DCM5V5E_obj_1", user_id=USER_ID, project_name="test"
+    )
+    obj_list.objects_list.set(
+        [
+            Object.objects.create(
+                name=f"o{i}",
+                user_id=USER_ID,
+                type="TARGET",
+                right_ascension=150.0,
+                declination=2.0,
+                priority=1,
+            )
+            for i in range(5)
+        ]
+    )
+    with open(SETUP_PATH) as f:
+        return json.load(f)
+
+
+def test_rotator_sweep_runs_in_parallel(fake_maskgen, setup_payload):
+    setup_payload["vary_rotator_range"] = {"start": 0, "end": 20, "step": 10}
+
+    response = client.post(
+        "/api/masks/generate/",
+        data=json.dumps(setup_payload),
+        content_type="application/json",
+        **{"HTTP_USER_ID": USER_ID},
+    )
+
+    assert response.status_code == 201, response.data
+    assert response.data["created"] == [
+        "mask001_rot0",
+        "mask001_rot10",
+        "mask001_rot20",
+    ]
+    assert [entry["angle"] for entry in response.data["summary"]] == [20, 10, 0]
+    assert [entry["included"] for entry in response.data["summary"]] == [3, 2, 1]
+    mask = Mask.objects.get(name="mask001_rot10")
+    assert mask.instrument_setup["position"] == 10
+    assert mask.objects_list.count() == 2
+    assert mask.excluded_obj_list.count() == 3
+    assert mask.features[0]["id"] == "o1"
+
+
+def test_rotator_sweep_reports_failed_runs(fake_maskgen, setup_payload, settings):
+    setup_payload["vary_rotator_range"] = {"start": 0, "end": 10, "step": 10}
+    # the pool processes can't create their scratch directories
+    settings.MASKGEN_SCRATCH_ROOT = str(fake_maskgen / "maskgen")
+
+    response = client.post(
+        "/api/masks/generate/",
+        data=json.dumps(setup_payload),
+        content_type="application/json",
+        **{"HTTP_USER_ID": USER_ID},
+    )
+
+    assert response.status_code == 400
+    assert response.data["created"] == []
+    assert set(response.data["error"]) == {"0", "10"}
+    assert "FileExistsError" in response.data["error"]["0"]
+
+
+def test_cancelled_rotator_sweep_stops_running_maskgens(
+    fake_maskgen, setup_payload, tmp_path, settings
+):
+    settings.TOOL_TIMEOUTS = settings.TOOL_TIMEOUTS | {
+        "maskgen": {"base": 60, "per_item": 0, "max": 60}
+    }
+    (fake_maskgen / "maskgen").write_text(
+        f"#!/bin/sh\necho $$ >> {tmp_path}/pids\nsleep 30\n"
+    )
+    setup_payload["vary_rotator_range"] = {"start": 0, "end": 10, "step": 10}
+    project = Project.objects.get(name="test")
+    pids = tmp_path / "pids"
+
+    def should_cancel():
+        return pids.exists()  # once a maskgen is running
+
+    start = time.monotonic()
+    with pytest.raises(generation.GenerationCancelled):
+        generation.generate_masks(
+            USER_ID, "test", setup_payload, project, should_cancel=should_cancel
+        )
+
+    # well before maskgen's own timeout
+    assert time.monotonic() - start < 10
+    for pid in pids.read_text().split():
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid), 0)
+    assert not Mask.objects.exists()
+
+
+def test_single_mask(fake_maskgen, setup_payload):
+    response = client.post(
+        "/api/masks/generate/",
+        data=json.dumps(setup_payload),
+        content_type="application/json",
+        **{"HTTP_USER_ID": USER_ID},
+    )
+
+    assert response.status_code == 201, response.data
+    assert response.data["created"].endswith(f"{USER_ID}/test/mask001.SMF")
+    assert Project.objects.get(name="test").masks.filter(name="mask001").exists()
+    feature = MaskFeature.objects.get(mask__name="mask001")
+    assert (feature.type, feature.object_name) == ("SLIT", "o1")
+    assert feature.ra == pytest.approx(150.0)
+    run = ToolRun.objects.get()
+    assert (run.tool, run.size, run.exit_status, run.timed_out) == (
+        "maskgen",
+        5,
+        0,
+        False,
+    )
+    assert run.timeout == pytest.approx(5 + 5 * 0.05)
+
+
+def test_unknown_object_list_is_a_bad_request(fake_maskgen, setup_payload):
+    setup_payload["objects"] = "no_such_list"
+
+    response = client.post(
+        "/api/masks/generate/",
+        data=json.dumps(setup_payload),
+        content_type="application/json",
+        **{"HTTP_USER_ID": USER_ID},
+    )
+
+    assert response.status_code == 400
+    assert "no_such_list" in response.data["error"]
+    assert not ToolRun.objects.exists()
+
+
+def test_objects_outside_the_field_are_pruned(fake_maskgen, setup_payload):
+    # the objects sit at (150, 2); three more are half a degree away
+    setup_payload |= {"center_ra": "10:00:00.0", "center_dec": "02:00:00.0"}
+    obj_list = ObjectList.objects.get(name="DCM5V5E_obj_1")
+    for i in range(3):
+        obj_list.objects_list.add(
+            Object.objects.create(
+                name=f"far{i}",
+                user_id=USER_ID,
+                type="TARGET",
+                right_ascension=150.5,
+                declination=2.0 + i * 0.1,
+                priority=1,
+            )
+        )
+
+    response = client.post(
+        "/api/masks/generate/",
+        data=json.dumps(setup_payload),
+        content_type="application/json",
+        **{"HTTP_USER_ID": USER_ID},
+    )
+
+    assert response.status_code == 201, response.data
+    assert response.data["pruned"] == 3
+    mask = Mask.objects.get(name="mask001")
+    assert sorted(mask.pruned_obj_list.values_list("name", flat=True)) == [
+        "far0",
+        "far1",
+        "far2",
+    ]
+    assert not mask.excluded_obj_list.filter(name__startswith="far").exists()
+    obj_file = os.path.join(API_DIR, "obj_files", USER_ID, "test", "mask001.obj")
+    with open(obj_file) as f:
+        assert "far" not in f.read()
+    assert ToolRun.objects.get().size == 5
+
+
+def test_repeat_generation_is_served_from_cache(fake_maskgen, setup_payload):
+    def generate():
+        return client.post(
+            "/api/masks/generate/",
+            data=json.dumps(setup_payload),
+            content_type="application/json",
+            **{"HTTP_USER_ID": USER_ID},
+        )
+
+    assert generate().status_code == 201
+    features = Mask.objects.get(name="mask001").features
+    Mask.objects.filter(name="mask001").delete()
+    # a second maskgen run would fail, so this can only succeed from the cache
+    (fake_maskgen / "maskgen").write_text("#!/bin/sh\nexit 1\n")
+
+    response = generate()
+
+    assert response.status_code == 201, response.data
+    assert Mask.objects.get(name="mask001").features == features
+    assert os.path.exists(response.data["created"])
+    stats = client.get("/api/masks/cache_stats/").data
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert ToolRun.objects.count() == 1
+
+
+def test_renamed_generation_is_served_from_cache(fake_maskgen, setup_payload):
+    def generate(**changes):
+        return client.post(
+            "/api/masks/generate/",
+            data=json.dumps(setup_payload | changes),
+            content_type="application/json",
+            **{"HTTP_USER_ID": USER_ID},
+        )
+
+    assert generate().status_code == 201
+    (fake_maskgen / "maskgen").write_text("#!/bin/sh\nexit 1\n")
+
+    response = generate(filename="mask002", title="Second try", edit_date="2025-07-01")
+
+    assert response.status_code == 201, response.data
+    with open(response.data["created"]) as f:
+        smf = f.read().splitlines()
+    assert smf[:3] == [
+        "NAME mask002",
+        "MADE 2018-08-17  MaskGen  2.27.93",
+        "!.OC mask002 10:00:18.500 +02:22:04.00 2000.0",
+    ]
+    assert Mask.objects.get(name="mask002").features[0]["id"] == "o1"
+    # the observing date still matters
+    assert generate(filename="mask003", date="2025-08-01").status_code == 400
+
+
+def test_cache_evicts_least_recently_used(tmp_path, settings):
+    settings.MASKGEN_CACHE_DIR = str(tmp_path / "maskgen_cache")
+    smf = tmp_path / "mask.SMF"
+    smf.write_text("x" * 100)
+    run = {"ok": True, "smf_path": str(smf), "obw": "", "features": []}
+    settings.MASKGEN_CACHE_MAX_BYTES = 250
+
+    artifact_cache.store("aa01", run)
+    artifact_cache.store("bb02", run)
+    os.utime(os.path.join(settings.MASKGEN_CACHE_DIR, "aa", "aa01"), (0, 0))
+    assert artifact_cache.fetch("aa01", str(tmp_path / "out.SMF")) is not None
+    artifact_cache.store("cc03", run)
+
+    assert artifact_cache.fetch("bb02", str(tmp_path / "out.SMF")) is None
+    assert artifact_cache.fetch("aa01", str(tmp_path / "out.SMF")) is not None
+    assert artifact_cache.stats()["entries"] == 2
@@ -0,0 +1,144 @@
+import importlib
+import json
+import pytest
+from django.apps import apps
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from maskgen_api.instruments import InstrumentSpec, get_config, latest_version
+from maskgen_api.models import InstrumentConfig
+from maskgen_api.validator import validate
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def _create(version, **filters):
+    return InstrumentConfig.objects.create(
+        instrument="IMACS_sc", version=version, filters=filters, dispersers={}, aux={}
+    )
+
+
+def test_configs_are_served_from_cache(django_assert_num_queries):
+    _create(1, R="info")
+
+    # latest version, then the config
+    with django_assert_num_queries(2):
+        assert get_config("IMACS_sc").filters == {"R": "info"}
+    with django_assert_num_queries(0):
+        assert get_config("IMACS_sc").version == 1
+        assert get_config("IMACS_sc", 1).filters == {"R": "info"}
+        assert client.get("/api/instruments/IMACS_sc/").status_code == 200
+
+
+def test_missing_configs_are_not_cached():
+    assert get_config("IMACS_sc") is None
+    assert latest_version("IMACS_sc") is None
+
+    _create(1)
+    assert latest_version("IMACS_sc") == 1
+
+
+def test_upload_invalidates_latest():
+    _create(1, R="info")
+    assert latest_version("IMACS_sc") == 1
+
+    response = client.post(
+        "/api/instruments/uploadconfig/",
+        {"instrument": "IMACS_sc", "filters": {"B": "H"}, "dispersers": {}},
+        format="json",
+    )
+
+    assert response.status_code == 201
+    assert latest_version("IMACS_sc") == 2
+    response = client.get("/api/instruments/IMACS_sc/")
+    assert response.data["filters"] == {"B": "H"}
+    response = client.get("/api/instruments/IMACS_sc/", {"version": 1})
+    assert response.data["filters"] == {"R": "info"}
+
+
+def test_edit_and_delete_invalidate():
+    config = _create(1, R="info")
+    get_config("IMACS_sc", 1)
+
+    config.filters = {"R": "fixed"}
+    config.save()
+    assert get_config("IMACS_sc", 1).filters == {"R": "fixed"}
+
+    config.delete()
+    assert get_config("IMACS_sc", 1) is None
+    assert latest_version("IMACS_sc") is None
+
+
+def test_upload_stores_aux_as_json_object():
+    client.post(
+        "/api/instruments/uploadconfig/",
+        {
+            "instrument": "IMACS_sc",
+            "filters": {},
+            "dispersers": {},
+            "slit_width": 1.0,
+            "wlimit_low": 3500,
+            "wlimit_high": 9000,
+        },
+        format="json",
+    )
+
+    config = InstrumentConfig.objects.get(instrument="IMACS_sc")
+    assert config.aux == {"slit_width": 1.0, "wlimit_low": 3500, "wlimit_high": 9000}
+    assert InstrumentConfig.objects.filter(aux__slit_width=1.0).exists()
+
+    spec = get_config("IMACS_sc")
+    assert spec.slit_defaults == {"slit_width": 1.0}
+    assert spec.wlimit == (3500.0, 9000.0)
+    assert spec.setup_defaults() == {
+        "slit_width": 1.0,
+        "wlimit_low": 3500.0,
+        "wlimit_high": 9000.0,
+    }
+
+
+def test_migration_decodes_string_aux():
+    decode_aux = importlib.import_module(
+        "maskgen_api.migrations.0007_decode_instrument_aux"
+    ).decode_aux
+    encoded = InstrumentConfig.objects.create(
+        instrument="IMACS_sc",
+        version=1,
+        filters={},
+        dispersers={},
+        aux=json.dumps({"aux1": "val"}),
+    )
+    plain = _create(2)
+
+    decode_aux(apps, None)
+
+    encoded.refresh_from_db()
+    plain.refresh_from_db()
+    assert encoded.aux == {"aux1": "val"}
+    assert plain.aux == {}
+
+
+def test_validate_checks_instrument_wavelength_range():
+    spec = InstrumentSpec.from_config(
+        InstrumentConfig(
+            instrument="IMACS_sc",
+            version=1,
+            filters={},
+            dispersers={},
+            aux={"wlimit_low": 3500, "wlimit_high": 9000},
+        )
+    )
+
+    assert validate({"wavelength": 5000.0}, spec) == (True, "OK")
+    valid, feedback = validate({"wavelength": 9500.0}, spec)
+    assert not valid
+    assert "outside the IMACS_sc range" in feedback
+    for wavelength in (None, "", "blue"):
+        valid, feedback = validate({"wavelength": wavelength}, spec)
+        assert not valid
+        assert "invalid wavelength" in feedback
@@ -0,0 +1,197 @@
+import json
+import os
+import socket
+import subprocess
+from datetime import timedelta
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+from maskgen_api import jobs
+from maskgen_api.generation import GenerationCancelled
+from maskgen_api.models import Job, JobEvent, JobStatus, ObjectList, Project
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+
+
+@pytest.fixture
+def project():
+    ObjectList.objects.create(name="list", user_id="test", project_name="test")
+    return Project.objects.create(
+        name="test", user_id="test", center_ra=1.00, center_dec=1.00
+    )
+
+
+def _submit(filename="mask001"):
+    return client.post(
+        "/api/masks/submit/",
+        {"project_name": "test", "filename": filename, "objects": "list"},
+        format="json",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+
+def test_submit_returns_immediately(project):
+    response = _submit()
+
+    assert response.status_code == 202
+    assert response.data["status"] == JobStatus.QUEUED
+    job = Job.objects.get(id=response.data["id"])
+    assert job.payload["filename"] == "mask001"
+
+    response = client.get(f"/api/jobs/{job.id}/", **{"HTTP_USER_ID": "test"})
+    assert response.status_code == 200
+    assert response.data["status"] == JobStatus.QUEUED
+
+    response = client.get(f"/api/jobs/{job.id}/", **{"HTTP_USER_ID": "other"})
+    assert response.status_code == 404
+
+    response = client.get(f"/api/jobs/{job.id}/result/", **{"HTTP_USER_ID": "test"})
+    assert response.status_code == 409
+
+
+def test_worker_runs_jobs_in_order(project, monkeypatch):
+    ran = []
+
+    def fake_generate(user_id, proj_name, data, project, should_cancel=None, **kwargs):
+        ran.append(data["filename"])
+        if data["filename"] == "bad":
+            return False, {"error": "maskgen failed"}
+        return True, {"created": data["filename"]}
+
+    monkeypatch.setattr(jobs, "generate_masks", fake_generate)
+    good = _submit("good").data["id"]
+    bad = _submit("bad").data["id"]
+
+    assert jobs.work(burst=True) == 2
+
+    assert ran == ["good", "bad"]
+    response = client.get(f"/api/jobs/{good}/result/", **{"HTTP_USER_ID": "test"})
+    assert response.status_code == 200
+    assert response.data["status"] == JobStatus.SUCCEEDED
+    assert response.data["result"] == {"created": "good"}
+    failed = Job.objects.get(id=bad)
+    assert failed.status == JobStatus.FAILED
+    assert failed.error == "maskgen failed"
+    assert failed.finished_at is not None
+
+
+def test_cancel_queued_job(project):
+    job_id = _submit().data["id"]
+
+    response = client.post(f"/api/jobs/{job_id}/cancel/", **{"HTTP_USER_ID": "test"})
+
+    assert response.status_code == 200
+    assert response.data["status"] == JobStatus.CANCELLED
+    assert jobs.work(burst=True) == 0
+
+    response = client.post(f"/api/jobs/{job_id}/cancel/", **{"HTTP_USER_ID": "test"})
+    assert response.status_code == 400
+
+
+def test_cancel_running_job(project, monkeypatch):
+    job_id = _submit().data["id"]
+
+    def fake_generate(user_id, proj_name, data, project, should_cancel=None, **kwargs):
+        # the user cancels while the first mask of a sweep is running
+        client.post(f"/api/jobs/{job_id}/cancel/", **{"HTTP_USER_ID": "test"})
+        if should_cancel():
+            raise GenerationCancelled(data["filename"])
+        return True, {"created": []}
+
+    monkeypatch.setattr(jobs, "generate_masks", fake_generate)
+    jobs.work(burst=True)
+
+    assert Job.objects.get(id=job_id).status == JobStatus.CANCELLED
+
+
+def test_jobs_of_dead_workers_are_failed(project):
+    host = socket.gethostname()
+    child = subprocess.Popen(["true"])
+    child.wait()  # a pid that is gone
+    ids = [_submit(f"mask00{i}").data["id"] for i in range(4)]
+    now = timezone.now()
+    for job_id, worker, started_at in zip(
+        ids,
+        [
+            f"{host}:{child.pid}",
+            f"{host}:{os.getpid()}",
+            "elsewhere:1",
+            "elsewhere:2",
+        ],
+        [now, now, now - timedelta(hours=2), now],
+    ):
+        Job.objects.filter(id=job_id).update(
+            status=JobStatus.RUNNING, worker=worker, started_at=started_at
+        )
+
+    assert jobs.work(burst=True) == 0
+    assert jobs.fail_stale_jobs(stale_after=3600) == 1
+
+    statuses = [Job.objects.get(id=job_id).status for job_id in ids]
+    assert statuses == [
+        JobStatus.FAILED,
+        JobStatus.RUNNING,
+        JobStatus.FAILED,
+        JobStatus.RUNNING,
+    ]
+    assert "worker stopped" in Job.objects.get(id=ids[0]).error
+
+
+def _events(response):
+    events = []
+    for block in b"".join(response.streaming_content).decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_job_output_and_progress(project, monkeypatch):
+    def fake_generate(
+        user_id, proj_name, data, project, on_output, on_progress, **kwargs
+    ):
+        on_progress({"stage": "running", "mask": data["filename"]})
+        on_output("Reading mask001.obs\nPlacing sl")
+        on_output("its\nWriting object file\n")
+        on_progress({"stage": "finished", "mask": data["filename"], "ok": True})
+        return True, {"created": data["filename"]}
+
+    monkeypatch.setattr(jobs, "generate_masks", fake_generate)
+    job_id = _submit().data["id"]
+    jobs.work(burst=True)
+
+    response = client.get(
+        f"/api/jobs/{job_id}/stream/?user_id=test", HTTP_ACCEPT="text/event-stream"
+    )
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/event-stream"
+    events = _events(response)
+    assert events[0] == ("progress", {"stage": "running", "mask": "mask001"})
+    lines = [
+        line for kind, data in events if kind == "output" for line in data["lines"]
+    ]
+    assert lines == ["Reading mask001.obs", "Placing slits", "Writing object file"]
+    assert events[-2][0] == "progress"
+    assert events[-1] == ("end", {"status": JobStatus.SUCCEEDED})
+
+    # a reconnecting EventSource only gets what it missed
+    last_id = JobEvent.objects.filter(job_id=job_id).order_by("id")[1].id
+    response = client.get(
+        f"/api/jobs/{job_id}/stream/",
+        HTTP_LAST_EVENT_ID=str(last_id),
+        **{"HTTP_USER_ID": "test"},
+    )
+    assert len(_events(response)) == len(events) - 2
+
+
+def test_stream_requires_owner(project):
+    job_id = _submit().data["id"]
+
+    response = client.get(
+        f"/api/jobs/{job_id}/stream/?user_id=other", HTTP_ACCEPT="text/event-stream"
+    )
+
+    assert response.status_code == 404
+    assert response.content.startswith(b"event: error")
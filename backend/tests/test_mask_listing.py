@@ -0,0 +1,103 @@
+import datetime
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+from maskgen_api.models import Mask, Project
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+
+
+@pytest.fixture
+def masks():
+    masks = []
+    for user_id in ("alice", "bob"):
+        project = Project.objects.create(
+            name=f"{user_id}_proj", user_id=user_id, center_ra="0", center_dec="0"
+        )
+        for i in range(5):
+            mask = Mask.objects.create(
+                name=f"{user_id}{i}",
+                user_id=user_id,
+                center_ra="0",
+                center_dec="0",
+                status="finalized" if i < 4 else "completed",
+                features=[],
+                instrument_version=1,
+                instrument_setup={"instrument": "IMACS_sc" if i % 2 else "IMACS_f2"},
+            )
+            project.masks.add(mask)
+            masks.append(mask)
+    return masks
+
+
+def test_listing_is_one_query(masks, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        response = client.get("/api/masks/finalized_masks/")
+
+    assert response.status_code == 200
+    assert [mask["name"] for mask in response.data["results"]] == [
+        "alice0",
+        "alice1",
+        "alice2",
+        "alice3",
+        "bob0",
+        "bob1",
+        "bob2",
+        "bob3",
+    ]
+    assert response.data["results"][0]["project_name"] == "alice_proj"
+    assert set(response.data["results"][0]) == {
+        "id",
+        "name",
+        "status",
+        "project_name",
+        "user_id",
+        "created_at",
+    }
+    assert response.data["next"] is None
+
+
+def test_listing_pages(masks):
+    response = client.get("/api/masks/finalized_masks/", {"page_size": 3})
+    names = [mask["name"] for mask in response.data["results"]]
+    while response.data["next"]:
+        response = client.get(
+            "/api/masks/finalized_masks/",
+            {"page_size": 3, "cursor": response.data["next"]},
+        )
+        names += [mask["name"] for mask in response.data["results"]]
+
+    assert len(names) == 8
+    assert len(set(names)) == 8
+
+
+def test_listing_filters(masks):
+    response = client.get(
+        "/api/masks/finalized_masks/", {"user_id": "bob", "instrument": "IMACS_sc"}
+    )
+    assert [mask["name"] for mask in response.data["results"]] == ["bob1", "bob3"]
+
+    response = client.get("/api/masks/completed_masks/", {"user_id": "alice"})
+    assert [mask["name"] for mask in response.data["results"]] == ["alice4"]
+
+    Mask.objects.filter(name="alice0").update(
+        created_at=timezone.now() - datetime.timedelta(days=30)
+    )
+    last_week = (timezone.now() - datetime.timedelta(days=7)).date().isoformat()
+    response = client.get(
+        "/api/masks/finalized_masks/",
+        {"user_id": "alice", "created_before": last_week},
+    )
+    assert [mask["name"] for mask in response.data["results"]] == ["alice0"]
+    response = client.get(
+        "/api/masks/finalized_masks/",
+        {"user_id": "alice", "created_after": last_week},
+    )
+    assert len(response.data["results"]) == 3
+
+
+def test_listing_rejects_bad_params(masks):
+    for params in ({"created_after": "last week"}, {"page_size": 0}, {"cursor": "?"}):
+        response = client.get("/api/masks/finalized_masks/", params)
+        assert response.status_code == 400
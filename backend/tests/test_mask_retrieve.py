@@ -0,0 +1,117 @@
+import os
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api.features import store_features
+from maskgen_api.models import Mask, Object, Project
+from maskgen_api.smf import read_smf
+
+pytestmark = pytest.mark.django_db
+script_dir = os.path.dirname(__file__)
+SMF_PATH = os.path.join(script_dir, "data", "DCM5V5E.SMF")
+client = APIClient()
+
+
+@pytest.fixture
+def mask():
+    project = Project.objects.create(
+        name="test", user_id="test", center_ra="10:00:18.5", center_dec="02:22:04"
+    )
+    features = read_smf(SMF_PATH).features()
+    mask = Mask.objects.create(
+        name="DCM5V5E",
+        user_id="test",
+        center_ra="10:00:18.5",
+        center_dec="02:22:04",
+        features=features,
+        instrument_version=1,
+        instrument_setup={"instrument": "IMACS_sc"},
+    )
+    store_features(mask, features)
+    objs = [
+        Object.objects.create(
+            name=f"o{i}",
+            user_id="test",
+            type="TARGET",
+            right_ascension=150.0,
+            declination=2.0,
+            priority=i,
+            aux={"a_len": 3.0},
+        )
+        for i in range(5)
+    ]
+    mask.objects_list.set(objs[:3])
+    mask.excluded_obj_list.set(objs[3:])
+    project.masks.add(mask)
+    return mask
+
+
+def _get(**params):
+    return client.get(
+        "/api/masks/DCM5V5E/",
+        {"project_name": "test", **params},
+        **{"HTTP_USER_ID": "test"},
+    )
+
+
+def test_retrieve_everything_by_default(mask):
+    response = _get()
+
+    assert response.status_code == 200
+    assert response.data["name"] == "DCM5V5E"
+    assert response.data["instrument_setup"] == {"instrument": "IMACS_sc"}
+    assert response.data["objects_list"][0] == {
+        "name": "o0",
+        "type": "TARGET",
+        "right_ascension": 150.0,
+        "declination": 2.0,
+        "priority": 0,
+        "a_len": 3.0,
+    }
+    assert [obj["name"] for obj in response.data["excluded_objects"]] == ["o3", "o4"]
+    assert len(response.data["features"]) == 1834
+    assert "next" not in response.data
+
+
+def test_slit_overlay_fetch(mask, django_assert_num_queries):
+    # mask (joined with its project), features
+    with django_assert_num_queries(2):
+        response = _get(fields="center_ra,center_dec", include="features")
+
+    assert response.status_code == 200
+    assert set(response.data) == {"center_ra", "center_dec", "features"}
+    assert response.data["features"][0]["object_name"] == "DC-1006811"
+
+
+def test_fields_without_include_skip_arrays(mask):
+    response = _get(fields="status")
+
+    assert response.data == {"status": "draft"}
+
+
+def test_cursor_pagination(mask):
+    names, cursor, pages = [], None, 0
+    while True:
+        params = {"include": "features", "fields": "name", "page_size": 500}
+        if cursor:
+            params["features_cursor"] = cursor
+        response = _get(**params)
+        assert response.status_code == 200
+        names += [f["object_name"] for f in response.data["features"]]
+        cursor = response.data["next"]["features"]
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert names == [f["id"] for f in mask.features]
+
+
+def test_bad_parameters(mask):
+    assert _get(fields="secret").status_code == 400
+    assert _get(include="everything").status_code == 400
+    assert _get(page_size=0).status_code == 400
+    assert _get(page_size=10, features_cursor="not-a-cursor").status_code == 400
+    response = client.get(
+        "/api/masks/missing/", {"project_name": "test"}, **{"HTTP_USER_ID": "test"}
+    )
+    assert response.status_code == 404
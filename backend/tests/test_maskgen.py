@@ -16,7 +16,7 @@ class MaskViewSetTests(APITestCase):
             version=1,
             filters={"filter1": "val"},
             dispersers={"disp1": "val"},
-            aux=json.dumps({"aux1": "val"}),
+            aux={"aux1": "val"},
         )
         self.test_file_path = os.path.join(
             BASE_DIR, "tests", "test_files", "instrum_setup_works_ex.json"
@@ -102,3 +102,107 @@ def test_view_object_list():
     names = [obj["name"] for obj in group["objects"]]
     assert "obj1" in names
     assert "obj2" in names
+
+
+def test_upload_objects_reports_throughput(sample_object_data):
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    file = BytesIO(json.dumps(sample_object_data).encode("utf-8"))
+    file.name = "upload.json"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "RateList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 201
+    assert response.data["created"] == 2
+    assert response.data["rows_per_second"] > 0
+    obj = Object.objects.get(name="a")
+    assert obj.aux == {"extra": "x1"}
+
+
+def test_upload_objects_is_atomic(sample_object_data):
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    del sample_object_data[1]["priority"]
+    file = BytesIO(json.dumps(sample_object_data).encode("utf-8"))
+    file.name = "upload.json"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "BrokenList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 400
+    assert "row 2" in response.data["error"]
+    assert "priority" in response.data["error"]
+    assert Object.objects.count() == 0
+    assert not ObjectList.objects.filter(name="BrokenList").exists()
+
+
+def test_upload_objects_from_csv():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    csv_data = (
+        b"name,type,ra,dec,priority,a_len,note\n"
+        b"c1,TARGET,10:00:18.500,-00:30:00,3,3.4,bright\n"
+        b"c2,ALIGN,150.1,2.2,-2,,\n"
+    )
+    file = BytesIO(csv_data)
+    file.name = "upload.csv"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "CsvList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 201
+    assert response.data["created"] == 2
+    c1 = Object.objects.get(name="c1")
+    assert c1.right_ascension == pytest.approx(150.0770833)
+    assert c1.declination == pytest.approx(-0.5)
+    assert c1.priority == 3
+    assert c1.aux == {"a_len": 3.4, "note": "bright"}
+    c2 = Object.objects.get(name="c2")
+    assert c2.type == "ALIGN"
+    assert c2.aux == {}
+
+
+def test_upload_objects_from_csv_without_extra_columns():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    file = BytesIO(
+        b"name,type,ra,dec,priority\nc1,TARGET,150.0,2.0,3\nc2,ALIGN,150.1,2.2,-2\n"
+    )
+    file.name = "upload.csv"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "CsvList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 201
+    assert response.data["created"] == 2
+    assert ObjectList.objects.get(name="CsvList").objects_list.count() == 2
+    assert Object.objects.get(name="c2").aux == {}
+
+
+def test_upload_csv_missing_columns():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    file = BytesIO(b"name,ra,dec\nc1,1.0,2.0\n")
+    file.name = "upload.csv"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "CsvList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 400
+    assert not ObjectList.objects.filter(name="CsvList").exists()
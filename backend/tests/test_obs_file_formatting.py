@@ -0,0 +1,184 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from maskgen_api.models import Mask, Object, ObjectList
+from maskgen_api.obs_file_formatting import (
+    categorize_objs,
+    coords_to_deg,
+    generate_obj_file,
+    get_objects,
+    iter_obj_records,
+    obj_to_json,
+    to_deg,
+)
+
+script_dir = os.path.dirname(__file__)
+TEST_OBJ_FILE_PATH = os.path.join(script_dir, "data", "DCM5V5E.obj")
+API_DIR = os.path.join(script_dir, "..", "maskgen_api")
+
+
+def test_coords_to_deg_matches_to_deg():
+    ras = ["10:00:18.500", "150.1294600", 149.93254, "00:00:01", "23:59:59.99"]
+    decs = ["02:22:04.00", "-00:30:00", "+2:0:0", -12.5, "-89:59:59.9"]
+
+    ra_deg, dec_deg = coords_to_deg(ras, decs)
+
+    expected = np.array([to_deg(ra, dec) for ra, dec in zip(ras, decs)])
+    np.testing.assert_allclose(ra_deg, expected[:, 0])
+    np.testing.assert_allclose(dec_deg, expected[:, 1])
+
+
+def test_coords_to_deg_numeric_and_empty_columns():
+    ra_deg, dec_deg = coords_to_deg([10.5, 30.1], [20.2, -15.3])
+    np.testing.assert_allclose(ra_deg, [10.5, 30.1])
+    np.testing.assert_allclose(dec_deg, [20.2, -15.3])
+
+    ra_deg, dec_deg = coords_to_deg([], [])
+    assert ra_deg.shape == dec_deg.shape == (0,)
+
+
+def test_iter_obj_records_across_chunk_boundaries():
+    with open(TEST_OBJ_FILE_PATH, "rb") as fh:
+        file_bytes = fh.read()
+    # odd chunk size so lines (and \r\n pairs) get split between chunks
+    crlf_bytes = file_bytes.replace(b"\n", b"\r\n")
+    chunks = [crlf_bytes[i : i + 97] for i in range(0, len(crlf_bytes), 97)]
+
+    records = list(iter_obj_records(chunks))
+
+    assert records == obj_to_json(file_bytes)
+    assert len(records) == 1936
+    assert records[0] == {
+        "name": "DC-1006811",
+        "type": "TARGET",
+        "ra": 150.12946,
+        "dec": 2.207195,
+        "priority": -2.0,
+        "a_len": 3.4,
+        "b_len": 2.1,
+    }
+    assert {r["type"] for r in records} == {"TARGET", "ALIGN"}
+
+
+def test_iter_obj_records_last_line_without_newline():
+    records = list(iter_obj_records([b"&RADEGREE\n*star1 1.0 -2.0 Pri=", b"-2.0"]))
+    assert records == [
+        {"name": "star1", "type": "ALIGN", "ra": 1.0, "dec": -2.0, "priority": -2.0}
+    ]
+
+
+def _make_list(user_id, proj_name, list_name, names):
+    obj_list = ObjectList.objects.create(
+        name=list_name, user_id=user_id, project_name=proj_name
+    )
+    objs = [
+        Object.objects.create(
+            name=name,
+            user_id=user_id,
+            type="TARGET",
+            right_ascension=150.0,
+            declination=2.0,
+            priority=1,
+        )
+        for name in names
+    ]
+    obj_list.objects_list.set(objs)
+    return objs
+
+
+def _make_mask(name="m1"):
+    return Mask.objects.create(
+        name=name,
+        user_id="test",
+        center_ra="10:00:18.500",
+        center_dec="02:22:04.00",
+        features=[],
+        instrument_version=1,
+        instrument_setup={},
+    )
+
+
+@pytest.mark.django_db
+def test_categorize_objs(django_assert_num_queries):
+    used, excluded, _ = _make_list("test", "proj", "list", ["o1", "o2", "o3"])
+    # same names owned by someone else must not be picked up
+    _make_list("other", "other_proj", "list", ["o1", "o2"])
+    mask = _make_mask()
+    obw = (
+        "&RADEGREE\n"
+        "@o1 150.0 2.0 Pri=1.0 Use=1\n"
+        "@o2 150.0 2.0 Pri=1.0\n"
+        "@o1 150.0 2.0 Pri=1.0 Use=1\n"
+    )
+
+    objects = get_objects("test", "proj", "list")
+
+    with django_assert_num_queries(3):
+        ok, _ = categorize_objs(mask, obw, objects)
+
+    assert ok
+    assert list(mask.objects_list.all()) == [used]
+    assert list(mask.excluded_obj_list.all()) == [excluded]
+
+
+@pytest.mark.django_db
+def test_get_objects_by_id_is_scoped_to_the_user():
+    own = _make_list("test", "proj", "list", ["o1"])
+    other = _make_list("other", "other_proj", "list", ["o2"])
+
+    ids = [obj.id for obj in own + other]
+
+    assert list(get_objects("test", "proj", ids)) == own
+    assert not get_objects("test", "proj", [obj.id for obj in other]).exists()
+
+
+@pytest.mark.django_db
+def test_categorize_objs_unknown_object():
+    _make_list("test", "proj", "list", ["o1"])
+    mask = _make_mask()
+    obw = "@o1 150.0 2.0 Pri=1.0 Use=1\n@missing 1.0 2.0 Pri=1.0\n"
+
+    ok, feedback = categorize_objs(mask, obw, get_objects("test", "proj", "list"))
+
+    assert not ok
+    assert "missing" in feedback
+    assert not Mask.objects.filter(name="m1").exists()
+
+
+@pytest.mark.django_db
+def test_generate_obj_file_in_two_queries(django_assert_num_queries):
+    user_id = "obj_file_test_user"
+    objs = _make_list(user_id, "proj", "list", [f"o{i}" for i in range(50)])
+    objs[0].type = "ALIGN"
+    objs[0].save()
+    objs[1].type = "GUIDE"
+    objs[1].save()
+
+    try:
+        # the list's existence, then the objects
+        with django_assert_num_queries(2):
+            path, written, pruned = generate_obj_file(user_id, "proj", "m1", "list")
+        with open(os.path.join(API_DIR, path)) as fh:
+            lines = fh.read().splitlines()
+    finally:
+        shutil.rmtree(os.path.join(API_DIR, "obj_files", user_id), ignore_errors=True)
+
+    assert lines[0] == "&RADEGREE"
+    assert lines[1] == "*o0 150.0 2.0 Pri=1.0"
+    assert lines[2] == "@o2 150.0 2.0 Pri=1.0"
+    assert len(lines) == 50  # header + 49 non-guide objects
+    assert (written, pruned) == (49, [])
+
+
+@pytest.mark.django_db
+def test_generate_obj_file_needs_an_existing_list():
+    _make_list("list_owner", "proj", "list", ["o1"])
+
+    with pytest.raises(ValueError, match="missing"):
+        generate_obj_file("list_owner", "proj", "m1", "missing")
+    # nor someone else's list of that name
+    with pytest.raises(ValueError):
+        generate_obj_file("other", "proj", "m1", "list")
+    for user_id in ("list_owner", "other"):
+        assert not os.path.exists(os.path.join(API_DIR, "obj_files", user_id))
@@ -0,0 +1,217 @@
+import time
+import numpy as np
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from maskgen_api.models import InstrumentConfig, Object, ObjectList, Project
+from maskgen_api.preview import allocate, conflict_pairs, preview_layout
+
+client = APIClient()
+SETUP = {
+    "center_ra": "10:00:00.0",
+    "center_dec": "02:00:00.0",
+    "position": 0,
+    "instrument": "IMACS_sc",
+    "disperser": "IMACS_grism_300",
+    "wlimit_low": 4000.0,
+    "wlimit_high": 6000.0,
+    "wavelength": 5000.0,
+    "a_len": 3.0,
+    "b_len": 3.0,
+    "refhole_width": 5.0,
+    "overlap": -2,
+    "dispersion": 20.0,  # 100 mm spectra
+}
+MM = 71139.8 / 206265  # per arcsec
+
+
+def _brute_force_pairs(x, y_low, y_high, trace_length):
+    pairs = set()
+    for i in range(len(x)):
+        for j in range(len(x)):
+            if (
+                i != j
+                and y_low[i] < y_high[j]
+                and y_low[j] < y_high[i]
+                and abs(x[i] - x[j]) < trace_length
+            ):
+                pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def test_conflict_pairs():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-250, 250, 300)
+    y_low = rng.uniform(-200, 200, 300)
+    y_high = y_low + rng.uniform(1, 5, 300)
+
+    i, j = conflict_pairs(x, y_low, y_high, 100.0)
+
+    found = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert len(found) == len(i)
+    assert found == _brute_force_pairs(x, y_low, y_high, 100.0)
+
+
+def test_allocate_is_greedy():
+    # a chain 0 - 1 - 2 - 3
+    i, j = np.array([0, 1, 2]), np.array([1, 2, 3])
+
+    assert allocate(np.array([0, 1, 2, 3]), i, j).tolist() == [1, 0, 1, 0]
+    assert allocate(np.array([1, 3, 0, 2]), i, j).tolist() == [0, 1, 0, 1]
+    assert allocate(np.array([0]), np.array([], int), np.array([], int)).tolist() == [
+        True
+    ]
+
+
+@pytest.mark.django_db
+def test_preview_layout():
+    arcsec = 1 / 3600
+    result = preview_layout(
+        SETUP,
+        ["low", "high", "beside", "star", "guide", "far"],
+        ["TARGET", "TARGET", "TARGET", "ALIGN", "GUIDE", "TARGET"],
+        # high sits 4" above low, beside 200 mm (~10') to the east of both
+        [150.0, 150.0, 150.0 + 200 / MM * arcsec, 150.0, 150.0, 151.0],
+        [2.0, 2.0 + 4 * arcsec, 2.0, 2.0 + 12 * arcsec, 2.0 + 60 * arcsec, 2.0],
+        [1, 5, 1, 0, 9, 9],
+    )
+
+    included = [obj["name"] for obj in result["included"]]
+    # the star goes first, high takes the place of low, beside has its own
+    assert included == ["star", "high", "beside"]
+    assert result["excluded"] == ["low"]
+    assert result["pruned"] == 1
+    assert result["included"][1]["y"] == pytest.approx(4 * MM, abs=0.01)
+
+
+@pytest.mark.django_db
+def test_preview_layout_is_fast():
+    rng = np.random.default_rng(1)
+    count = 5000
+    radius = np.radians(14 / 60) * np.sqrt(rng.random(count))
+    angle = 2 * np.pi * rng.random(count)
+    ra = 150 + np.degrees(radius * np.cos(angle))
+    dec = 2 + np.degrees(radius * np.sin(angle))
+
+    start = time.perf_counter()
+    result = preview_layout(
+        SETUP,
+        [f"o{k}" for k in range(count)],
+        ["TARGET"] * count,
+        ra,
+        dec,
+        rng.integers(1, 10, count),
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1
+    placed = len(result["included"])
+    assert 0 < placed < count
+    assert placed + len(result["excluded"]) + result["pruned"] == count
+
+
+@pytest.fixture
+def preview_request(db):
+    cache.clear()  # instrument configs
+    Project.objects.create(
+        name="test", user_id="test", center_ra="10:00:00.0", center_dec="02:00:00.0"
+    )
+    obj_list = ObjectList.objects.create(
+        name="targets", user_id="test", project_name="test"
+    )
+    obj_list.objects_list.set(
+        [
+            Object.objects.create(
+                name=f"o{k}",
+                user_id="test",
+                type="TARGET",
+                right_ascension=150.0,
+                declination=2.0 + 1.5 * k / 3600,
+                priority=k,
+            )
+            for k in range(10)
+        ]
+    )
+    return SETUP | {"project_name": "test", "objects": "targets"}
+
+
+def test_preview_endpoint(preview_request):
+    response = client.post(
+        "/api/masks/preview/", preview_request, format="json", HTTP_USER_ID="test"
+    )
+
+    assert response.status_code == 200, response.data
+    # objects 1.5" apart, slits 8" apart (3" + 3" + the 2" gap): o9 and o3
+    assert [obj["name"] for obj in response.data["included"]] == ["o9", "o3"]
+    assert len(response.data["excluded"]) == 8
+    assert response.data["seconds"] < 1
+
+
+def test_preview_needs_a_dispersion(preview_request):
+    del preview_request["dispersion"]
+    InstrumentConfig.objects.create(
+        instrument="IMACS_sc",
+        version=1,
+        filters={},
+        dispersers={"IMACS_grism_300": {"dispersion": 20.0}},
+        aux={},
+    )
+
+    ok = client.post(
+        "/api/masks/preview/", preview_request, format="json", HTTP_USER_ID="test"
+    )
+    preview_request["disperser"] = "unknown"
+    missing = client.post(
+        "/api/masks/preview/", preview_request, format="json", HTTP_USER_ID="test"
+    )
+
+    assert ok.status_code == 200
+    assert missing.status_code == 400
+    assert "dispersion" in missing.data["error"]
+
+
+def test_preview_takes_setup_defaults_from_the_config(preview_request):
+    for key in ("wlimit_low", "wlimit_high", "a_len", "b_len", "refhole_width"):
+        del preview_request[key]
+    InstrumentConfig.objects.create(
+        instrument="IMACS_sc",
+        version=1,
+        filters={},
+        dispersers={},
+        aux={
+            "wlimit_low": 4000.0,
+            "wlimit_high": 6000.0,
+            "a_len": 3.0,
+            "b_len": 3.0,
+            "refhole_width": 5.0,
+        },
+    )
+
+    response = client.post(
+        "/api/masks/preview/", preview_request, format="json", HTTP_USER_ID="test"
+    )
+
+    assert response.status_code == 200, response.data
+    assert [obj["name"] for obj in response.data["included"]] == ["o9", "o3"]
+
+
+def test_preview_without_slit_lengths_is_a_bad_request(preview_request):
+    del preview_request["a_len"]
+
+    response = client.post(
+        "/api/masks/preview/", preview_request, format="json", HTTP_USER_ID="test"
+    )
+
+    assert response.status_code == 400
+    assert "a_len" in response.data["error"]
+
+
+def test_preview_of_an_unknown_list_is_a_bad_request(preview_request):
+    preview_request["objects"] = "no_such_list"
+
+    response = client.post(
+        "/api/masks/preview/", preview_request, format="json", HTTP_USER_ID="test"
+    )
+
+    assert response.status_code == 400
+    assert "no_such_list" in response.data["error"]
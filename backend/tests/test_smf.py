@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pytest
+from maskgen_api.smf import SLIT_DTYPE, read_smf
+
+script_dir = os.path.dirname(__file__)
+SMF_PATH = os.path.join(script_dir, "data", "DCM5V5E.SMF")
+
+
+def test_read_smf_header():
+    header = read_smf(SMF_PATH).header
+
+    assert header.name == "DCM5V5E"
+    assert header.telescope == "Magellan"
+    assert header.telescope_params == (71139.8, 0.80906, 3.0)
+    assert (header.disperser, header.disperser_order) == ("IMACS_direct_grism", 1)
+    assert header.position_angle == 0.0
+    assert header.center_ra == "10:00:18.500"
+    assert header.center_ra_deg == pytest.approx(150.0770833)
+    assert header.center_dec_deg == pytest.approx(2.3677778)
+    assert header.wlimit == (3780.0, 5920.0)
+    assert (header.dref, header.hangle, header.date) == (1, -2.5, 58104)
+    assert header.comments[0] == "Constellation (Sex) Sextans"
+    assert header.extra == {}
+
+
+def test_read_smf_records():
+    smf = read_smf(SMF_PATH)
+
+    assert smf.slits.dtype == SLIT_DTYPE
+    assert (len(smf.slits), len(smf.holes)) == (1824, 10)
+    first = smf.slits[0]
+    assert first["id"] == "DC-1006811"
+    assert first["ra_deg"] == pytest.approx(150.1294583)
+    assert first["dec_deg"] == pytest.approx(2.2071944)
+    assert first["a_len"] == pytest.approx(1.173)
+    assert smf.holes["shape_code"].tolist() == [1] * 10
+    assert np.all(smf.slits["width"] == 0.414)
+
+    features = smf.features()
+    assert features[0] == {
+        "type": "SLIT",
+        "id": "DC-1006811",
+        "ra": "10:00:31.070",
+        "dec": "02:12:25.90",
+        "x": -65.157,
+        "y": -199.845,
+        "width": 0.414,
+        "a_len": 1.173,
+        "b_len": 0.724,
+        "angle": 0.0,
+        "ra_deg": first["ra_deg"],
+        "dec_deg": first["dec_deg"],
+    }
+    assert features[-1]["type"] == "HOLE"
+
+
+def test_features_keep_file_order_and_signs():
+    smf = read_smf(
+        b"NAME test\n"
+        b"HOLE h1 00:00:00.000 -00:30:00.00 0 0 1.7 1 0.8 0.8 0.00\n"
+        b"SLIT s1 01:00:00.000 -10:30:00.00 1 2 0.4 1.0 1.0 5.00\n"
+        b"FOO bar baz\n"
+    )
+
+    assert [f["id"] for f in smf.features()] == ["h1", "s1"]
+    assert smf.holes["dec_deg"][0] == pytest.approx(-0.5)
+    assert smf.slits["ra_deg"][0] == pytest.approx(15.0)
+    assert smf.slits["dec_deg"][0] == pytest.approx(-10.5)
+    assert smf.header.extra == {"FOO": "bar baz"}
+
+
+def test_malformed_record():
+    with pytest.raises(ValueError):
+        read_smf(b"SLIT s1 01:00:00.000 -10:30:00.00 1 2\n")
@@ -0,0 +1,179 @@
+import os
+import signal
+import stat
+import time
+from backend.terminal_helper import (
+    STOP_POLL_INTERVAL,
+    run_maskgen,
+    run_session,
+    scratch_directory,
+    tool_env,
+)
+
+
+def _fake_tool(tmp_path):
+    tool_dir = tmp_path / "maskgen-dist"
+    tool_dir.mkdir()
+    (tool_dir / "support.dat").write_text("support")
+    script = tool_dir / "maskgen"
+    script.write_text(
+        "#!/bin/sh\n"
+        'echo "MGPATH=$MGPATH"\n'
+        "cat support.dat\n"
+        "echo SMF > $2.SMF\n"
+        'echo "Writing object file with use counts to $2.obw"\n'
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return tool_dir
+
+
+def test_scratch_directories_are_isolated(tmp_path):
+    tool_dir = _fake_tool(tmp_path)
+
+    with scratch_directory(tool_dir, root=tmp_path / "scratch") as first:
+        with scratch_directory(tool_dir, root=tmp_path / "scratch") as second:
+            assert first != second
+            for workdir in (first, second):
+                ok, output, _ = run_maskgen(
+                    f"{tool_dir}/maskgen -s mask1",
+                    False,
+                    cwd=workdir,
+                    env=tool_env(workdir),
+                )
+                assert ok
+                assert f"MGPATH={workdir}/" in output
+                assert "support" in output
+                assert os.path.exists(os.path.join(workdir, "mask1.SMF"))
+
+    assert not os.path.exists(first)
+    assert not os.path.exists(second)
+    # outputs never land in the shared install directory
+    assert sorted(os.listdir(tool_dir)) == ["maskgen", "support.dat"]
+
+
+PROMPTING_TOOL = """#!/bin/sh
+echo run >> runs.log
+printf "mask1.SMF exists. Overwrite? "
+read answer
+echo "answer=$answer"
+[ "$answer" = "yes" ] || exit 1
+printf "Do you wish to continue (yes/no)? "
+read answer
+echo "Writing object file with use counts to mask1.obw"
+"""
+
+
+def _prompting_tool(tmp_path):
+    script = tmp_path / "prompting"
+    script.write_text(PROMPTING_TOOL)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def test_prompts_are_answered_in_a_single_run(tmp_path):
+    chunks = []
+    ok, output, metrics = run_maskgen(
+        _prompting_tool(tmp_path), True, cwd=tmp_path, on_output=chunks.append
+    )
+
+    assert ok, output
+    assert "answer=yes" in output
+    assert output.endswith("Writing object file with use counts to mask1.obw")
+    assert "".join(chunks).strip() == output
+    assert (tmp_path / "runs.log").read_text() == "run\n"
+    assert metrics["exit_status"] == 0
+    assert not metrics["timed_out"]
+
+
+def test_declined_prompt_gets_end_of_file(tmp_path):
+    ok, output, _ = run_maskgen(_prompting_tool(tmp_path), False, cwd=tmp_path)
+
+    assert not ok
+    assert "answer=" in output
+    assert "Writing object file" not in output
+
+
+def _script(tmp_path, name, body):
+    script = tmp_path / name
+    script.write_text("#!/bin/sh\n" + body)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def _gone(pid, wait=2.0):
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        # a killed orphan can linger as a zombie until init reaps it
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                if f.read().rsplit(")", 1)[1].split()[0] == "Z":
+                    return True
+        except (FileNotFoundError, IndexError):
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def test_hung_tool_and_its_children_are_killed(tmp_path):
+    tool = _script(tmp_path, "hangs", "sleep 30 &\necho $! > child.pid\nwait\n")
+
+    ok, output, metrics = run_session(tool, {}, cwd=tmp_path, timeout=2)
+
+    assert not ok
+    assert "killed after 2s" in output
+    assert metrics["timed_out"]
+    assert metrics["duration"] < 10
+    assert _gone(int((tmp_path / "child.pid").read_text()))
+
+
+def test_cpu_limit_stops_a_runaway_tool(tmp_path):
+    tool = _script(tmp_path, "spins", "while :; do :; done\n")
+
+    ok, _, metrics = run_session(
+        tool, {}, cwd=tmp_path, timeout=30, limits={"cpu_seconds": 1}
+    )
+
+    assert not ok
+    assert not metrics["timed_out"]
+    assert metrics["exit_status"] == -signal.SIGXCPU
+    assert metrics["cpu_seconds"] >= 0.9
+
+
+def test_should_stop_kills_a_running_tool(tmp_path):
+    tool = _script(tmp_path, "slow", "echo started\nsleep 30\n")
+    output = []
+
+    ok, transcript, metrics = run_session(
+        tool,
+        {},
+        cwd=tmp_path,
+        timeout=30,
+        on_output=output.append,
+        should_stop=lambda: "started" in "".join(output),
+    )
+
+    assert not ok
+    assert metrics["stopped"]
+    assert metrics["duration"] < 5
+    assert transcript.startswith("started")
+
+
+def test_should_stop_is_polled_once_per_interval(tmp_path):
+    tool = _script(tmp_path, "chatty", "seq 20000\nsleep 1\n")
+    calls = []
+
+    def should_stop():
+        calls.append(time.monotonic())
+        return False
+
+    ok, transcript, metrics = run_session(
+        tool, {}, cwd=tmp_path, timeout=30, should_stop=should_stop
+    )
+
+    assert ok
+    assert transcript.endswith("20000")
+    assert 1 <= len(calls) <= metrics["duration"] / STOP_POLL_INTERVAL + 2
@@ -14,9 +14,9 @@ type AladinSlitsProps = {
 
 type Slit = {
   type: string;
-  id: string;
-  ra: string;
-  dec: string;
+  object_name: string;
+  ra: number;   // deg
+  dec: number;  // deg
   x: number;
   y: number;
   width: number;  // arcmin across RA
@@ -27,24 +27,6 @@ type Slit = {
 
 // --- utils -------------------------------------------------------
 
-function raStringToDeg(raStr: string): number {
-  const [h, m, s] = raStr.split(":").map(Number);
-  return (h + m / 60 + s / 3600) * 15;
-}
-
-function decStringToDeg(decStr: string): number {
-  let sign = 1;
-  let t = decStr.trim();
-  if (t.startsWith("-")) {
-    sign = -1;
-    t = t.slice(1);
-  } else if (t.startsWith("+")) {
-    t = t.slice(1);
-  }
-  const [d, m, s] = t.split(":").map(Number);
-  return sign * (d + m / 60 + s / 3600);
-}
-
 function arcminToDeg(v: number): number {
   return v / 60;
 }
@@ -96,7 +78,8 @@ const [error, setError] = useState(false);
 useEffect(() => {
   async function fetchSlits() {
     try {
-      const url = `/api/masks/${maskName}?project_name=${encodeURIComponent(projectName)}`;
+      // only the field center and the slits are drawn
+      const url = `/api/masks/${maskName}?project_name=${encodeURIComponent(projectName)}&fields=center_ra,center_dec&include=features`;
       const response = await fetch(url, {
         headers: {
           "Content-Type": "application/json",
@@ -150,8 +133,8 @@ useEffect(() => {
     aladin.addOverlay(overlay);
 
     slits.forEach((slit) => {
-      const raDeg = raStringToDeg(slit.ra);
-      const decDeg = decStringToDeg(slit.dec);
+      const raDeg = slit.ra;
+      const decDeg = slit.dec;
       const widthDeg = arcminToDeg(slit.width);
       const heightDeg = arcminToDeg(slit.a_len);
 
@@ -164,7 +147,7 @@ useEffect(() => {
       });
       overlay.add(poly);
 
-      const label = window.A.label(raDeg, decDeg, slit.id, { fontSize: 10, color: "#fff" });
+      const label = window.A.label(raDeg, decDeg, slit.object_name, { fontSize: 10, color: "#fff" });
       overlay.add(label);
     });
   });
@@ -18,6 +18,25 @@ interface Mask {
   user_id: string;
 }
 
+interface MaskPage {
+  results: Mask[];
+  next: string | null;
+}
+
+// the listings are paginated, follow the cursor until the last page
+async function fetchAllMasks(url: string): Promise<Mask[]> {
+  const masks: Mask[] = [];
+  let cursor: string | null = null;
+  do {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const response = await fetch(`${url}${query}`);
+    const page: MaskPage = await response.json();
+    masks.push(...page.results);
+    cursor = page.next;
+  } while (cursor);
+  return masks;
+}
+
 interface MaskDetailProps {
   projectName: string;
   maskName: string;
@@ -37,10 +56,7 @@ export default function MaskManager() {
     async function fetchFinalizedMasks() {
       setLoading(true);
       try {
-        const response = await fetch("/api/masks/finalized_masks");
-        const data = await response.json();
-        console.log(data)
-        setFinalizedMasks(data);
+        setFinalizedMasks(await fetchAllMasks("/api/masks/finalized_masks/"));
       } catch (err) {
         console.error("Error fetching masks:", err);
       } finally {
@@ -54,10 +70,7 @@ export default function MaskManager() {
     async function fetchCompletedMasks() {
       setLoading(true);
       try {
-        const response = await fetch("/api/masks/completed_masks");
-        const data = await response.json();
-        console.log(data)
-        setCompletedMasks(data);
+        setCompletedMasks(await fetchAllMasks("/api/masks/completed_masks/"));
       } catch (err) {
         console.error("Error fetching masks:", err);
       } finally {